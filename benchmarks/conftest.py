@@ -0,0 +1,59 @@
+# pylint: disable=redefined-outer-name
+import datetime
+
+import pytest
+from synthetic import HplSpec, write_dataset
+
+from haloreader.read import read, read_bg, read_single
+
+START = datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("synthetic data")
+    group.addoption(
+        "--synthetic-hours",
+        type=int,
+        default=24,
+        help="Hours of synthetic data, e.g. 720 for a month (default: 24)",
+    )
+    group.addoption("--synthetic-ngates", type=int, default=250)
+    group.addoption(
+        "--synthetic-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between profiles (default: 10)",
+    )
+
+
+@pytest.fixture(scope="session")
+def spec(request):
+    return HplSpec(
+        start=START,
+        ngates=request.config.getoption("--synthetic-ngates"),
+        profile_interval=request.config.getoption("--synthetic-interval"),
+    )
+
+
+@pytest.fixture(scope="session")
+def dataset(request, spec, tmp_path_factory):
+    return write_dataset(
+        tmp_path_factory.mktemp("synthetic"),
+        spec,
+        hours=request.config.getoption("--synthetic-hours"),
+    )
+
+
+@pytest.fixture(scope="session")
+def halos(dataset):
+    return [read_single(path) for path in dataset.halo_files]
+
+
+@pytest.fixture
+def halo(dataset):
+    return read(dataset.halo_files)
+
+
+@pytest.fixture(scope="session")
+def halobg(dataset):
+    return read_bg(dataset.background_files)
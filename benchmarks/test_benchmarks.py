@@ -0,0 +1,77 @@
+import copy
+import dataclasses
+import subprocess
+import sys
+
+import pytest
+from synthetic import HplFormat, write_hpl
+
+from haloreader.engines import ENGINES
+from haloreader.halo import Halo
+from haloreader.read import read, read_bg, read_single
+
+# Rounds of benchmarks that modify the halo, each on a fresh copy
+ROUNDS = 5
+
+
+def _copies(halo, *args):
+    """Setup for benchmark.pedantic passing each round its own copy."""
+    return lambda: ((copy.deepcopy(halo), *args), {})
+
+
+@pytest.mark.parametrize("hpl_format", list(HplFormat), ids=lambda f: f.value)
+def test_parse(benchmark, spec, tmp_path, hpl_format):
+    path = write_hpl(tmp_path, dataclasses.replace(spec, hpl_format=hpl_format))
+    benchmark(read_single, path)
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_parse_engine(benchmark, spec, tmp_path, engine):
+    path = write_hpl(tmp_path, spec)
+    benchmark(read_single, path, engine)
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_read_background(benchmark, dataset, engine):
+    benchmark(read_bg, dataset.background_files, engine=engine)
+
+
+def test_merge(benchmark, halos):
+    benchmark(Halo.merge, halos)
+
+
+def test_correct_background(benchmark, halo, halobg):
+    benchmark.pedantic(
+        Halo.correct_background, setup=_copies(halo, halobg), rounds=ROUNDS
+    )
+
+
+def test_compute_beta(benchmark, halo, halobg):
+    halo.correct_background(halobg)
+    benchmark.pedantic(Halo.compute_beta, setup=_copies(halo), rounds=ROUNDS)
+
+
+def test_compute_noise_screen(benchmark, halo, halobg):
+    halo.correct_background(halobg)
+    benchmark(halo.compute_noise_screen)
+
+
+def test_compute_wind_profile(benchmark, spec, tmp_path):
+    vad_spec = dataclasses.replace(spec, hpl_format=HplFormat.VAD, duration=86400)
+    halo = read([write_hpl(tmp_path, vad_spec)])
+    benchmark.pedantic(Halo.compute_wind_profile, setup=_copies(halo), rounds=ROUNDS)
+
+
+def test_to_nc(benchmark, halo, halobg):
+    halo.correct_background(halobg)
+    halo.compute_beta()
+    screen = halo.compute_noise_screen()
+    halo.compute_beta_screened(screen)
+    halo.compute_doppler_velocity_screened(screen)
+    halo.convert_time_unit2cloudnet_time()
+    benchmark(halo.to_nc)
+
+
+@pytest.mark.parametrize("module", ["haloreader.read", "haloreader.cli"])
+def test_import(benchmark, module):
+    benchmark(subprocess.run, [sys.executable, "-c", f"import {module}"], check=True)
@@ -7,10 +7,13 @@ if __name__ == "__main__":
         Extension(
             name="haloreader.data_reader",
             sources=["src/haloreader/data_reader/data_reader.pyx"],
+            # Parsing falls back to the NumPy engine if the build fails
+            optional=True,
         ),
         Extension(
             name="haloreader.background_reader",
             sources=["src/haloreader/background_reader/background_reader.pyx"],
+            optional=True,
         ),
     ]
     setup(
@@ -1,51 +1,104 @@
 import argparse
+import datetime
 import logging
 import pathlib
 
 import flask
+import werkzeug.security
 
-from . import DEFAULT_ROOT, IMAGE_EXT
+from . import DEFAULT_ROOT
+from .index import DEFAULT_PER_PAGE, ImageIndex
+from .tiles import TileCache, TileRequest
 
-logging.basicConfig(level=logging.INFO)
+# Browsers may reuse a tile this long without revalidating it
+TILE_MAX_AGE = 60
 
 
-parser = argparse.ArgumentParser("haloboard")
-parser.add_argument("--dir", type=pathlib.Path, default=pathlib.Path(DEFAULT_ROOT))
-parser.add_argument("--port", type=int, default=5000)
-args = parser.parse_args()
-app = flask.Flask(
-    __name__,
-    template_folder=str(pathlib.Path(__file__).parent.joinpath("templates")),
-)
-ROOT = args.dir
+def create_app(
+    root: pathlib.Path = pathlib.Path(DEFAULT_ROOT),
+    products: pathlib.Path | None = None,
+) -> flask.Flask:
+    """Creates the dashboard for images in `root`.
 
-
-def _find_images() -> list:
-    img_dir = pathlib.Path(ROOT)
-    return sorted(img_dir.glob(f"*.{IMAGE_EXT}"))
-
-
-@app.route("/")
-def index() -> str:
-    image_paths = _find_images()
-    image_paths = ["/" + str(p) for p in image_paths]
-    return flask.render_template("index.html", image_paths=image_paths)
-
-
-@app.route(f"/{ROOT}/<path:name>")
-def serve_files(name: str) -> flask.wrappers.Response:
-    return flask.send_from_directory(
-        pathlib.Path(ROOT).resolve(), name, as_attachment=True
+    Tiles of netCDF products are rendered on demand from `products`, which
+    defaults to `root`.
+    """
+    app = flask.Flask(
+        __name__,
+        template_folder=str(pathlib.Path(__file__).parent.joinpath("templates")),
     )
-
-
-@app.route("/static/<path:name>")
-def serve_static(name: str) -> flask.wrappers.Response:
-    return flask.send_from_directory(pathlib.Path(app.root_path, "static"), name)
+    products_dir = products if products is not None else root
+    tile_cache = TileCache()
+    image_index = ImageIndex(pathlib.Path(root))
+
+    @app.route("/")
+    def index() -> str:
+        filters = {
+            key: flask.request.args.get(key, "") for key in ("site", "date", "variable")
+        }
+        try:
+            page = image_index.query(
+                **filters,
+                page=int(flask.request.args.get("page", 1)),
+                per_page=int(flask.request.args.get("per_page", DEFAULT_PER_PAGE)),
+            )
+        except ValueError as err:
+            flask.abort(400, str(err))
+        image_paths = ["/" + str(pathlib.Path(root, e.filename)) for e in page.entries]
+        return flask.render_template(
+            "index.html", image_paths=image_paths, page=page, filters=filters
+        )
+
+    @app.route(f"/{root}/<path:name>")
+    def serve_files(name: str) -> flask.wrappers.Response:
+        return flask.send_from_directory(
+            pathlib.Path(root).resolve(), name, as_attachment=True
+        )
+
+    @app.route("/static/<path:name>")
+    def serve_static(name: str) -> flask.wrappers.Response:
+        return flask.send_from_directory(pathlib.Path(app.root_path, "static"), name)
+
+    @app.route("/tiles/<product>/<variable>.png")
+    def serve_tile(product: str, variable: str) -> flask.wrappers.Response:
+        path = werkzeug.security.safe_join(str(products_dir), f"{product}.nc")
+        if path is None or not pathlib.Path(path).is_file():
+            flask.abort(404)
+        try:
+            request = TileRequest.from_args(variable, flask.request.args)
+        except ValueError as err:
+            flask.abort(400, str(err))
+        try:
+            tile = tile_cache.get(pathlib.Path(path), request)
+        except KeyError:
+            flask.abort(404)
+        except NotImplementedError as err:
+            flask.abort(400, str(err))
+        response = flask.Response(tile.png, mimetype="image/png")
+        response.set_etag(tile.etag)
+        response.last_modified = datetime.datetime.fromtimestamp(
+            tile.mtime, tz=datetime.timezone.utc
+        )
+        response.cache_control.public = True
+        response.cache_control.max_age = TILE_MAX_AGE
+        response.make_conditional(flask.request)
+        return response
+
+    return app
 
 
 def run() -> None:
-    app.run(debug=True, port=args.port)
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser("haloboard")
+    parser.add_argument("--dir", type=pathlib.Path, default=pathlib.Path(DEFAULT_ROOT))
+    parser.add_argument(
+        "--products",
+        type=pathlib.Path,
+        help="Directory of netCDF products for tiles (default: --dir)",
+    )
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    create_app(args.dir, args.products).run(debug=True, port=args.port)
 
 
 if __name__ == "__main__":
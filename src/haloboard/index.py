@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import IMAGE_EXT
+
+DEFAULT_TTL = 30.0
+DEFAULT_PER_PAGE = 20
+
+# Quick-looks are named like halo_<site>_<date>[_<variable>]
+IMAGE_NAME_RE = re.compile(
+    r"^(?:halo_)?(?:(?P<site>[a-z][a-z-]*)_)?(?P<date>\d{4}-\d{2}-\d{2})"
+    r"(?:_(?P<variable>\w+))?$"
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ImageEntry:
+    filename: str
+    site: str | None = None
+    date: str | None = None
+    variable: str | None = None
+
+    @classmethod
+    def from_filename(cls, filename: str) -> ImageEntry:
+        stem = filename.removesuffix(f".{IMAGE_EXT}")
+        if (match_ := IMAGE_NAME_RE.match(stem)) is None:
+            return cls(filename=filename)
+        return cls(filename=filename, **match_.groupdict())
+
+
+@dataclass(slots=True)
+class ImagePage:
+    entries: list[ImageEntry]
+    page: int
+    npages: int
+    total: int
+
+
+class ImageIndex:
+    """In-memory list of images in `root`.
+
+    The directory is scanned again when its modification time changes,
+    i.e. when images are added, removed or renamed, or when the index is
+    older than `ttl` seconds.
+    """
+
+    def __init__(self, root: Path, ttl: float = DEFAULT_TTL):
+        self.root = root
+        self.ttl = ttl
+        self._entries: list[ImageEntry] = []
+        self._mtime_ns: int | None = None
+        self._scanned = -math.inf
+        self._lock = threading.Lock()
+
+    def entries(self) -> list[ImageEntry]:
+        with self._lock:
+            self._refresh_if_stale()
+            return self._entries
+
+    def query(
+        self,
+        site: str | None = None,
+        date: str | None = None,
+        variable: str | None = None,
+        page: int = 1,
+        per_page: int = DEFAULT_PER_PAGE,
+    ) -> ImagePage:
+        """Returns a page of images, `date` matches as a prefix."""
+        # pylint: disable=too-many-arguments
+        if page < 1 or per_page < 1:
+            raise ValueError("page and per_page must be positive")
+        entries = self.entries()
+        if site or date or variable:
+            entries = [
+                entry
+                for entry in entries
+                if (not site or entry.site == site)
+                and (not date or (entry.date or "").startswith(date))
+                and (not variable or entry.variable == variable)
+            ]
+        start = (page - 1) * per_page
+        return ImagePage(
+            entries=entries[start : start + per_page],
+            page=page,
+            npages=max(1, math.ceil(len(entries) / per_page)),
+            total=len(entries),
+        )
+
+    def _refresh_if_stale(self) -> None:
+        try:
+            mtime_ns = self.root.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._entries, self._mtime_ns = [], None
+            return
+        now = time.monotonic()
+        if mtime_ns == self._mtime_ns and now - self._scanned < self.ttl:
+            return
+        self._entries = sorted(
+            (
+                ImageEntry.from_filename(entry.name)
+                for entry in os.scandir(self.root)
+                if entry.name.endswith(f".{IMAGE_EXT}") and entry.is_file()
+            ),
+            key=lambda entry: entry.filename,
+        )
+        self._mtime_ns = mtime_ns
+        self._scanned = now
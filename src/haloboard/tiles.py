@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Mapping
+
+import netCDF4
+import numpy as np
+
+from haloreader.variable import Variable
+
+TILE_WIDTH = 256
+TILE_HEIGHT = 256
+MAX_ZOOM = 4
+DEFAULT_MAX_ENTRIES = 256
+
+
+@dataclass(frozen=True, slots=True)
+class TileRequest:
+    """A window of a (time, range) variable rendered at a zoom level.
+
+    Window bounds are inclusive and given in the units of the time and
+    range variables of the product. Each zoom level doubles the width of
+    the image.
+    """
+
+    variable: str
+    time_start: float | None = None
+    time_end: float | None = None
+    range_start: float | None = None
+    range_end: float | None = None
+    zoom: int = 0
+
+    @classmethod
+    def from_args(cls, variable: str, args: Mapping[str, str]) -> TileRequest:
+        """Parses query arguments, raises ValueError on invalid values."""
+        zoom = int(args.get("zoom", 0))
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValueError(f"zoom must be between 0 and {MAX_ZOOM}")
+        return cls(
+            variable=variable,
+            time_start=_optional_float(args.get("time_start")),
+            time_end=_optional_float(args.get("time_end")),
+            range_start=_optional_float(args.get("range_start")),
+            range_end=_optional_float(args.get("range_end")),
+            zoom=zoom,
+        )
+
+    @property
+    def width(self) -> int:
+        return int(TILE_WIDTH * 2**self.zoom)
+
+
+@dataclass(slots=True)
+class Tile:
+    png: bytes
+    etag: str
+    mtime: float
+
+
+class TileCache:
+    """Renders tiles from netCDF products and keeps the latest ones.
+
+    Entries are keyed by the product path, its modification time and the
+    request, so a rewritten product is rendered again.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._tiles: OrderedDict[tuple, Tile] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, request: TileRequest) -> Tile:
+        stat = path.stat()
+        key = (str(path.resolve()), stat.st_mtime_ns, request)
+        with self._lock:
+            if (tile := self._tiles.get(key)) is not None:
+                self._tiles.move_to_end(key)
+                return tile
+        tile = Tile(
+            png=render_tile(path, request),
+            etag=hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest(),
+            mtime=stat.st_mtime,
+        )
+        with self._lock:
+            self._tiles[key] = tile
+            while len(self._tiles) > self.max_entries:
+                self._tiles.popitem(last=False)
+        return tile
+
+
+def render_tile(path: Path, request: TileRequest) -> bytes:
+    """Renders a PNG of the requested window.
+
+    Raises KeyError if the product has no such (time, range) variable or
+    no data in the window.
+    """
+    # pylint: disable=import-outside-toplevel
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    nc = netCDF4.Dataset(path, "r")
+    try:
+        ncvar = nc.variables[request.variable]
+        if ncvar.dimensions != ("time", "range"):
+            raise KeyError(f"{request.variable} is not a (time, range) variable")
+        time_slice = _index_slice(
+            nc.variables["time"][:], request.time_start, request.time_end
+        )
+        range_slice = _index_slice(
+            nc.variables["range"][:], request.range_start, request.range_end
+        )
+        data = ncvar[time_slice, range_slice]
+    finally:
+        nc.close()
+    if data.size == 0:
+        raise KeyError("No data in the window")
+    dpi = 100
+    fig = Figure(figsize=(request.width / dpi, TILE_HEIGHT / dpi), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes((0, 0, 1, 1))
+    Variable(name=request.variable, dimensions=("time", "range"), data=data).plot(ax)
+    ax.set_axis_off()
+    buf = io.BytesIO()
+    canvas.print_png(buf)
+    return buf.getvalue()
+
+
+def _index_slice(coord: np.ndarray, start: float | None, end: float | None) -> slice:
+    return slice(
+        int(np.searchsorted(coord, start, side="left")) if start is not None else None,
+        int(np.searchsorted(coord, end, side="right")) if end is not None else None,
+    )
+
+
+def _optional_float(value: str | None) -> float | None:
+    return float(value) if value is not None else None
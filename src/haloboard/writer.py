@@ -1,5 +1,6 @@
 import pathlib
 
+import numpy as np
 from matplotlib.figure import Figure
 
 from . import DEFAULT_ROOT, IMAGE_EXT
@@ -14,5 +15,11 @@ class Writer:
         pth = pathlib.Path(self.root, f"{name}.{IMAGE_EXT}")
         fig.savefig(pth, bbox_inches="tight")
 
+    def add_image(self, name: str, image: np.ndarray) -> None:
+        # pylint: disable=import-outside-toplevel
+        from matplotlib.image import imsave
+
+        imsave(pathlib.Path(self.root, f"{name}.{IMAGE_EXT}"), image)
+
     def add_info(self) -> None:
         raise NotImplementedError
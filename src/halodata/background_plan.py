@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import logging
+from typing import Sequence
+
+import numpy as np
+
+from haloreader.exceptions import BackgroundReadError
+from haloreader.read import bgfname2timevar
+from haloreader.type_guards import is_ndarray
+
+log = logging.getLogger(__name__)
+
+# Backgrounds used for the amplifier noise profile (p_amp), see README
+DEFAULT_AMPLIFIER_SAMPLES = 50
+
+
+def plan_backgrounds(
+    filenames: Sequence[str],
+    time_start: float,
+    time_end: float,
+    amplifier_samples: int | None = DEFAULT_AMPLIFIER_SAMPLES,
+) -> list[int]:
+    """Returns indices of background files needed for profiles in a time span.
+
+    Each profile is corrected with the latest background at or before it,
+    so the backgrounds in [`time_start`, `time_end`) and the latest one
+    before `time_start` are always needed. Older backgrounds are only used
+    for the amplifier noise profile, and `amplifier_samples` of them spread
+    evenly over the window are added. All files are selected if
+    `amplifier_samples` is None. Timestamps are parsed from the
+    filenames, files with unexpected names are left out.
+    """
+    indices, times = _filename_times(filenames)
+    if amplifier_samples is None:
+        return sorted(indices)
+    order = np.argsort(times, kind="stable")
+    indices, times = [indices[i] for i in order], times[order]
+    in_span = (times >= time_start) & (times < time_end)
+    npreceding = int(np.searchsorted(times, time_start, side="left"))
+    if npreceding > 0:
+        in_span[npreceding - 1] = True
+    selected = set(np.flatnonzero(in_span).tolist())
+    rest = np.flatnonzero(~in_span)
+    nextra = min(len(rest), amplifier_samples)
+    if nextra > 0:
+        sample = np.linspace(0, len(rest) - 1, nextra).round().astype(int)
+        selected.update(rest[sample].tolist())
+    log.debug("Selected %d/%d background files", len(selected), len(filenames))
+    return sorted(indices[i] for i in selected)
+
+
+def _filename_times(filenames: Sequence[str]) -> tuple[list[int], np.ndarray]:
+    indices = []
+    times = []
+    for i, filename in enumerate(filenames):
+        try:
+            time = bgfname2timevar(filename)
+        except BackgroundReadError:
+            log.warning("Unexpected background filename %s", filename)
+            continue
+        if not is_ndarray(time.data):
+            raise TypeError
+        indices.append(i)
+        times.append(float(time.data[0]))
+    return indices, np.array(times, dtype=float)
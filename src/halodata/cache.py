@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from haloreader.exceptions import ChecksumMismatch
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR_ENV = "HALODATA_CACHE_DIR"
+DEFAULT_CACHE_DIR = "cache"
+OBJECTS_DIR = "objects"
+LOCK_FNAME = ".lock"
+TMP_PREFIX = ".tmp-"
+# Temporary files older than this are left over from interrupted downloads
+STALE_TMP_AGE = 86400
+DEFAULT_MAX_BYTES = 10 * 2**30
+
+
+@dataclass(slots=True)
+class _Entry:
+    size: int
+    atime: float
+    touched: bool = False
+
+
+class DownloadCache:
+    """Content addressed cache for downloaded raw files.
+
+    Files are stored under ``root/objects/<xx>/<checksum>`` and verified
+    against the md5 checksum of the API record before they are moved into
+    place, so partially written or corrupted downloads are never served.
+    The directory is scanned once into an in-memory index; access times are
+    written back on :meth:`evict`, which removes entries older than
+    `max_age` seconds and least recently used entries until the cache is
+    smaller than `max_bytes`; None disables either limit. Eviction holds an
+    exclusive lock so several processes can share one cache directory.
+    """
+
+    def __init__(
+        self,
+        root: Path | str | None = None,
+        max_bytes: int | None = DEFAULT_MAX_BYTES,
+        max_age: float | None = None,
+    ):
+        if root is None:
+            root = os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._index = self._scan()
+
+    def path(self, checksum: str) -> Path:
+        return self.root.joinpath(OBJECTS_DIR, checksum[:2], checksum)
+
+    def get(self, checksum: str) -> Path | None:
+        """Returns the path of a cached file, None if it is not cached.
+
+        The index is trusted, but another process sharing the directory may
+        have evicted the file after the index was built. Callers opening the
+        path handle FileNotFoundError and :meth:`discard` the entry.
+        """
+        with self._lock:
+            entry = self._index.get(checksum)
+            if entry is None:
+                return None
+            entry.atime = time.time()
+            entry.touched = True
+        return self.path(checksum)
+
+    def discard(self, checksum: str) -> None:
+        """Forgets an entry whose file was removed by another process."""
+        with self._lock:
+            self._index.pop(checksum, None)
+
+    def put(self, checksum: str, chunks: Iterable[bytes]) -> Path:
+        """Writes `chunks` atomically and verifies their md5 `checksum`."""
+        path = self.path(checksum)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        md5 = hashlib.md5()
+        size = 0
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=TMP_PREFIX, delete=False
+        ) as f:
+            try:
+                for chunk in chunks:
+                    md5.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+                if md5.hexdigest() != checksum:
+                    raise ChecksumMismatch(
+                        f"Expected checksum {checksum}, got {md5.hexdigest()}"
+                    )
+                # Data must reach the disk before the rename, otherwise a
+                # crash can leave a truncated file under its checksum
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+        with self._lock:
+            self._index[checksum] = _Entry(size=size, atime=time.time())
+        return path
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(entry.size for entry in self._index.values())
+
+    def evict(self) -> None:
+        with self._exclusive(), self._lock:
+            for checksum, entry in self._index.items():
+                if entry.touched:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.utime(self.path(checksum), (entry.atime, entry.atime))
+                    entry.touched = False
+            self._remove_stale_tmp_files()
+            self._index = self._scan()
+            now = time.time()
+            total = sum(entry.size for entry in self._index.values())
+            for checksum, entry in sorted(
+                self._index.items(), key=lambda item: item[1].atime
+            ):
+                expired = self.max_age is not None and now - entry.atime > self.max_age
+                too_large = self.max_bytes is not None and total > self.max_bytes
+                if not (expired or too_large):
+                    continue
+                log.debug("Evicting %s from download cache", checksum)
+                with contextlib.suppress(FileNotFoundError):
+                    self.path(checksum).unlink()
+                del self._index[checksum]
+                total -= entry.size
+
+    def _remove_stale_tmp_files(self) -> None:
+        now = time.time()
+        for path in self.root.glob(f"{OBJECTS_DIR}/*/{TMP_PREFIX}*"):
+            with contextlib.suppress(FileNotFoundError):
+                if now - path.stat().st_mtime > STALE_TMP_AGE:
+                    path.unlink()
+
+    def _scan(self) -> dict[str, _Entry]:
+        index = {}
+        objects_dir = self.root.joinpath(OBJECTS_DIR)
+        if not objects_dir.is_dir():
+            return {}
+        for subdir in os.scandir(objects_dir):
+            if not subdir.is_dir():
+                continue
+            for file in os.scandir(subdir.path):
+                if file.name.startswith("."):
+                    continue
+                stat = file.stat()
+                index[file.name] = _Entry(size=stat.st_size, atime=stat.st_atime)
+        return index
+
+    @contextlib.contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self.root.joinpath(LOCK_FNAME).open("a", encoding="utf-8") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -1,25 +1,53 @@
 import datetime
 import logging
+import os
 import pathlib
-from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, TypeVar
 
 import requests
 import urllib3
 
+from halodata.background_plan import DEFAULT_AMPLIFIER_SAMPLES, plan_backgrounds
+from halodata.cache import DownloadCache
+from halodata.records import RecordIndex
 from haloreader.halo import Halo, HaloBg
-from haloreader.read import read, read_bg
+from haloreader.read import (
+    SKIPPABLE_ERRORS,
+    merge_halobgs,
+    merge_halos,
+    read_single,
+    read_single_bg,
+)
 from haloreader.scantype import ScanType
 
 log = logging.getLogger(__name__)
 
+CLOUDNET_API_URL = "https://cloudnet.fmi.fi/api/raw-files"
+API_URL_ENV = "HALODATA_API_URL"
+DEFAULT_MAX_WORKERS = 8
+CHUNK_SIZE = 2**16
+
+T = TypeVar("T")
+
 
 class Session(requests.Session):
-    def __init__(self) -> None:
+    def __init__(
+        self, url: str | None = None, pool_size: int = DEFAULT_MAX_WORKERS
+    ) -> None:
         super().__init__()
         retries = urllib3.util.retry.Retry(total=10, backoff_factor=0.2)
-        adapter = requests.adapters.HTTPAdapter(max_retries=retries)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries
+        )
         self.mount("https://", adapter)
-        self.url = "https://cloudnet.fmi.fi/api/raw-files"
+        self.mount("http://", adapter)
+        self.url = (
+            url if url is not None else os.environ.get(API_URL_ENV, CLOUDNET_API_URL)
+        )
+        self.pool_size = pool_size
 
     def get_metadata(
         self, site: str, date_from: datetime.date, date_to: datetime.date
@@ -38,38 +66,171 @@ class Session(requests.Session):
         return records
 
 
+class BackgroundLibrary:
+    """In-process memo of parsed background files keyed by checksum.
+
+    Consecutive days share most of their 30-day background window, so
+    long-running processes avoid parsing the same files again.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._halobgs: OrderedDict[str, HaloBg] = OrderedDict()
+
+    def read(self, record: dict, path: pathlib.Path) -> HaloBg:
+        checksum = record["checksum"]
+        if checksum in self._halobgs:
+            self._halobgs.move_to_end(checksum)
+            return self._halobgs[checksum]
+        halobg = read_single_bg(path, record["filename"])
+        self._halobgs[checksum] = halobg
+        if len(self._halobgs) > self.max_entries:
+            self._halobgs.popitem(last=False)
+        return halobg
+
+
+BACKGROUND_LIBRARY = BackgroundLibrary()
+
+
+@dataclass(slots=True)
+class CloudnetRecords:
+    halo: list[dict]
+    background: list[dict]
+
+    def checksums(self) -> dict[str, str]:
+        return {r["filename"]: r["checksum"] for r in self.halo + self.background}
+
+
 def get_halo_cloudnet(
-    site: str, date: datetime.date, scantype: ScanType = ScanType.STARE
+    site: str,
+    date: datetime.date,
+    scantype: ScanType = ScanType.STARE,
+    session: Session | None = None,
+    cache: DownloadCache | None = None,
 ) -> tuple[Halo | None, HaloBg | None]:
-    ses = Session()
-    log.info("Fetching metadata for %s", date)
-    records = ses.get_metadata(
-        site, date_from=date - datetime.timedelta(days=30), date_to=date
+    ses = session if session is not None else Session()
+    cache = cache if cache is not None else DownloadCache()
+    records = get_cloudnet_records(site, date, scantype, session=ses, cache=cache)
+    return read_cloudnet_records(records, session=ses, cache=cache)
+
+
+def get_cloudnet_records(
+    site: str,
+    date: datetime.date,
+    scantype: ScanType = ScanType.STARE,
+    session: Session | None = None,
+    cache: DownloadCache | None = None,
+    *,
+    amplifier_samples: int | None = DEFAULT_AMPLIFIER_SAMPLES,
+) -> CloudnetRecords:
+    """Returns raw files of `date` and background files they need.
+
+    Background files are chosen from the 30 preceding days with
+    :func:`plan_backgrounds`.
+    """
+    # pylint: disable=too-many-arguments
+    ses = session if session is not None else Session()
+    cache = cache if cache is not None else DownloadCache()
+    record_index = RecordIndex(ses, root=cache.root)
+    bg_records = record_index.records(
+        site, date - datetime.timedelta(days=30), date, background=True
     )
-    bg_records = [r for r in records if HaloBg.is_bgfilename(r["filename"])]
+    day_start = datetime.datetime.combine(date, datetime.time(), datetime.timezone.utc)
+    bg_records = [
+        bg_records[i]
+        for i in plan_backgrounds(
+            [r["filename"] for r in bg_records],
+            day_start.timestamp(),
+            (day_start + datetime.timedelta(days=1)).timestamp(),
+            amplifier_samples,
+        )
+    ]
     halo_records = [
         r
-        for r in records
-        if r["measurementDate"] == date.isoformat()
-        and ScanType.from_filename(r["filename"]) == scantype
-        and "cross" not in r.get("tags", [])
+        for r in record_index.records(site, date, date, scantype=scantype)
+        if "cross" not in r.get("tags", [])
     ]
-    halo_bytes = [_recor2bytes(r, ses) for r in halo_records]
-    bg_bytes = [_recor2bytes(r, ses) for r in bg_records]
-    bg_filenames = [r["filename"] for r in bg_records]
-    return read(halo_bytes), read_bg(bg_bytes, bg_filenames)
-
-
-def _recor2bytes(record: dict, session: Session) -> BytesIO:
-    path = pathlib.Path("cache", record["uuid"])
-    if path.exists():
-        with path.open("rb") as f:
-            file_io = BytesIO(f.read())
-    else:
-        log.info("Downloading and caching %s", record["filename"])
-        file_bytes = session.get(record["downloadUrl"]).content
-        path.parent.mkdir(exist_ok=True)
-        with path.open("wb") as f:
-            f.write(file_bytes)
-        file_io = BytesIO(file_bytes)
-    return file_io
+    return CloudnetRecords(halo=halo_records, background=bg_records)
+
+
+def read_cloudnet_records(
+    records: CloudnetRecords,
+    session: Session | None = None,
+    cache: DownloadCache | None = None,
+) -> tuple[Halo | None, HaloBg | None]:
+    """Downloads and parses records, parsing each file as soon as it arrives.
+
+    Background files are downloaded first, so they are parsed while raw
+    files are still downloading.
+    """
+    ses = session if session is not None else Session()
+    cache = cache if cache is not None else DownloadCache()
+    halos: list[Halo] = []
+    halobgs: list[HaloBg] = []
+    with ThreadPoolExecutor(max_workers=ses.pool_size) as executor:
+        futures = {
+            executor.submit(_record2path, r, ses, cache): (r, True)
+            for r in records.background
+        }
+        futures.update(
+            {
+                executor.submit(_record2path, r, ses, cache): (r, False)
+                for r in records.halo
+            }
+        )
+        try:
+            for future in as_completed(futures):
+                record, is_background = futures[future]
+                if is_background:
+                    halobgs.append(
+                        _read_evictable(
+                            BACKGROUND_LIBRARY.read, record, future.result(), ses, cache
+                        )
+                    )
+                elif (
+                    halo := _read_evictable(
+                        _read_record, record, future.result(), ses, cache
+                    )
+                ) is not None:
+                    halos.append(halo)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    cache.evict()
+    return merge_halos(halos), merge_halobgs(halobgs)
+
+
+def _read_evictable(
+    read: Callable[[dict, pathlib.Path], T],
+    record: dict,
+    path: pathlib.Path,
+    session: Session,
+    cache: DownloadCache,
+) -> T:
+    """Reads a cached file, downloading it again if it was evicted meanwhile."""
+    # pylint: disable=too-many-arguments
+    try:
+        return read(record, path)
+    except FileNotFoundError:
+        log.info("%s was evicted from the cache", record["filename"])
+        cache.discard(record["checksum"])
+        return read(record, _record2path(record, session, cache))
+
+
+def _read_record(record: dict, path: pathlib.Path) -> Halo | None:
+    try:
+        return read_single(path)
+    except SKIPPABLE_ERRORS as err:
+        log.warning("Skipping file %s", record["filename"], exc_info=err)
+        return None
+
+
+def _record2path(record: dict, session: Session, cache: DownloadCache) -> pathlib.Path:
+    checksum = record["checksum"]
+    if (path := cache.get(checksum)) is not None:
+        return path
+    log.info("Downloading and caching %s", record["filename"])
+    with session.get(record["downloadUrl"], stream=True) as res:
+        res.raise_for_status()
+        return cache.put(checksum, res.iter_content(chunk_size=CHUNK_SIZE))
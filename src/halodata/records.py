@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import os
+import tempfile
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Protocol
+
+from halodata.cache import CACHE_DIR_ENV, DEFAULT_CACHE_DIR
+from haloreader.halo import HaloBg
+from haloreader.scantype import ScanType
+
+log = logging.getLogger(__name__)
+
+RECORDS_DIR = "records"
+# Days this close to today may still receive new files and are not cached
+DEFAULT_FRESH_DAYS = 2
+
+
+class MetadataSource(Protocol):
+    def get_metadata(
+        self, site: str, date_from: datetime.date, date_to: datetime.date
+    ) -> list:
+        ...
+
+
+@dataclass(slots=True)
+class _DayRecords:
+    background: list[dict] = field(default_factory=list)
+    by_scantype: dict[ScanType | None, list[dict]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> _DayRecords:
+        day = cls()
+        for record in records:
+            if HaloBg.is_bgfilename(record["filename"]):
+                day.background.append(record)
+            else:
+                day.by_scantype[ScanType.from_filename(record["filename"])].append(
+                    record
+                )
+        return day
+
+
+class RecordIndex:
+    """Locally cached raw-file records indexed by date.
+
+    Records of each site are stored per measurement day in
+    ``root/records/<site>.json``. Queries only fetch the days that are
+    missing from the cache, one request per contiguous run of missing
+    days. Days within `fresh_days` of today are always fetched again since
+    new files may still arrive.
+    """
+
+    def __init__(
+        self,
+        source: MetadataSource,
+        root: Path | str | None = None,
+        fresh_days: int = DEFAULT_FRESH_DAYS,
+    ):
+        if root is None:
+            root = os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+        self.source = source
+        self.root = Path(root, RECORDS_DIR)
+        self.fresh_days = fresh_days
+        self._records: dict[str, dict[datetime.date, list[dict]]] = {}
+        self._days: dict[str, dict[datetime.date, _DayRecords]] = {}
+
+    def records(
+        self,
+        site: str,
+        date_from: datetime.date,
+        date_to: datetime.date,
+        scantype: ScanType | None = None,
+        background: bool = False,
+    ) -> list[dict]:
+        """Returns background records or records of `scantype`."""
+        self._update(site, date_from, date_to)
+        days = self._days[site]
+        selected = []
+        for date in _daterange(date_from, date_to):
+            day = days[date]
+            selected.extend(
+                day.background if background else day.by_scantype.get(scantype, [])
+            )
+        return selected
+
+    def _update(
+        self, site: str, date_from: datetime.date, date_to: datetime.date
+    ) -> None:
+        if site not in self._records:
+            self._records[site] = self._load(site)
+            self._days[site] = {
+                date: _DayRecords.from_records(records)
+                for date, records in self._records[site].items()
+            }
+        site_records = self._records[site]
+        stale_from = _today() - datetime.timedelta(days=self.fresh_days)
+        missing = [
+            date
+            for date in _daterange(date_from, date_to)
+            if date not in site_records or date >= stale_from
+        ]
+        if not missing:
+            return
+        for start, end in _contiguous_ranges(missing):
+            log.info("Fetching metadata for %s from %s to %s", site, start, end)
+            fetched: dict[datetime.date, list[dict]] = {
+                date: [] for date in _daterange(start, end)
+            }
+            for record in self.source.get_metadata(site, start, end):
+                date = datetime.date.fromisoformat(record["measurementDate"])
+                fetched.setdefault(date, []).append(record)
+            for date, records in fetched.items():
+                site_records[date] = records
+                self._days[site][date] = _DayRecords.from_records(records)
+        self._save(
+            site,
+            {date: recs for date, recs in site_records.items() if date < stale_from},
+        )
+
+    def _path(self, site: str) -> Path:
+        return self.root.joinpath(f"{site}.json")
+
+    def _load(self, site: str) -> dict[datetime.date, list[dict]]:
+        path = self._path(site)
+        if not path.exists():
+            return {}
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, json.JSONDecodeError) as err:
+            log.warning("Ignoring broken record cache %s", path, exc_info=err)
+            return {}
+        return {
+            datetime.date.fromisoformat(date): records
+            for date, records in stored.items()
+        }
+
+    def _save(self, site: str, records: dict[datetime.date, list[dict]]) -> None:
+        path = self._path(site)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=path.parent, prefix=".tmp-", delete=False, encoding="utf-8"
+        ) as f:
+            json.dump({str(date): recs for date, recs in sorted(records.items())}, f)
+        os.replace(f.name, path)
+
+
+def _today() -> datetime.date:
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+def _daterange(date_from: datetime.date, date_to: datetime.date) -> list[datetime.date]:
+    ndays = (date_to - date_from).days + 1
+    return [date_from + datetime.timedelta(days=i) for i in range(ndays)]
+
+
+def _contiguous_ranges(
+    dates: list[datetime.date],
+) -> list[tuple[datetime.date, datetime.date]]:
+    ranges: list[tuple[datetime.date, datetime.date]] = []
+    for date in sorted(dates):
+        if ranges and date - ranges[-1][1] == datetime.timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], date)
+        else:
+            ranges.append((date, date))
+    return ranges
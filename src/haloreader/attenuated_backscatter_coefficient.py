@@ -1,7 +1,6 @@
 import logging
 
 import numpy as np
-from scipy import constants
 
 from haloreader.type_guards import is_ndarray
 from haloreader.variable import Variable
@@ -57,10 +56,12 @@ def compute_beta(
             f'Expected wavelength units "m", got "{wavelength.units}".'
         )
 
+    # pylint: disable=import-outside-toplevel
+    from scipy.constants import Planck as h
+    from scipy.constants import speed_of_light as c
+
     r = range_.data
-    h = constants.Planck
     eta = 1
-    c = constants.speed_of_light
     E = 1e-5
     lambda_ = wavelength.data
     nu = c / lambda_
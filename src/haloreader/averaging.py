@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from haloreader.scantype import ScanType
+from haloreader.type_guards import is_ndarray
+from haloreader.variable import Variable
+
+# Scan types supported by Halo.average
+AVERAGED_SCANTYPES = (ScanType.STARE, ScanType.STARE_OVERLAPPING)
+
+
+@dataclass(slots=True)
+class TimeBins:
+    """Non-empty bins of a fixed UTC grid over increasing times."""
+
+    starts: np.ndarray
+    counts: np.ndarray
+    centres: np.ndarray
+
+    @classmethod
+    def from_time(cls, time: Variable, seconds: float) -> TimeBins:
+        """Bins `time` (seconds since epoch) to multiples of `seconds`."""
+        if seconds <= 0:
+            raise ValueError("Averaging time must be positive")
+        if not is_ndarray(time.data):
+            raise TypeError
+        bins = np.floor(time.data / seconds).astype(np.int64)
+        if np.any(np.diff(bins) < 0):
+            raise ValueError("Time must be increasing")
+        unique_bins, starts, counts = np.unique(
+            bins, return_index=True, return_counts=True
+        )
+        return cls(
+            starts=starts,
+            counts=counts,
+            centres=(unique_bins + 0.5) * seconds,
+        )
+
+    def mean(self, data: np.ndarray) -> np.ndarray:
+        mean: np.ndarray = np.add.reduceat(data, self.starts, axis=0) / self._counts(
+            data
+        )
+        return mean
+
+    def weighted_mean(self, data: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Weighted mean, plain mean in bins where the weights sum to zero."""
+        weight_sums = np.add.reduceat(weights, self.starts, axis=0)
+        weighted = np.add.reduceat(data * weights, self.starts, axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean: np.ndarray = np.where(
+                weight_sums > 0, weighted / weight_sums, self.mean(data)
+            )
+        return mean
+
+    def circular_mean(self, degrees: np.ndarray) -> np.ndarray:
+        radians = np.deg2rad(degrees)
+        mean_angle = np.arctan2(self.mean(np.sin(radians)), self.mean(np.cos(radians)))
+        mean: np.ndarray = np.mod(np.rad2deg(mean_angle), 360)
+        return mean
+
+    def _counts(self, data: np.ndarray) -> np.ndarray:
+        return self.counts.reshape((-1,) + (1,) * (data.ndim - 1))
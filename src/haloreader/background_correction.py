@@ -1,6 +1,4 @@
 import numpy as np
-from scipy.ndimage import gaussian_filter
-from scipy.signal import medfilt2d
 
 from haloreader.exceptions import BackgroundCorrectionError
 from haloreader.type_guards import is_ndarray
@@ -125,6 +123,10 @@ def threshold_signalmask(
     mask = 1, if data is signal
     mask = 0, if data is noise
     """
+    # pylint: disable=import-outside-toplevel
+    from scipy.ndimage import gaussian_filter
+    from scipy.signal import medfilt2d
+
     if not is_ndarray(intensity.data):
         raise TypeError
     intensity_median_normalised = (
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import datetime
+import functools
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from enum import Enum, auto
+from pathlib import Path
+from typing import Sequence
+
+from halodata.background_plan import DEFAULT_AMPLIFIER_SAMPLES
+from halodata.cache import DEFAULT_MAX_BYTES, DownloadCache
+from haloreader.pipeline import ProcessOptions, ProcessStatus, process_cloudnet
+
+log = logging.getLogger(__name__)
+
+
+class JobStatus(Enum):
+    OK = auto()
+    SKIPPED = auto()
+    UP_TO_DATE = auto()
+    FAILED = auto()
+
+    def __str__(self) -> str:
+        return str(self.name)
+
+
+@dataclass(frozen=True, slots=True)
+class BatchJob:
+    site: str
+    date: datetime.date
+
+
+@dataclass(frozen=True, slots=True)
+class BatchOptions:
+    output_dir: Path
+    cache_dir: Path | None = None
+    cache_max_bytes: int | None = DEFAULT_MAX_BYTES
+    cache_max_age: float | None = None
+    plot: bool = False
+    force: bool = False
+    amplifier_samples: int | None = DEFAULT_AMPLIFIER_SAMPLES
+    average: float | None = None
+
+
+@dataclass(slots=True)
+class BatchResult:
+    job: BatchJob
+    status: JobStatus
+    message: str = ""
+
+
+def jobs_from_range(
+    sites: Sequence[str], date_from: datetime.date, date_to: datetime.date
+) -> list[BatchJob]:
+    ndays = (date_to - date_from).days + 1
+    return [
+        BatchJob(site=site, date=date_from + datetime.timedelta(days=i))
+        for site in sites
+        for i in range(ndays)
+    ]
+
+
+def jobs_from_manifest(path: Path) -> list[BatchJob]:
+    """Reads jobs from a file with a site and an ISO date on each line."""
+    jobs = []
+    with path.open("r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                site, date = re.split(r"[\s,]+", line)
+                jobs.append(BatchJob(site=site, date=datetime.date.fromisoformat(date)))
+            except ValueError as err:
+                raise ValueError(
+                    f"{path}:{lineno}: expected a site and an ISO date, got {line!r}"
+                ) from err
+    return jobs
+
+
+def run_batch(
+    jobs: Sequence[BatchJob], options: BatchOptions, workers: int | None = None
+) -> list[BatchResult]:
+    """Processes jobs in a process pool.
+
+    Jobs are ordered by site and date and handed out in chunks, so a worker
+    processes consecutive days of a site and reuses their shared background
+    files from its in-process background library.
+    """
+    options.output_dir.mkdir(parents=True, exist_ok=True)
+    ordered_jobs = sorted(jobs, key=lambda job: (job.site, job.date))
+    if workers == 1:
+        return [_run_job(job, options) for job in ordered_jobs]
+    nworkers = workers if workers is not None else (os.cpu_count() or 1)
+    chunksize = max(1, len(ordered_jobs) // (4 * nworkers))
+    with ProcessPoolExecutor(max_workers=nworkers) as executor:
+        return list(
+            executor.map(
+                functools.partial(_run_job, options=options),
+                ordered_jobs,
+                chunksize=chunksize,
+            )
+        )
+
+
+def summary(results: Sequence[BatchResult]) -> str:
+    counts = {status: 0 for status in JobStatus}
+    for result in results:
+        counts[result.status] += 1
+    lines = [", ".join(f"{status}: {n}" for status, n in counts.items())]
+    for result in results:
+        if result.status == JobStatus.FAILED:
+            lines.append(f"{result.job.site} {result.job.date}: {result.message}")
+    return "\n".join(lines)
+
+
+def output_path(job: BatchJob, options: BatchOptions) -> Path:
+    return options.output_dir.joinpath(f"halo_{job.site}_{job.date}.nc")
+
+
+def _run_job(job: BatchJob, options: BatchOptions) -> BatchResult:
+    try:
+        status = process_cloudnet(
+            job.site,
+            job.date,
+            output_path(job, options),
+            cache=_download_cache(
+                options.cache_dir, options.cache_max_bytes, options.cache_max_age
+            ),
+            # Jobs already run in parallel, so panels are rendered in-process
+            options=ProcessOptions(
+                plot=options.plot,
+                force=options.force,
+                plot_workers=1,
+                amplifier_samples=options.amplifier_samples,
+                average=options.average,
+            ),
+        )
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        log.exception("Processing %s %s failed", job.site, job.date)
+        return BatchResult(job=job, status=JobStatus.FAILED, message=repr(err))
+    return BatchResult(job=job, status=_JOB_STATUS[status])
+
+
+_JOB_STATUS = {
+    ProcessStatus.PROCESSED: JobStatus.OK,
+    ProcessStatus.NO_DATA: JobStatus.SKIPPED,
+    ProcessStatus.UP_TO_DATE: JobStatus.UP_TO_DATE,
+}
+
+
+@functools.cache
+def _download_cache(
+    root: Path | None, max_bytes: int | None, max_age: float | None
+) -> DownloadCache:
+    return DownloadCache(root, max_bytes=max_bytes, max_age=max_age)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from haloreader.halo import Halo
+from haloreader.variable import Variable, map_variables
+
+log = logging.getLogger(__name__)
+
+SKELETON_FNAME = "halo.pickle"
+CACHE_FORMAT_VERSION = "1"
+
+
+class ParseCache:
+    """Binary cache of parsed raw files.
+
+    Each entry is a directory containing a pickled :class:`Halo` skeleton
+    (metadata and variable attributes without data) and one ``.npy`` file
+    per variable. Entries are loaded with ``np.load(mmap_mode="r")`` so
+    arrays are paged in on first access.
+
+    Entries are keyed by path, size and modification time, so a lookup
+    costs one ``stat`` call. The key is computed once with :meth:`key` and
+    passed to both :meth:`load` and :meth:`store`. Least recently used
+    entries are evicted once the cache grows over ``max_bytes``.
+    """
+
+    def __init__(self, root: Path | str, max_bytes: int = 2**30):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def key(self, src: Path) -> str:
+        stat = src.stat()
+        hash_ = hashlib.blake2b(digest_size=16)
+        hash_.update(CACHE_FORMAT_VERSION.encode())
+        hash_.update(str(src.resolve()).encode())
+        hash_.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return hash_.hexdigest()
+
+    def load(self, key: str) -> Halo | None:
+        entry = self.root.joinpath(key)
+        skeleton_path = entry.joinpath(SKELETON_FNAME)
+        if not skeleton_path.exists():
+            return None
+        try:
+            with skeleton_path.open("rb") as f:
+                skeleton = pickle.load(f)
+            halo = map_variables(skeleton, functools.partial(_attach_array, entry))
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError) as err:
+            log.warning("Discarding broken cache entry %s", entry, exc_info=err)
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        if not isinstance(halo, Halo):
+            raise TypeError
+        os.utime(skeleton_path)
+        log.debug("Loaded cache entry %s", key)
+        return halo
+
+    def store(self, key: str, halo: Halo) -> None:
+        entry = self.root.joinpath(key)
+        if entry.exists():
+            return
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.root, prefix=".tmp-"))
+        try:
+            skeleton = map_variables(halo, functools.partial(_detach_array, tmp_dir))
+            with tmp_dir.joinpath(SKELETON_FNAME).open("wb") as f:
+                pickle.dump(skeleton, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_dir, entry)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not entry.exists():
+                raise
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            skeleton_path = entry.joinpath(SKELETON_FNAME)
+            if entry.name.startswith(".") or not skeleton_path.exists():
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((skeleton_path.stat().st_mtime, size, entry))
+            total += size
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            log.debug("Evicting cache entry %s", entry)
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+
+def _detach_array(dir_: Path, var: Variable, prefix: str) -> Variable:
+    """Writes numpy data of `var` to `dir_` and returns it without data."""
+    if isinstance(var.data, np.ndarray) and var.data.ndim > 0:
+        np.save(dir_.joinpath(f"{prefix}npy"), var.data)
+        return Variable.like(var, data=None)
+    return Variable.like(var, data=var.data)
+
+
+def _attach_array(dir_: Path, var: Variable, prefix: str) -> Variable:
+    path = dir_.joinpath(f"{prefix}npy")
+    if var.data is None and path.exists():
+        return Variable.like(var, data=np.load(path, mmap_mode="r"))
+    return var
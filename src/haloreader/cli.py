@@ -4,12 +4,30 @@ import logging
 from glob import glob
 from pathlib import Path
 
-import matplotlib.pyplot as plt
-
-from haloboard.writer import Writer
-from halodata.datasets import get_halo_cloudnet
+from halodata.background_plan import DEFAULT_AMPLIFIER_SAMPLES
+from halodata.cache import DEFAULT_MAX_BYTES, DownloadCache
+from haloreader.batch import (
+    BatchOptions,
+    jobs_from_manifest,
+    jobs_from_range,
+    run_batch,
+    summary,
+)
+from haloreader.cache import ParseCache
+from haloreader.compression import is_archive_name, strip_compression_suffix
+from haloreader.engines import DEFAULT_ENGINE, ENGINES
+from haloreader.instrument import PROFILER
+from haloreader.manifest import (
+    build_manifest,
+    file_digest,
+    is_up_to_date,
+    write_manifest,
+)
+from haloreader.pipeline import ProcessOptions, process_cloudnet
+from haloreader.quicklook import plot_quicklook
 from haloreader.read import read, read_bg
 from haloreader.type_guards import is_ndarray
+from haloreader.watch import DEFAULT_INTERVAL, Watcher
 
 log = logging.getLogger(__name__)
 
@@ -17,53 +35,77 @@ log = logging.getLogger(__name__)
 def halo_reader() -> None:
     logging.basicConfig(level=logging.INFO)
     args = _haloreader_args()
+    if args.profile or args.profile_memory or args.profile_json is not None:
+        PROFILER.enable(trace_memory=args.profile_memory)
+    try:
+        _run_subcommand(args)
+    finally:
+        if PROFILER.enabled:
+            PROFILER.disable()
+            print(PROFILER.table())
+            if args.profile_json is not None:
+                PROFILER.dump(args.profile_json)
+
+
+def _run_subcommand(args: argparse.Namespace) -> None:
     if args.subcommand == "from_cloudnet":
         _from_cloudnet(args)
     elif args.subcommand == "from_raw":
         _from_raw(args)
+    elif args.subcommand == "batch":
+        _batch(args)
+    elif args.subcommand == "watch":
+        _watch(args)
     else:
         raise NotImplementedError
 
 
 def _from_cloudnet(args: argparse.Namespace) -> None:
-    halo, halobg = get_halo_cloudnet(site=args.site, date=args.date)
-    if halo is None:
-        log.warning("No data from %s on %s", args.site, args.date)
-        return
-    if halobg is None:
-        raise TypeError
-    log.info("Correct background")
-    halo.correct_background(halobg)
-    log.info("Compute beta")
-    halo.compute_beta()
-    log.info("Compute noise screen")
-    screen = halo.compute_noise_screen()
-    log.info("Compute screened beta")
-    halo.compute_beta_screened(screen)
-    log.info("Compute screened doppler velocity")
-    halo.compute_doppler_velocity_screened(screen)
-    log.info("Convert timeunits")
-    halo.convert_time_unit2cloudnet_time()
-    log.info("Create netCDF")
-    nc_buff = halo.to_nc()
-    with open(f"halo_{args.site}_{args.date}.nc", "wb") as f:
-        f.write(nc_buff)
-    if args.plot:
-        log.info("Create plots")
-        writer = Writer()
-        fig, ax = plt.subplots(nplots := 6, 1, figsize=(24, nplots * 6))
-        halo.intensity_raw.plot(ax[0])
-        halo.doppler_velocity.plot(ax[1])
-        if halo.intensity is not None:
-            halo.intensity.plot(ax[2])
-        if halo.beta is not None:
-            halo.beta.plot(ax[3])
-        if halo.beta_screened is not None:
-            halo.beta_screened.plot(ax[4])
-        if halo.doppler_velocity_screened is not None:
-            halo.doppler_velocity_screened.plot(ax[5])
-
-        writer.add_figure(f"halo_{args.site}_{args.date}", fig)
+    cache = DownloadCache(
+        args.cache_dir, max_bytes=args.cache_max_bytes, max_age=args.cache_max_age
+    )
+    process_cloudnet(
+        args.site,
+        args.date,
+        Path(f"halo_{args.site}_{args.date}.nc"),
+        cache=cache,
+        options=ProcessOptions(
+            plot=args.plot,
+            force=args.force,
+            amplifier_samples=args.amplifier_samples or None,
+            average=args.average,
+        ),
+    )
+
+
+def _batch(args: argparse.Namespace) -> None:
+    if args.manifest is not None:
+        jobs = jobs_from_manifest(args.manifest)
+    elif args.sites and args.date_from is not None:
+        date_to = args.date_to if args.date_to is not None else args.date_from
+        jobs = jobs_from_range(args.sites, args.date_from, date_to)
+    else:
+        raise SystemExit("Give either --manifest or --sites and --date-from")
+    options = BatchOptions(
+        output_dir=args.output_dir,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_max_bytes,
+        cache_max_age=args.cache_max_age,
+        plot=args.plot,
+        force=args.force,
+        amplifier_samples=args.amplifier_samples or None,
+        average=args.average,
+    )
+    results = run_batch(jobs, options, workers=args.workers)
+    print(summary(results))
+
+
+def _watch(args: argparse.Namespace) -> None:
+    watcher = Watcher(args.directory, args.output_dir, interval=args.interval)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        log.info("Stopped watching %s", args.directory)
 
 
 def _parse_files_from_arg(path_list: list) -> list:
@@ -81,20 +123,31 @@ def _parse_files_from_arg(path_list: list) -> list:
 
 
 def _from_raw(args: argparse.Namespace) -> None:
-    halo_src = [src for src in args.src if src.name.endswith(".hpl")]
-    halo_src = _parse_files_from_arg(halo_src)
+    # Archives may contain both raw and background files
+    names = {src: strip_compression_suffix(src.name) for src in args.src}
+    archives = [src for src in args.src if is_archive_name(src.name)]
+    halo_src = [src for src in args.src if names[src].endswith(".hpl")]
+    halo_src = _parse_files_from_arg(halo_src + archives)
     bg_src = [
         src
         for src in args.src
-        if src.name.startswith("Background") and src.name.endswith(".txt")
+        if names[src].startswith("Background") and names[src].endswith(".txt")
     ]
-    bg_src = _parse_files_from_arg(bg_src)
-    halo = read(halo_src)
+    bg_src = _parse_files_from_arg(bg_src + archives)
+    manifest = build_manifest(
+        {str(src): file_digest(src) for src in halo_src + bg_src},
+        {"average": args.average} if args.average is not None else {},
+    )
+    if not args.force and is_up_to_date(args.output, manifest):
+        log.info("%s is up to date", args.output)
+        return
+    cache = ParseCache(args.cache_dir) if args.cache_dir is not None else None
+    halo = read(halo_src, cache=cache, engine=args.engine, average=args.average)
     if halo is None:
         log.warning("No data")
         return
 
-    halobg = read_bg(bg_src)
+    halobg = read_bg(bg_src, engine=args.engine)
     if halobg:
         if not is_ndarray(halobg.background.data):
             raise TypeError
@@ -109,18 +162,17 @@ def _from_raw(args: argparse.Namespace) -> None:
     nc_buff = halo.to_nc()
     with args.output.open("wb") as f:
         f.write(nc_buff)
+    write_manifest(args.output, manifest)
     if args.plot:
-        writer = Writer()
-        fig, ax = plt.subplots(3, 1, figsize=(24, 16))
-        halo.intensity_raw.plot(ax[0])
-        halo.doppler_velocity.plot(ax[1])
-        if halo.intensity:
-            halo.intensity.plot(ax[2])
-        writer.add_figure(f"{args.output.stem}", fig)
+        plot_quicklook(
+            args.output.stem,
+            [halo.intensity_raw, halo.doppler_velocity, halo.intensity],
+        )
 
 
 def _haloreader_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
+    _profile_args(parser)
     subparsers = parser.add_subparsers(
         title="subcommands", dest="subcommand", required=True
     )
@@ -134,10 +186,41 @@ def _haloreader_args() -> argparse.Namespace:
             "from_raw", help="Read and background correct raw files into netCDF"
         )
     )
+    _batch_args(
+        subparsers.add_parser(
+            "batch", help="Process several sites and dates from cloudnet in parallel"
+        )
+    )
+    _watch_args(
+        subparsers.add_parser(
+            "watch", help="Keep daily netCDF files up to date with a raw directory"
+        )
+    )
 
     return parser.parse_args()
 
 
+def _profile_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "Print wall time, CPU time and memory usage of processing stages. "
+            "Only stages run in the main process are recorded."
+        ),
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also trace memory allocations of each stage (slow)",
+    )
+    parser.add_argument(
+        "--profile-json",
+        type=Path,
+        help="Write the stage measurements into a JSON file",
+    )
+
+
 def _from_cloudnet_args(parser: argparse.ArgumentParser) -> None:
     parser.add_argument("-p", "--plot", action="store_true")
     parser.add_argument("-s", "--site", type=str, default="warsaw")
@@ -147,6 +230,64 @@ def _from_cloudnet_args(parser: argparse.ArgumentParser) -> None:
         type=datetime.date.fromisoformat,
         default=datetime.date.today() - datetime.timedelta(days=1),
     )
+    _download_cache_args(parser)
+    _amplifier_samples_args(parser)
+    _average_args(parser)
+    _force_args(parser)
+
+
+def _average_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--average",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Average stare profiles to a fixed time grid before processing",
+    )
+
+
+def _amplifier_samples_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--amplifier-samples",
+        type=int,
+        default=DEFAULT_AMPLIFIER_SAMPLES,
+        help=(
+            "Download at most this many background files for the amplifier "
+            "noise profile in addition to those needed for the day "
+            f"(default: {DEFAULT_AMPLIFIER_SAMPLES}, 0 downloads all)"
+        ),
+    )
+
+
+def _force_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="Process even if output is up to date with its inputs",
+    )
+
+
+def _download_cache_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Download cache directory (default: $HALODATA_CACHE_DIR or ./cache)",
+    )
+    parser.add_argument(
+        "--cache-max-bytes",
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help="Evict least recently used downloads above this size "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-max-age",
+        type=float,
+        default=None,
+        help="Evict downloads not used for this many seconds",
+    )
 
 
 def _from_raw_args(parser: argparse.ArgumentParser) -> None:
@@ -159,3 +300,56 @@ def _from_raw_args(parser: argparse.ArgumentParser) -> None:
         help="Raw and background files in an arbitrary order",
     )
     parser.add_argument("-o", "--output", type=Path, required=True)
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Cache parsed raw files into this directory",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=sorted(ENGINES),
+        default=DEFAULT_ENGINE,
+        help=f"Parser of raw and background files (default: {DEFAULT_ENGINE})",
+    )
+    _average_args(parser)
+    _force_args(parser)
+
+
+def _batch_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("-p", "--plot", action="store_true")
+    parser.add_argument("-s", "--sites", type=str, nargs="+", default=[])
+    parser.add_argument("--date-from", type=datetime.date.fromisoformat)
+    parser.add_argument(
+        "--date-to",
+        type=datetime.date.fromisoformat,
+        help="Last date to process (default: --date-from)",
+    )
+    parser.add_argument(
+        "-m",
+        "--manifest",
+        type=Path,
+        help="File with a site and a date on each line",
+    )
+    parser.add_argument("-o", "--output-dir", type=Path, default=Path("."))
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="Number of processes"
+    )
+    _download_cache_args(parser)
+    _amplifier_samples_args(parser)
+    _average_args(parser)
+    _force_args(parser)
+
+
+def _watch_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "directory", type=Path, help="Directory of raw and background files"
+    )
+    parser.add_argument("-o", "--output-dir", type=Path, default=Path("."))
+    parser.add_argument(
+        "-i",
+        "--interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="Polling interval in seconds",
+    )
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import bz2
+import contextlib
+import gzip
+import logging
+import lzma
+import tarfile
+import zipfile
+from enum import Enum
+from io import BufferedIOBase, BytesIO
+from pathlib import Path, PurePosixPath
+from typing import IO, Callable, Iterator, Sequence, TypeAlias
+
+from haloreader.exceptions import UnsupportedCompression
+
+log = logging.getLogger(__name__)
+
+# Longest magic number, bytes read to detect compression
+MAGIC_NBYTES = 6
+TAR_MAGIC_OFFSET = 257
+ARCHIVE_SUFFIXES = (".tar", ".tgz", ".zip")
+# Readable binary file objects, plain or decompressing
+Stream: TypeAlias = IO[bytes] | BufferedIOBase
+# Local file header and end of central directory of an empty zip file
+ZIP_MAGIC = (b"PK\x03\x04", b"PK\x05\x06")
+
+
+class Compression(Enum):
+    GZIP = (b"\x1f\x8b", ".gz")
+    BZIP2 = (b"BZh", ".bz2")
+    XZ = (b"\xfd7zXZ\x00", ".xz")
+    ZSTD = (b"\x28\xb5\x2f\xfd", ".zst")
+
+    def __init__(self, magic: bytes, suffix: str):
+        self.magic = magic
+        self.suffix = suffix
+
+    @classmethod
+    def detect(cls, head: bytes) -> Compression | None:
+        for compression in cls:
+            if head.startswith(compression.magic):
+                return compression
+        return None
+
+
+def strip_compression_suffix(name: str) -> str:
+    """Returns `name` without a compression suffix, e.g. ``.hpl.gz`` -> ``.hpl``."""
+    for compression in Compression:
+        if name.endswith(compression.suffix):
+            return name.removesuffix(compression.suffix)
+    return name
+
+
+def is_archive_name(name: str) -> bool:
+    return strip_compression_suffix(name).endswith(ARCHIVE_SUFFIXES)
+
+
+@contextlib.contextmanager
+def open_decompressed(src: Path | BytesIO) -> Iterator[Stream]:
+    """Opens `src` for reading, decompressing it on the fly if needed.
+
+    Compression is detected from magic bytes, not from the filename. Paths
+    are opened once and in-memory sources are read from their current
+    position and left open.
+    """
+    with contextlib.ExitStack() as stack:
+        f: IO[bytes] = (
+            stack.enter_context(src.open("rb")) if isinstance(src, Path) else src
+        )
+        pos = f.tell()
+        compression = Compression.detect(f.read(MAGIC_NBYTES))
+        f.seek(pos)
+        if compression is None:
+            yield f
+            return
+        log.debug("Decompressing %s (%s)", src, compression.name)
+        stream: Stream = stack.enter_context(_decompressed(f, compression))
+        if compression == Compression.ZSTD:
+            # zstd readers only seek forwards, but the header is found by
+            # reading ahead and seeking back
+            stream = BytesIO(stream.read())
+        yield stream
+
+
+def is_archive(path: Path) -> bool:
+    """Checks for a zip file or a tar file, which may be compressed."""
+    with path.open("rb") as f:
+        head = f.read(TAR_MAGIC_OFFSET + 5)
+        if head.startswith(ZIP_MAGIC):
+            return True
+        if (compression := Compression.detect(head)) is not None:
+            f.seek(0)
+            with _decompressed(f, compression) as stream:
+                head = stream.read(TAR_MAGIC_OFFSET + 5)
+    return head[TAR_MAGIC_OFFSET:] == b"ustar"
+
+
+def iter_archive(path: Path) -> Iterator[tuple[str, BytesIO]]:
+    """Yields the name and content of each file in an archive.
+
+    Members are read directly from the archive without extracting them.
+    Compressed members are left compressed until they are opened with
+    :func:`open_decompressed`. Names are stripped of directories and
+    compression suffixes.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zip_:
+            for info in zip_.infolist():
+                if not info.is_dir():
+                    yield _member(info.filename, zip_.read(info))
+        return
+    with path.open("rb") as f:
+        compression = Compression.detect(f.read(MAGIC_NBYTES))
+        f.seek(0)
+        stream = f if compression is None else _decompressed(f, compression)
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            for tarinfo in tar:
+                if tarinfo.isfile() and (member := tar.extractfile(tarinfo)):
+                    yield _member(tarinfo.name, member.read())
+
+
+def expand_archives(
+    src_files: Sequence[Path | BytesIO],
+    keep: Callable[[str], bool] = lambda _: True,
+) -> Iterator[tuple[str | None, Path | BytesIO]]:
+    """Replaces archives in `src_files` with their members accepted by `keep`.
+
+    Archives are recognised by their suffix, see :data:`ARCHIVE_SUFFIXES`,
+    and checked by content. Yields (name, source) pairs, where name has
+    compression suffixes stripped and is None for in-memory sources.
+    Archive members are read only when they are reached.
+    """
+    for src in src_files:
+        if isinstance(src, BytesIO):
+            yield None, src
+        elif is_archive_name(src.name) and is_archive(src):
+            yield from (
+                (name, member) for name, member in iter_archive(src) if keep(name)
+            )
+        else:
+            yield strip_compression_suffix(src.name), src
+
+
+def _member(name: str, content: bytes) -> tuple[str, BytesIO]:
+    return strip_compression_suffix(PurePosixPath(name).name), BytesIO(content)
+
+
+def _decompressed(fileobj: IO[bytes], compression: Compression) -> BufferedIOBase:
+    match compression:
+        case Compression.GZIP:
+            return gzip.GzipFile(fileobj=fileobj, mode="rb")
+        case Compression.BZIP2:
+            return bz2.BZ2File(fileobj, mode="rb")
+        case Compression.XZ:
+            return lzma.LZMAFile(fileobj, mode="rb")
+        case Compression.ZSTD:
+            try:
+                # pylint: disable=import-outside-toplevel
+                import zstandard
+            except ImportError as err:
+                raise UnsupportedCompression(
+                    "Reading zstd compressed files requires the zstandard package"
+                ) from err
+            reader: BufferedIOBase = zstandard.ZstdDecompressor().stream_reader(fileobj)
+            return reader
+    raise UnsupportedCompression(compression)
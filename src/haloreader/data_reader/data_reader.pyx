@@ -1,18 +1,24 @@
 import numpy as np
 
-from haloreader.exceptions import UnexpectedDataTokens
+from haloreader.exceptions import InconsistentRangeError, UnexpectedDataTokens
 from haloreader.transformer import spectral_width_factory
 from haloreader.variable import Variable
 
-from libc.stdlib cimport atof
+from libc.stdlib cimport atof, free, malloc, strtol
 from libc.string cimport strlen, strspn, strtok
 
 import cython
 
 
 def read_data(data_py: bytes, ngates: cython.ulong, time_vars: list[Variable], time_range_vars: list[Variable]) -> None:
+    """Parses profiles into a separate C-contiguous array for each variable.
+
+    The range gate column is only checked to count 0, 1, ..., ngates - 1 in
+    each profile and its variable is left without data.
+    """
     cdef char * data_c = data_py
     cdef char * token
+    cdef char * end
 
     # Count tokens and nprofiles
     cdef unsigned long ntokens = 0
@@ -32,30 +38,53 @@ def read_data(data_py: bytes, ngates: cython.ulong, time_vars: list[Variable], t
         else:
             raise UnexpectedDataTokens
 
+    cdef long gate_column = -1
+    for i, var in enumerate(time_range_vars):
+        if var.name == "range":
+            gate_column = i
 
-    data_time = np.zeros((nprofiles,ntime_vars), dtype=np.dtype("float"))
-    data_time_range = np.zeros((nprofiles,ngates,ntime_range_vars), dtype=np.dtype("float"))
-    cdef double [:,:] data_time_view = data_time
-    cdef double [:,:,:] data_time_range_view = data_time_range
-
-
+    cdef double ** time_ptrs = <double **> malloc(ntime_vars * sizeof(double *))
+    cdef double ** time_range_ptrs = <double **> malloc(ntime_range_vars * sizeof(double *))
+    if time_ptrs == NULL or time_range_ptrs == NULL:
+        free(time_ptrs)
+        free(time_range_ptrs)
+        raise MemoryError
 
+    cdef double [::1] time_view
+    cdef double [:, ::1] time_range_view
     cdef unsigned long p, tvar, g, trvar
-    token = data_c
-    for p in range(nprofiles):
-        for tvar in range(ntime_vars):
-            data_time_view[p,tvar] = atof(token)
-            token += strlen(token) + 1
-            token += strspn(token, " \r\n")
-        for g in range(ngates):
-            for trvar in range(ntime_range_vars):
-                data_time_range_view[p,g,trvar] = atof(token)
+    try:
+        for tvar, var in enumerate(time_vars):
+            var.data = np.zeros(nprofiles, dtype=np.dtype("float"))
+            var.dimensions = ("time",)
+            if nprofiles > 0:
+                time_view = var.data
+                time_ptrs[tvar] = &time_view[0]
+        for trvar, var in enumerate(time_range_vars):
+            var.dimensions = ("time", "range")
+            if <long> trvar == gate_column:
+                var.data = None
+                continue
+            var.data = np.zeros((nprofiles, ngates), dtype=np.dtype("float"))
+            if nprofiles > 0 and ngates > 0:
+                time_range_view = var.data
+                time_range_ptrs[trvar] = &time_range_view[0, 0]
+
+        token = data_c
+        for p in range(nprofiles):
+            for tvar in range(ntime_vars):
+                time_ptrs[tvar][p] = atof(token)
                 token += strlen(token) + 1
                 token += strspn(token, " \r\n")
-
-    for i,var in enumerate(time_vars):
-        var.data = data_time[:,i]
-        var.dimensions = ("time",)
-    for i,var in enumerate(time_range_vars):
-        var.data = data_time_range[:,:,i]
-        var.dimensions = ("time","range")
+            for g in range(ngates):
+                for trvar in range(ntime_range_vars):
+                    if <long> trvar == gate_column:
+                        if strtol(token, &end, 10) != <long> g:
+                            raise InconsistentRangeError
+                    else:
+                        time_range_ptrs[trvar][p * ngates + g] = atof(token)
+                    token += strlen(token) + 1
+                    token += strspn(token, " \r\n")
+    finally:
+        free(time_ptrs)
+        free(time_range_ptrs)
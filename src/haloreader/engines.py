@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+from haloreader.exceptions import InconsistentRangeError, UnexpectedDataTokens
+from haloreader.transformer import spectral_width_factory
+from haloreader.variable import Variable
+
+try:
+    from haloreader import background_reader, data_reader
+except ImportError:  # Extensions were not built
+    background_reader = data_reader = None  # type: ignore
+
+log = logging.getLogger(__name__)
+
+# Backgrounds without newlines are numbers with six decimals written together
+BACKGROUND_NUMBER_RE = re.compile(rb"-?\d*\.\d{6}")
+
+
+@dataclass(frozen=True, slots=True)
+class Engine:
+    """Parsers of the data section of raw files and of background files."""
+
+    name: str
+    read_data: Callable[[bytes, int, list[Variable], list[Variable]], None]
+    read_background: Callable[[bytes], Variable]
+
+
+def numpy_read_data(
+    data: bytes,
+    ngates: int,
+    time_vars: list[Variable],
+    time_range_vars: list[Variable],
+) -> None:
+    """Parses profiles with NumPy, see the Cython ``read_data``."""
+    tokens = _tokens(data)
+    ntime_vars = len(time_vars)
+    ntime_range_vars = len(time_range_vars)
+    if tokens.size % (ntime_vars + ngates * ntime_range_vars) != 0:
+        # Some files might have extra time_range_var column for spectral width
+        if tokens.size % (ntime_vars + ngates * (ntime_range_vars + 1)) != 0:
+            raise UnexpectedDataTokens
+        ntime_range_vars += 1
+        time_range_vars.append(spectral_width_factory())
+    profiles = tokens.reshape(-1, ntime_vars + ngates * ntime_range_vars)
+    for i, var in enumerate(time_vars):
+        var.data = profiles[:, i].copy()
+        var.dimensions = ("time",)
+    gates = profiles[:, ntime_vars:].reshape(-1, ngates, ntime_range_vars)
+    for i, var in enumerate(time_range_vars):
+        var.dimensions = ("time", "range")
+        if var.name == "range":
+            if np.any(gates[:, :, i] != np.arange(ngates)):
+                raise InconsistentRangeError
+            var.data = None
+        else:
+            var.data = gates[:, :, i].copy()
+
+
+def numpy_read_background(data: bytes) -> Variable:
+    """Parses a background profile with NumPy, see the Cython ``read_background``."""
+    if b"\n" in data:
+        values = _tokens(data)
+    else:
+        values = np.array(BACKGROUND_NUMBER_RE.findall(data), dtype=float)
+    return Variable(
+        name="background",
+        data=values.reshape(1, -1),
+        dimensions=("time", "range"),
+    )
+
+
+def _tokens(data: bytes) -> np.ndarray:
+    try:
+        return np.asarray(data.split(), dtype=float)
+    except ValueError as err:
+        raise UnexpectedDataTokens from err
+
+
+NUMPY_ENGINE = Engine(
+    name="numpy",
+    read_data=numpy_read_data,
+    read_background=numpy_read_background,
+)
+ENGINES = {NUMPY_ENGINE.name: NUMPY_ENGINE}
+if data_reader is not None and background_reader is not None:
+    ENGINES["cython"] = Engine(
+        name="cython",
+        read_data=data_reader.read_data,
+        read_background=background_reader.read_background,
+    )
+DEFAULT_ENGINE = "cython" if "cython" in ENGINES else "numpy"
+
+
+def get_engine(engine: str | Engine | None = None) -> Engine:
+    """Returns an engine by name, the default one (Cython if built) for None."""
+    if isinstance(engine, Engine):
+        return engine
+    name = engine if engine is not None else DEFAULT_ENGINE
+    if name not in ENGINES:
+        raise ValueError(
+            f"Unknown or unavailable engine {name!r}, available: {', '.join(ENGINES)}"
+        )
+    return ENGINES[name]
@@ -32,3 +32,11 @@ class BackgroundReadError(HaloException):
 
 class BackgroundCorrectionError(HaloException):
     pass
+
+
+class ChecksumMismatch(HaloException):
+    pass
+
+
+class UnsupportedCompression(HaloException):
+    pass
@@ -10,8 +10,11 @@ import netCDF4
 import numpy as np
 
 import haloreader.attenuated_backscatter_coefficient
+import haloreader.averaging
 import haloreader.background_correction
 import haloreader.screen
+import haloreader.wind
+from haloreader.instrument import stage
 from haloreader.metadata import Metadata
 from haloreader.type_guards import is_fancy_index, is_ndarray, is_none_list
 from haloreader.utils import CLOUDNET_TIME_UNIT_FMT, UNIX_TIME_FMT, UNIX_TIME_UNIT
@@ -37,7 +40,9 @@ class Halo:
     doppler_velocity_screened: Variable | None = None
     pitch: Variable | None = None
     roll: Variable | None = None
+    wind: haloreader.wind.WindProfile | None = None
 
+    @stage("to_nc")
     def to_nc(
         self,
         nc_map: dict[str, dict] | None = None,
@@ -54,6 +59,7 @@ class Halo:
         raise TypeError
 
     @classmethod
+    @stage("merge")
     def merge(cls, halos: list[Halo]) -> Halo | None:
         if len(halos) == 0:
             return None
@@ -84,6 +90,36 @@ class Halo:
             raise ValueError("Time must be increasing")
         return halo
 
+    def sel(self, time: slice | None = None, range: slice | None = None) -> Halo:
+        # pylint: disable=redefined-builtin
+        """Selects profiles and gates by coordinate values.
+
+        Slice bounds are inclusive and given in the units of `time` and
+        `range` variables. Arrays of the returned Halo are views, so
+        memory-mapped data is not loaded until it is accessed.
+        """
+        index = {
+            self.time.name: _value_slice(self.time, time),
+            self.range.name: _value_slice(self.range, range),
+        }
+        if self.wind is not None:
+            index[self.wind.time.name] = _value_slice(self.wind.time, time)
+        halo_attrs: dict[str, Any] = {}
+        for attr_name in self.__dataclass_fields__.keys():
+            halo_attr = getattr(self, attr_name)
+            if isinstance(halo_attr, Variable):
+                halo_attrs[attr_name] = _sel_variable(halo_attr, index)
+            elif isinstance(halo_attr, haloreader.wind.WindProfile):
+                halo_attrs[attr_name] = haloreader.wind.WindProfile(
+                    **{
+                        name: _sel_variable(getattr(halo_attr, name), index)
+                        for name in halo_attr.__dataclass_fields__.keys()
+                    }
+                )
+            else:
+                halo_attrs[attr_name] = halo_attr
+        return Halo(**halo_attrs)
+
     def remove_profiles_with_duplicate_time(self) -> None:
         if not is_ndarray(self.time.data):
             raise TypeError
@@ -128,42 +164,96 @@ class Halo:
                     raise TypeError
                 halo_attr.data = halo_attr.data[index]
 
+    @stage("average")
+    def average(self, seconds: float) -> None:
+        """Averages profiles in place to a fixed UTC grid of `seconds`.
+
+        Profiles are averaged before background correction, so only stare
+        scans without processed variables are supported. Doppler velocity
+        is weighted with SNR, azimuth is averaged as an angle and time is
+        the centre of each averaging interval.
+        """
+        if self.time.units != UNIX_TIME_UNIT:
+            raise ValueError(f"Unexpected time units: {self.time.units}")
+        if self.metadata.scantype.value not in haloreader.averaging.AVERAGED_SCANTYPES:
+            raise ValueError(f"Cannot average {self.metadata.scantype.value} scans")
+        if any(
+            getattr(self, name) is not None
+            for name in ("intensity", "beta", "beta_screened")
+        ):
+            raise ValueError("Profiles must be averaged before processing")
+        if not is_ndarray(self.intensity_raw.data):
+            raise TypeError
+        bins = haloreader.averaging.TimeBins.from_time(self.time, seconds)
+        snr = np.maximum(self.intensity_raw.data - 1, 0)
+        averaged: dict[str, np.ndarray] = {}
+        for attr_name in self.__dataclass_fields__.keys():
+            var = getattr(self, attr_name)
+            if (
+                not isinstance(var, Variable)
+                or not is_ndarray(var.data)
+                or var.dimensions is None
+                or var.dimensions[:1] != (self.time.name,)
+            ):
+                continue
+            if var is self.time:
+                averaged[attr_name] = bins.centres
+            elif attr_name == "doppler_velocity":
+                averaged[attr_name] = bins.weighted_mean(var.data, snr)
+            elif attr_name == "azimuth":
+                averaged[attr_name] = bins.circular_mean(var.data)
+            else:
+                averaged[attr_name] = bins.mean(var.data)
+        for attr_name, data in averaged.items():
+            getattr(self, attr_name).data = data
+        self.time.comment = f"Centre of {seconds:g} s averaging interval"
+
     def convert_time_unit2cloudnet_time(self) -> None:
         _convert_timevar_unit2cloudnet_time(self.time)
         _convert_timevar_unit2cloudnet_time(self.metadata.start_time)
+        if self.wind is not None:
+            _convert_timevar_unit2cloudnet_time(self.wind.time)
 
     def correct_background(self, halobg: HaloBg) -> None:
         if not is_ndarray(self.range.data):
             raise TypeError
-        halobg_sliced = halobg.slice_range(len(self.range.data))
-        p_amp = halobg_sliced.amplifier_noise()
-        intensity_step1 = (
-            haloreader.background_correction.background_measurement_correction(
-                self.time,
-                self.intensity_raw,
-                halobg_sliced.time,
-                halobg_sliced.background,
-                p_amp,
+        with stage("correct_background.amplifier_noise"):
+            halobg_sliced = halobg.slice_range(len(self.range.data))
+            p_amp = halobg_sliced.amplifier_noise()
+        with stage("correct_background.background_measurement_correction"):
+            intensity_step1 = (
+                haloreader.background_correction.background_measurement_correction(
+                    self.time,
+                    self.intensity_raw,
+                    halobg_sliced.time,
+                    halobg_sliced.background,
+                    p_amp,
+                )
             )
-        )
-        signalmask = haloreader.background_correction.threshold_signalmask(
-            intensity_step1
-        )
-        self.intensity = haloreader.background_correction.snr_correction(
-            intensity_step1, signalmask
-        )
+        with stage("correct_background.threshold_signalmask"):
+            signalmask = haloreader.background_correction.threshold_signalmask(
+                intensity_step1
+            )
+        with stage("correct_background.snr_correction") as stage_:
+            self.intensity = haloreader.background_correction.snr_correction(
+                intensity_step1, signalmask
+            )
+            stage_.record(self.intensity.data)
 
     def compute_beta(self) -> None:
         if not isinstance(self.intensity, Variable):
             raise TypeError
         log.warning("beta is computed using placeholder values")
-        self.beta = haloreader.attenuated_backscatter_coefficient.compute_beta(
-            self.intensity,
-            self.range,
-            self.metadata.focus_range,
-            self.metadata.wavelength,
-        )
+        with stage("compute_beta") as stage_:
+            self.beta = haloreader.attenuated_backscatter_coefficient.compute_beta(
+                self.intensity,
+                self.range,
+                self.metadata.focus_range,
+                self.metadata.wavelength,
+            )
+            stage_.record(self.beta.data)
 
+    @stage("compute_noise_screen")
     def compute_noise_screen(self) -> Variable:
         if not isinstance(self.intensity, Variable):
             raise TypeError
@@ -196,6 +286,57 @@ class Halo:
             data=np.ma.masked_array(self.doppler_velocity.data, mask=screen.data),
         )
 
+    def compute_wind_profile(self, screen: Variable | None = None) -> None:
+        """Retrieves wind from the radial velocities of VAD scans.
+
+        Gates flagged in `screen` are left out, see
+        :func:`haloreader.wind.compute_wind_profile`.
+        """
+        if self.metadata.scantype.value not in haloreader.wind.WIND_SCANTYPES:
+            raise ValueError(
+                f"Cannot retrieve wind from {self.metadata.scantype.value} scans"
+            )
+        if self.metadata.nrays is None or not isinstance(self.metadata.nrays.data, int):
+            raise ValueError("Number of rays per scan is unknown")
+        with stage("compute_wind_profile") as stage_:
+            self.wind = haloreader.wind.compute_wind_profile(
+                self.time,
+                self.azimuth,
+                self.elevation,
+                self.doppler_velocity,
+                self.metadata.nrays.data,
+                screen=screen,
+            )
+            stage_.record(self.wind.uwind.data)
+
+
+def _sel_variable(var: Variable, index: dict[str, slice]) -> Variable:
+    if not is_ndarray(var.data) or not isinstance(var.dimensions, tuple):
+        return var
+    return Variable.like(
+        var, data=var.data[tuple(index.get(d, slice(None)) for d in var.dimensions)]
+    )
+
+
+def _value_slice(var: Variable, slice_: slice | None) -> slice:
+    if slice_ is None:
+        return slice(None)
+    if slice_.step is not None:
+        raise ValueError("Slice step is not supported")
+    if not is_ndarray(var.data):
+        raise TypeError
+    start = (
+        int(np.searchsorted(var.data, slice_.start, side="left"))
+        if slice_.start is not None
+        else None
+    )
+    stop = (
+        int(np.searchsorted(var.data, slice_.stop, side="right"))
+        if slice_.stop is not None
+        else None
+    )
+    return slice(start, stop)
+
 
 def _convert_timevar_unit2cloudnet_time(var: Variable) -> None:
     """Converts time variable to cloudnet format.
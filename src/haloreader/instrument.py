@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+
+@dataclass(slots=True)
+class StageRecord:
+    """Aggregated measurements of a pipeline stage.
+
+    Times and array sizes are summed over calls. `peak_rss_increase` is the
+    largest increase of the process RSS high-water mark during a single
+    call, so it stays zero for stages that do not raise the peak of earlier
+    ones. `traced_peak` is the largest increase of traced memory during a
+    single call.
+    """
+
+    name: str
+    calls: int = 0
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    peak_rss_increase: int = 0
+    traced_peak: int | None = None
+    nbytes: int = 0
+
+
+@dataclass(slots=True)
+class _Frame:
+    record: StageRecord
+    rss_start: int = 0
+    traced_start: int = 0
+    traced_max: int = 0
+    nbytes: int = 0
+
+
+@dataclass(slots=True)
+class StageContext:
+    frame: _Frame | None = None
+
+    def record(self, *arrays: object) -> None:
+        """Adds the size of the arrays a stage produced, other values are ignored."""
+        if self.frame is not None:
+            self.frame.nbytes += sum(
+                a.nbytes for a in arrays if isinstance(a, np.ndarray)
+            )
+
+
+class Profiler:
+    """Registry of per-stage wall time, CPU time and memory usage.
+
+    Stages are recorded only while the profiler is enabled. Memory
+    allocations are traced with :mod:`tracemalloc` if `trace_memory` is
+    set, which slows processing down noticeably.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.records: dict[str, StageRecord] = {}
+        self._stack: list[_Frame] = []
+
+    def enable(self, trace_memory: bool = False) -> None:
+        self.enabled = True
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self) -> None:
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def reset(self) -> None:
+        self.records = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[StageContext]:
+        if not self.enabled:
+            yield StageContext()
+            return
+        record = self.records.setdefault(name, StageRecord(name=name))
+        frame = _Frame(record=record, rss_start=_peak_rss())
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent.traced_max = max(parent.traced_max, peak)
+            tracemalloc.reset_peak()
+            frame.traced_start = frame.traced_max = current
+        self._stack.append(frame)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield StageContext(frame)
+        finally:
+            record.wall_time += time.perf_counter() - wall_start
+            record.cpu_time += time.process_time() - cpu_start
+            record.calls += 1
+            record.nbytes += frame.nbytes
+            record.peak_rss_increase = max(
+                record.peak_rss_increase, _peak_rss() - frame.rss_start
+            )
+            self._stack.pop()
+            if tracemalloc.is_tracing():
+                _, peak = tracemalloc.get_traced_memory()
+                frame.traced_max = max(frame.traced_max, peak)
+                record.traced_peak = max(
+                    record.traced_peak or 0, frame.traced_max - frame.traced_start
+                )
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent.traced_max = max(parent.traced_max, frame.traced_max)
+
+    def table(self) -> str:
+        width = max([len("stage"), *(len(name) for name in self.records)]) + 2
+        header = (
+            f"{'stage':<{width}}{'calls':>7}{'wall (s)':>11}{'cpu (s)':>11}"
+            f"{'rss+ (MiB)':>11}{'traced (MiB)':>14}{'arrays (MiB)':>14}"
+        )
+        lines = [header, "-" * len(header)]
+        for rec in self.records.values():
+            traced = f"{rec.traced_peak / 2**20:.1f}" if rec.traced_peak else "-"
+            lines.append(
+                f"{rec.name:<{width}}{rec.calls:>7}{rec.wall_time:>11.3f}"
+                f"{rec.cpu_time:>11.3f}{rec.peak_rss_increase / 2**20:>11.1f}"
+                f"{traced:>14}{rec.nbytes / 2**20:>14.1f}"
+            )
+        return "\n".join(lines)
+
+    def to_json(self) -> str:
+        return json.dumps([asdict(rec) for rec in self.records.values()], indent=2)
+
+    def dump(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8") as f:
+            f.write(self.to_json())
+
+
+def _peak_rss() -> int:
+    if resource is None:
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return int(maxrss if sys.platform == "darwin" else maxrss * 1024)
+
+
+PROFILER = Profiler()
+stage = PROFILER.stage
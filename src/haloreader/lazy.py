@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Sequence
+
+from haloreader.cache import ParseCache
+from haloreader.halo import Halo
+from haloreader.read import (
+    SKIPPABLE_ERRORS,
+    merge_halos,
+    read_metadata,
+    read_single_cached,
+)
+from haloreader.type_guards import is_ndarray
+
+log = logging.getLogger(__name__)
+
+# Profile timestamps can precede the start time written in the header
+START_TIME_MARGIN = 60.0
+# Parsed files kept in memory, about a day of hourly files
+DEFAULT_MAX_LOADED = 24
+
+
+@dataclass(slots=True)
+class _LazyEntry:
+    src: Path | BytesIO
+    start_time: float
+    end_time: float
+    halo: Halo | None = None
+    failed: bool = False
+
+
+class LazyHalo:
+    """Halo whose raw files are parsed on first access.
+
+    Only headers are read on construction. :meth:`sel` parses (or loads
+    from the cache) just the files that overlap the requested time window.
+    At most `max_loaded` parsed files are kept, least recently used ones
+    are dropped and parsed again when they are needed.
+    """
+
+    def __init__(
+        self,
+        src_files: Sequence[Path | BytesIO],
+        cache: ParseCache | None = None,
+        max_loaded: int = DEFAULT_MAX_LOADED,
+    ):
+        self.cache = cache
+        self.max_loaded = max_loaded
+        self._loaded: OrderedDict[int, _LazyEntry] = OrderedDict()
+        starts = []
+        for src in src_files:
+            try:
+                metadata = read_metadata(src)
+            except SKIPPABLE_ERRORS as err:
+                log.warning("Skipping file", exc_info=err)
+                continue
+            if not is_ndarray(metadata.start_time.data):
+                raise TypeError
+            starts.append((float(metadata.start_time.data[0]), src))
+        starts.sort(key=lambda start_src: start_src[0])
+        self._entries = [
+            _LazyEntry(
+                src=src,
+                start_time=start,
+                end_time=starts[i + 1][0] if i + 1 < len(starts) else float("inf"),
+            )
+            for i, (start, src) in enumerate(starts)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nloaded(self) -> int:
+        return len(self._loaded)
+
+    def sel(self, time: slice | None = None, range: slice | None = None) -> Halo | None:
+        # pylint: disable=redefined-builtin
+        """Loads profiles within `time` and gates within `range`.
+
+        Time bounds are unix timestamps and range bounds are metres.
+        """
+        if time is not None and time.step is not None:
+            raise ValueError("Slice step is not supported")
+        t_start = time.start if time is not None and time.start is not None else None
+        t_stop = time.stop if time is not None and time.stop is not None else None
+        halos = []
+        for i, entry in enumerate(self._entries):
+            if t_start is not None and entry.end_time + START_TIME_MARGIN < t_start:
+                continue
+            if t_stop is not None and entry.start_time - START_TIME_MARGIN > t_stop:
+                continue
+            halo = self._load(i)
+            if halo is None:
+                continue
+            halo = halo.sel(time=time, range=range)
+            if is_ndarray(halo.time.data) and len(halo.time.data) > 0:
+                halos.append(halo)
+        return merge_halos(halos)
+
+    def load(self) -> Halo | None:
+        return self.sel()
+
+    def _load(self, i: int) -> Halo | None:
+        entry = self._entries[i]
+        if entry.halo is not None:
+            self._loaded.move_to_end(i)
+        elif not entry.failed:
+            if isinstance(entry.src, BytesIO):
+                entry.src.seek(0)
+            try:
+                entry.halo = read_single_cached(entry.src, self.cache)
+            except SKIPPABLE_ERRORS as err:
+                log.warning("Skipping file", exc_info=err)
+                entry.failed = True
+                return None
+            self._loaded[i] = entry
+            while len(self._loaded) > self.max_loaded:
+                _, evicted = self._loaded.popitem(last=False)
+                evicted.halo = None
+        return entry.halo
+
+
+def read_lazy(
+    src_files: Sequence[Path | BytesIO],
+    cache: ParseCache | None = None,
+    max_loaded: int = DEFAULT_MAX_LOADED,
+) -> LazyHalo:
+    return LazyHalo(src_files, cache=cache, max_loaded=max_loaded)
@@ -0,0 +1,56 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+from haloreader.version import __version__
+
+log = logging.getLogger(__name__)
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def build_manifest(inputs: dict[str, str], options: dict[str, Any]) -> dict:
+    """Describes everything a product depends on.
+
+    `inputs` maps input file names to content hashes.
+    """
+    return {
+        "haloreader_version": __version__,
+        "options": options,
+        "inputs": dict(sorted(inputs.items())),
+    }
+
+
+def file_digest(path: Path) -> str:
+    hash_ = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            hash_.update(chunk)
+    return hash_.hexdigest()
+
+
+def manifest_path(output: Path) -> Path:
+    return output.with_name(output.name + MANIFEST_SUFFIX)
+
+
+def is_up_to_date(output: Path, manifest: dict) -> bool:
+    """Checks if `output` was created from the inputs in `manifest`."""
+    path = manifest_path(output)
+    if not (output.exists() and path.exists()):
+        return False
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return bool(json.load(f) == manifest)
+    except (OSError, json.JSONDecodeError):
+        return False
+
+
+def write_manifest(output: Path, manifest: dict) -> None:
+    path = manifest_path(output)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import contextlib
+import datetime
+import logging
+import os
+from dataclasses import dataclass
+from enum import Enum, auto
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from halodata.background_plan import DEFAULT_AMPLIFIER_SAMPLES
+from haloreader.averaging import AVERAGED_SCANTYPES
+from haloreader.halo import Halo, HaloBg
+from haloreader.manifest import build_manifest, is_up_to_date, write_manifest
+from haloreader.quicklook import Quicklook, quicklook_executor, submit_quicklook
+from haloreader.variable import Variable
+from haloreader.wind import WIND_SCANTYPES
+
+if TYPE_CHECKING:
+    from halodata.cache import DownloadCache
+
+log = logging.getLogger(__name__)
+
+# Profiles on either side that affect the processing of a profile: the
+# signal mask filters reach 18 profiles (median kernel 5, gaussian radius 16)
+# and the noise screen smooths the corrected intensity over 10 more
+PROCESSING_REACH = 28
+
+
+@dataclass(frozen=True, slots=True)
+class ProcessOptions:
+    plot: bool = False
+    force: bool = False
+    # Processes rendering quick-look panels, defaults to one per panel
+    plot_workers: int | None = None
+    # Background files for the amplifier noise profile, None uses all
+    amplifier_samples: int | None = DEFAULT_AMPLIFIER_SAMPLES
+    # Seconds to average profiles over, None keeps the full resolution
+    average: float | None = None
+
+    def manifest_options(self) -> dict[str, Any]:
+        """Options that affect the netCDF product."""
+        return {"amplifier_samples": self.amplifier_samples, "average": self.average}
+
+
+class ProcessStatus(Enum):
+    PROCESSED = auto()
+    NO_DATA = auto()
+    UP_TO_DATE = auto()
+
+
+def process_cloudnet(
+    site: str,
+    date: datetime.date,
+    output: Path,
+    cache: DownloadCache | None = None,
+    options: ProcessOptions | None = None,
+) -> ProcessStatus:
+    """Creates a netCDF product from Cloudnet raw files.
+
+    Processing is skipped if `output` was created with the same inputs,
+    haloreader version and options, unless `options.force` is set.
+    """
+    # pylint: disable=import-outside-toplevel
+    from halodata.datasets import Session, get_cloudnet_records, read_cloudnet_records
+
+    options = options if options is not None else ProcessOptions()
+    session = Session()
+    records = get_cloudnet_records(
+        site,
+        date,
+        session=session,
+        cache=cache,
+        amplifier_samples=options.amplifier_samples,
+    )
+    if not records.halo:
+        log.warning("No data from %s on %s", site, date)
+        return ProcessStatus.NO_DATA
+    manifest = build_manifest(records.checksums(), options.manifest_options())
+    if not options.force and is_up_to_date(output, manifest):
+        log.info("%s is up to date", output)
+        return ProcessStatus.UP_TO_DATE
+    halo, halobg = read_cloudnet_records(records, session=session, cache=cache)
+    if halo is None:
+        log.warning("No data from %s on %s", site, date)
+        return ProcessStatus.NO_DATA
+    if halobg is None:
+        raise TypeError
+    if options.average is not None:
+        if halo.metadata.scantype.value in AVERAGED_SCANTYPES:
+            halo.average(options.average)
+        else:
+            log.warning("Not averaging %s scans", halo.metadata.scantype.value)
+    process(halo, halobg)
+    _write_products(halo, output, manifest, options)
+    return ProcessStatus.PROCESSED
+
+
+def _write_products(
+    halo: Halo, output: Path, manifest: dict, options: ProcessOptions
+) -> None:
+    with contextlib.ExitStack() as stack:
+        quicklook: Quicklook | None = None
+        if options.plot:
+            # Panels are rendered while the netCDF file is written
+            log.info("Create plots")
+            variables = _quicklook_variables(halo)
+            executor = stack.enter_context(
+                quicklook_executor(variables, options.plot_workers)
+            )
+            quicklook = submit_quicklook(executor, output.stem, variables)
+        write_nc(halo, output)
+        write_manifest(output, manifest)
+        if quicklook is not None:
+            quicklook.write()
+
+
+def process(halo: Halo, halobg: HaloBg) -> None:
+    """Background corrects, computes beta and screens `halo` in place.
+
+    Wind is retrieved from VAD scans.
+    """
+    screen = process_profiles(halo, halobg)
+    if halo.metadata.scantype.value in WIND_SCANTYPES:
+        log.info("Compute wind profile")
+        halo.compute_wind_profile(screen)
+    log.info("Convert timeunits")
+    halo.convert_time_unit2cloudnet_time()
+
+
+def process_profiles(halo: Halo, halobg: HaloBg) -> Variable:
+    """Background corrects, computes beta and screens profiles in place.
+
+    Returns the noise screen. A profile is affected only by profiles at
+    most :data:`PROCESSING_REACH` profiles away from it.
+    """
+    log.info("Correct background")
+    halo.correct_background(halobg)
+    log.info("Compute beta")
+    halo.compute_beta()
+    log.info("Compute noise screen")
+    screen = halo.compute_noise_screen()
+    log.info("Compute screened beta")
+    halo.compute_beta_screened(screen)
+    log.info("Compute screened doppler velocity")
+    halo.compute_doppler_velocity_screened(screen)
+    return screen
+
+
+def write_nc(halo: Halo, output: Path) -> None:
+    """Writes a netCDF file atomically, readers never see a partial file."""
+    log.info("Create netCDF")
+    nc_buff = halo.to_nc()
+    tmp_output = output.with_name(f".{output.name}.tmp")
+    with tmp_output.open("wb") as f:
+        f.write(nc_buff)
+    os.replace(tmp_output, output)
+
+
+def _quicklook_variables(halo: Halo) -> list[Variable | None]:
+    return [
+        halo.intensity_raw,
+        halo.doppler_velocity,
+        halo.intensity,
+        halo.beta,
+        halo.beta_screened,
+        halo.doppler_velocity_screened,
+    ]
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Sequence
+
+import numpy as np
+
+from haloreader.variable import DataType, Variable
+
+log = logging.getLogger(__name__)
+
+PANEL_SIZE = (24.0, 6.0)
+PANEL_DPI = 100
+
+
+@dataclass(slots=True)
+class Quicklook:
+    """Panels of a quick-look figure that are being rendered."""
+
+    name: str
+    panels: list[Future[np.ndarray]] = field(default_factory=list)
+
+    def result(self) -> np.ndarray:
+        """Waits for the panels and stacks them into one RGBA image."""
+        return np.concatenate([panel.result() for panel in self.panels], axis=0)
+
+    def write(self, root: str | None = None) -> None:
+        # pylint: disable=import-outside-toplevel
+        from haloboard.writer import Writer
+
+        writer = Writer() if root is None else Writer(root)
+        writer.add_image(self.name, self.result())
+
+
+def submit_quicklook(
+    executor: Executor, name: str, variables: Sequence[Variable | None]
+) -> Quicklook:
+    """Starts rendering a panel of each variable in `executor`.
+
+    Missing variables are skipped. Only the name and the data of a
+    variable are sent to the executor. Panels are rendered with the Agg
+    backend, so worker processes do not need a display.
+    """
+    quicklook = Quicklook(name=name)
+    for variable in variables:
+        if variable is not None:
+            quicklook.panels.append(
+                executor.submit(render_panel, variable.name, variable.data)
+            )
+    return quicklook
+
+
+def plot_quicklook(
+    name: str, variables: Sequence[Variable | None], workers: int | None = None
+) -> None:
+    """Renders panels in worker processes and writes them as one image."""
+    with quicklook_executor(variables, workers) as executor:
+        submit_quicklook(executor, name, variables).write()
+
+
+def quicklook_executor(
+    variables: Sequence[Variable | None], workers: int | None = None
+) -> Executor:
+    """Creates a process pool for rendering panels of `variables`.
+
+    Panels are rendered in-process if only one worker would be used.
+    """
+    npanels = sum(variable is not None for variable in variables)
+    nworkers = min(npanels, workers or os.cpu_count() or 1)
+    if nworkers <= 1:
+        return _InProcessExecutor()
+    return ProcessPoolExecutor(max_workers=nworkers)
+
+
+def render_panel(name: str, data: DataType) -> np.ndarray:
+    # pylint: disable=import-outside-toplevel
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=PANEL_SIZE, dpi=PANEL_DPI)
+    canvas = FigureCanvasAgg(fig)
+    Variable(name=name, data=data).plot(fig.add_subplot())
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba()).copy()
+
+
+class _InProcessExecutor(Executor):
+    """Runs submitted calls immediately, used when a pool does not pay off."""
+
+    def submit(self, fn, /, *args, **kwargs):  # type: ignore
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            future.set_exception(err)
+        return future
@@ -1,22 +1,36 @@
+import functools
 import logging
+import os
 import pkgutil
 import re
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from io import BufferedReader, BytesIO
+from io import BytesIO
 from pathlib import Path
-from typing import Sequence
+from typing import Any, Callable, Iterator, Sequence
 
 import lark
 import numpy as np
 import numpy.typing as npt
 from lark.exceptions import UnexpectedInput
 
-from haloreader.background_reader import read_background
-from haloreader.data_reader import read_data
+from haloreader.averaging import AVERAGED_SCANTYPES
+from haloreader.cache import ParseCache
+from haloreader.compression import (
+    Stream,
+    expand_archives,
+    open_decompressed,
+    strip_compression_suffix,
+)
+from haloreader.engines import Engine, get_engine
 from haloreader.exceptions import BackgroundReadError
 from haloreader.halo import Halo, HaloBg
+from haloreader.instrument import stage
 from haloreader.metadata import Metadata
+from haloreader.scantype import ScanType
+from haloreader.shared import Shared, share
 from haloreader.utils import UNIX_TIME_UNIT
 from haloreader.variable import Variable
 
@@ -30,46 +44,212 @@ from .transformer import HeaderTransformer
 
 log = logging.getLogger(__name__)
 
-grammar_header = pkgutil.get_data("haloreader", "grammar_header.lark")
-if not isinstance(grammar_header, bytes):
-    raise FileNotFoundError("Header grammar file not found")
-header_parser = lark.Lark(
-    grammar_header.decode(), parser="lalr", transformer=HeaderTransformer()
+# Files raising these are skipped with a warning instead of failing the read
+SKIPPABLE_ERRORS = (
+    FileEmpty,
+    HeaderNotFound,
+    InconsistentRangeError,
+    UnicodeDecodeError,
+    UnexpectedInput,
+    UnexpectedDataTokens,
 )
 
 
-def _read_single(src: Path | BytesIO) -> Halo:
-    header_end, header_bytes = _read_header(src)
-    metadata, time_vars, time_range_vars, range_func = header_parser.parse(
-        header_bytes.decode()
+@functools.cache
+def header_parser() -> lark.Lark:
+    grammar_header = pkgutil.get_data("haloreader", "grammar_header.lark")
+    if not isinstance(grammar_header, bytes):
+        raise FileNotFoundError("Header grammar file not found")
+    return lark.Lark(
+        grammar_header.decode(), parser="lalr", transformer=HeaderTransformer()
     )
-    log.info("Reading data from %s", metadata.filename.value)
-    data_bytes = _read_data(src, header_end)
-    if not isinstance(metadata.ngates.data, int):
-        raise TypeError
-    read_data(data_bytes, metadata.ngates.data, time_vars, time_range_vars)
-    vars_ = {var.name: var for var in time_vars + time_range_vars}
-    if not _range_consistent(vars_["range"]):
-        raise InconsistentRangeError
+
+
+def read_single(src: Path | BytesIO, engine: str | Engine | None = None) -> Halo:
+    with stage("read_single"), open_decompressed(src) as stream:
+        header_end, header_bytes = read_header(stream)
+        with stage("read_single.parse_header"):
+            metadata, time_vars, time_range_vars, range_func = header_parser().parse(
+                header_bytes.decode()
+            )
+        log.info("Reading data from %s", metadata.filename.value)
+        data_bytes = _read_data(stream, header_end)
+        if not isinstance(metadata.ngates.data, int):
+            raise TypeError
+        with stage("read_single.read_data") as stage_:
+            get_engine(engine).read_data(
+                data_bytes, metadata.ngates.data, time_vars, time_range_vars
+            )
+            stage_.record(*(var.data for var in time_vars + time_range_vars))
+        return build_halo(metadata, time_vars + time_range_vars, range_func)
+
+
+def build_halo(
+    metadata: Metadata,
+    vars_list: list[Variable],
+    range_func: Callable[[Variable, Variable], Variable],
+) -> Halo:
+    vars_: dict[str, Any] = {var.name: var for var in vars_list}
     vars_["time"] = _decimaltime2timestamp(vars_["time"], metadata)
-    vars_["range"] = range_func(vars_["range"], metadata.gate_range)
+    vars_["range"] = range_func(metadata.ngates, metadata.gate_range)
     return Halo(metadata=metadata, **vars_)
 
 
-def read(src_files: Sequence[Path | BytesIO]) -> Halo | None:
+def read(
+    src_files: Sequence[Path | BytesIO],
+    cache: ParseCache | None = None,
+    engine: str | Engine | None = None,
+    average: float | None = None,
+) -> Halo | None:
+    """Reads and merges raw files.
+
+    `engine` selects the parser of the data section, see
+    :func:`haloreader.engines.get_engine`. Stare profiles are averaged to
+    a fixed grid of `average` seconds after merging, see :meth:`Halo.average`.
+    """
+    engine = get_engine(engine)
     halos = []
-    for src in src_files:
+    for _, src in expand_archives(src_files, keep=_is_hpl_filename):
+        try:
+            halos.append(read_single_cached(src, cache, engine))
+        except SKIPPABLE_ERRORS as err:
+            log.warning("Skipping file", exc_info=err)
+    halo = merge_halos(halos)
+    if halo is not None and average is not None:
+        if halo.metadata.scantype.value in AVERAGED_SCANTYPES:
+            halo.average(average)
+        else:
+            log.warning("Not averaging %s scans", halo.metadata.scantype.value)
+    return halo
+
+
+@dataclass(frozen=True, slots=True)
+class GroupKey:
+    """Configuration shared by raw files that can be merged together."""
+
+    scantype: ScanType
+    ngates: int
+    gate_range: float
+    gate_length: int
+    spectral_width: bool
+
+
+def read_grouped(
+    src_files: Sequence[Path | BytesIO],
+    cache: ParseCache | None = None,
+    engine: str | Engine | None = None,
+    *,
+    average: float | None = None,
+    workers: int | None = None,
+) -> dict[GroupKey, Halo]:
+    """Reads raw files and merges them separately for each configuration.
+
+    Files are grouped by their headers before parsing, see
+    :class:`GroupKey`, so unlike :func:`read` no file is parsed only to be
+    dropped. Files are parsed in a pool of `workers` processes, which hand
+    the profiles back in shared memory. Groups are returned in the order
+    of their first file. Only stare groups are averaged with `average`.
+    """
+    engine = get_engine(engine)
+    groups: dict[GroupKey, list[Path | BytesIO]] = {}
+    for _, src in expand_archives(src_files, keep=_is_hpl_filename):
         try:
-            halos.append(_read_single(src))
-        except (
-            FileEmpty,
-            HeaderNotFound,
-            InconsistentRangeError,
-            UnicodeDecodeError,
-            UnexpectedInput,
-            UnexpectedDataTokens,
-        ) as err:
+            key = _read_group_key(src)
+        except SKIPPABLE_ERRORS as err:
             log.warning("Skipping file", exc_info=err)
+            continue
+        groups.setdefault(key, []).append(src)
+    srcs = [src for group in groups.values() for src in group]
+    halo_iter = iter(_read_parallel(srcs, cache, engine, workers))
+    halos: dict[GroupKey, Halo] = {}
+    for key, group in groups.items():
+        group_halos = [halo for _ in group if (halo := next(halo_iter)) is not None]
+        log.info("Merging %d %s files", len(group_halos), key.scantype)
+        if (halo := Halo.merge(group_halos)) is None:
+            continue
+        if average is not None and key.scantype in AVERAGED_SCANTYPES:
+            halo.average(average)
+        halos[key] = halo
+    return halos
+
+
+def _read_group_key(src: Path | BytesIO) -> GroupKey:
+    metadata, _, time_range_vars, _ = _parse_header_only(src)
+    if (
+        not isinstance(metadata.scantype.value, ScanType)
+        or not isinstance(metadata.ngates.data, int)
+        or not isinstance(metadata.gate_range.data, float)
+        or not isinstance(metadata.gate_length.data, int)
+    ):
+        raise TypeError
+    # The column is found in the data if only the instrument spectral width
+    # is in the header
+    spectral_width = metadata.instrument_spectral_width is not None or any(
+        var.name == "spectral_width" for var in time_range_vars
+    )
+    return GroupKey(
+        scantype=metadata.scantype.value,
+        ngates=metadata.ngates.data,
+        gate_range=metadata.gate_range.data,
+        gate_length=metadata.gate_length.data,
+        spectral_width=spectral_width,
+    )
+
+
+def _read_parallel(
+    srcs: list[Path | BytesIO],
+    cache: ParseCache | None,
+    engine: Engine,
+    workers: int | None,
+) -> list[Halo | None]:
+    nworkers = min(len(srcs), workers or os.cpu_count() or 1)
+    if nworkers <= 1:
+        return [_read_or_skip(src, cache, engine) for src in srcs]
+    halos: list[Halo | None] = []
+    with ProcessPoolExecutor(max_workers=nworkers) as executor:
+        futures = [
+            executor.submit(_read_shared, src, cache, engine.name) for src in srcs
+        ]
+        try:
+            for future in futures:
+                shared = future.result()
+                halos.append(shared.attach() if shared is not None else None)
+        except BaseException:
+            # Blocks are not in the resource tracker, so results that were
+            # not attached yet would stay in shared memory
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            for future in futures[len(halos) :]:
+                if not future.cancelled() and future.exception() is None:
+                    if (shared := future.result()) is not None:
+                        shared.unlink()
+            raise
+    return halos
+
+
+def _read_shared(
+    src: Path | BytesIO, cache: ParseCache | None, engine: str
+) -> Shared[Halo] | None:
+    halo = _read_or_skip(src, cache, engine)
+    return share(halo) if halo is not None else None
+
+
+def _read_or_skip(
+    src: Path | BytesIO, cache: ParseCache | None, engine: str | Engine
+) -> Halo | None:
+    try:
+        return read_single_cached(src, cache, engine)
+    except SKIPPABLE_ERRORS as err:
+        log.warning("Skipping file", exc_info=err)
+        return None
+
+
+def _is_hpl_filename(name: str) -> bool:
+    return name.endswith(".hpl")
+
+
+def merge_halos(halos: list[Halo]) -> Halo | None:
     log.info("Merging files")
     _most_common_ngates = Counter(
         halo.metadata.ngates.data
@@ -82,36 +262,53 @@ def read(src_files: Sequence[Path | BytesIO]) -> Halo | None:
     )
 
 
-def _range_consistent(range_var: Variable) -> bool:
-    if not isinstance(range_var.dimensions, tuple):
-        raise TypeError
-    if not isinstance(range_var.data, np.ndarray):
-        raise TypeError
-    if len(range_var.dimensions) != 2 or range_var.dimensions[1] != "range":
-        return False
-    expected_range = np.arange(range_var.data.shape[1], dtype=range_var.data.dtype)
-    if all(np.allclose(expected_range, r) for r in range_var.data):
-        return True
-    return False
+def read_single_cached(
+    src: Path | BytesIO,
+    cache: ParseCache | None,
+    engine: str | Engine | None = None,
+) -> Halo:
+    if cache is None or not isinstance(src, Path):
+        return read_single(src, engine)
+    key = cache.key(src)
+    if (halo := cache.load(key)) is not None:
+        return halo
+    halo = read_single(src, engine)
+    cache.store(key, halo)
+    return halo
 
 
 def read_bg(
-    src_files: Sequence[Path | BytesIO], filenames: list[str] | None = None
+    src_files: Sequence[Path | BytesIO],
+    filenames: list[str] | None = None,
+    engine: str | Engine | None = None,
 ) -> HaloBg | None:
-    halobgs = []
-    for src, fname in _bg_src_fname_list(src_files, filenames):
-        bg_bytes = _read_background(src)
-        background = read_background(bg_bytes)
-        if not isinstance(background.data, np.ndarray):
-            raise BackgroundReadError
-        time = _bgfname2timevar(fname)
-        range_ = Variable(
-            name="range",
-            units="index",
-            dimensions=("range",),
-            data=np.arange(background.data.shape[1]),
-        )
-        halobgs.append(HaloBg(time=time, background=background, range=range_))
+    engine = get_engine(engine)
+    halobgs = [
+        read_single_bg(src, fname, engine)
+        for src, fname in _iter_bg_sources(src_files, filenames)
+    ]
+    return merge_halobgs(halobgs)
+
+
+def read_single_bg(
+    src: Path | BytesIO, fname: str, engine: str | Engine | None = None
+) -> HaloBg:
+    with open_decompressed(src) as stream:
+        bg_bytes = stream.read()
+    background = get_engine(engine).read_background(bg_bytes)
+    if not isinstance(background.data, np.ndarray):
+        raise BackgroundReadError
+    time = bgfname2timevar(strip_compression_suffix(fname))
+    range_ = Variable(
+        name="range",
+        units="index",
+        dimensions=("range",),
+        data=np.arange(background.data.shape[1]),
+    )
+    return HaloBg(time=time, background=background, range=range_)
+
+
+def merge_halobgs(halobgs: list[HaloBg]) -> HaloBg | None:
     _most_common_ngates = Counter(
         bg.background.data.shape[1]
         for bg in halobgs
@@ -129,7 +326,7 @@ def read_bg(
     )
 
 
-def _bgfname2timevar(fname: str) -> Variable:
+def bgfname2timevar(fname: str) -> Variable:
     if match_ := re.match(
         r"^Background_(\d{2})(\d{2})(\d{2})-(\d{2})(\d{2})(\d{2})\.txt$", fname
     ):
@@ -157,18 +354,18 @@ def _bgfname2timevar(fname: str) -> Variable:
     raise BackgroundReadError(f"Unexpected time format in filename: {fname}")
 
 
-def _bg_src_fname_list(
+def _iter_bg_sources(
     src_files: Sequence[Path | BytesIO], filenames: list[str] | None
-) -> Sequence[tuple[Path | BytesIO, str]]:
-    src_fname_list: list[tuple[Path | BytesIO, str]] = []
-    for i, src in enumerate(src_files):
-        if isinstance(src, BytesIO):
-            if filenames is None or len(filenames) != len(src_files):
-                raise BackgroundReadError
-            src_fname_list.append((src, filenames[i]))
-        else:
-            src_fname_list.append((src, src.name))
-    return src_fname_list
+) -> Iterator[tuple[Path | BytesIO, str]]:
+    if filenames is not None:
+        if len(filenames) != len(src_files):
+            raise BackgroundReadError
+        yield from zip(src_files, filenames)
+        return
+    for fname, src in expand_archives(src_files, keep=HaloBg.is_bgfilename):
+        if fname is None:
+            raise BackgroundReadError
+        yield src, fname
 
 
 def _decimaltime2timestamp(time: Variable, metadata: Metadata) -> Variable:
@@ -212,25 +409,34 @@ def _find_change_of_day(start: int, time: npt.NDArray) -> int:
     return -1
 
 
-def _read_header(src: Path | BytesIO) -> tuple[int, bytes]:
-    if isinstance(src, Path):
-        with src.open("rb") as src_buf:
-            return _read_header_from_bytes(src_buf)
-    else:
-        return _read_header_from_bytes(src)
+def read_metadata(src: Path | BytesIO) -> Metadata:
+    metadata, *_ = _parse_header_only(src)
+    if not isinstance(metadata, Metadata):
+        raise TypeError
+    return metadata
+
+
+def _parse_header_only(src: Path | BytesIO) -> Any:
+    """Parses the header, leaving `src` at its position for a later read."""
+    pos = src.tell() if isinstance(src, BytesIO) else 0
+    try:
+        with open_decompressed(src) as stream:
+            _, header_bytes = read_header(stream)
+    finally:
+        if isinstance(src, BytesIO):
+            src.seek(pos)
+    return header_parser().parse(header_bytes.decode())
 
 
-def _read_background(src: Path | BytesIO) -> bytes:
+def read_header(src: Path | Stream) -> tuple[int, bytes]:
     if isinstance(src, Path):
         with src.open("rb") as src_buf:
-            return src_buf.read()
+            return _read_header_from_bytes(src_buf)
     else:
-        return src.read()
+        return _read_header_from_bytes(src)
 
 
-def _read_header_from_bytes(
-    src: BufferedReader | BytesIO,
-) -> tuple[int, bytes]:
+def _read_header_from_bytes(src: Stream) -> tuple[int, bytes]:
     header_end = _find_header_end(src)
     if header_end < 0:
         src.seek(0)
@@ -241,17 +447,12 @@ def _read_header_from_bytes(
     return header_end, header_bytes
 
 
-def _read_data(src: Path | BytesIO, header_end: int) -> bytes:
-    if isinstance(src, Path):
-        with src.open("rb") as src_buf:
-            src_buf.seek(header_end)
-            return src_buf.read()
-    else:
-        src.seek(header_end)
-        return src.read()
+def _read_data(src: Stream, header_end: int) -> bytes:
+    src.seek(header_end)
+    return src.read()
 
 
-def _find_header_end(src: BufferedReader | BytesIO) -> int:
+def _find_header_end(src: Stream) -> int:
     guess = 1024
     loc_end = _try_header_end(src, guess)
     if loc_end < 0:
@@ -259,7 +460,7 @@ def _find_header_end(src: BufferedReader | BytesIO) -> int:
     return loc_end
 
 
-def _try_header_end(file_io: BufferedReader | BytesIO, guess: int) -> int:
+def _try_header_end(file_io: Stream, guess: int) -> int:
     pos = file_io.tell()
     fbytes = file_io.read(guess)
     file_io.seek(pos)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import copy
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from haloreader.engines import Engine, get_engine
+from haloreader.halo import Halo
+from haloreader.instrument import stage
+from haloreader.metadata import Metadata
+from haloreader.read import build_halo, header_parser, read_header
+from haloreader.transformer import spectral_width_factory
+from haloreader.type_guards import is_ndarray
+from haloreader.variable import Variable
+
+log = logging.getLogger(__name__)
+
+HALF_DAY = 43200
+DAY = 86400
+
+
+@dataclass(slots=True)
+class _Header:
+    end: int
+    metadata: Metadata
+    time_vars: list[Variable]
+    time_range_vars: list[Variable]
+    range_func: Callable[[Variable, Variable], Variable]
+
+
+class ResumableReader:
+    """Parses a ``.hpl`` file that is still being written.
+
+    Each call to :meth:`read` parses the complete profiles appended since
+    the previous call and returns the byte offset just past the last
+    complete profile. A partially written profile at the end of the file
+    is left for the next call. Parsed chunks are collected in a list and
+    merged once when :attr:`halo` is accessed, so polling a growing file
+    does not copy the profiles parsed earlier on every call. The profiles
+    parsed by the latest call are also in :attr:`last_chunk`.
+    """
+
+    def __init__(self, src: Path, engine: str | Engine | None = None):
+        self.src = src
+        self.engine = get_engine(engine)
+        self.offset = 0
+        self.last_chunk: Halo | None = None
+        self._chunks: list[Halo] = []
+        self._header: _Header | None = None
+
+    @property
+    def halo(self) -> Halo | None:
+        """Profiles parsed so far, None before the first complete profile."""
+        if len(self._chunks) > 1:
+            merged = Halo.merge(self._chunks)
+            if merged is None:
+                raise TypeError
+            merged.metadata = self._chunks[0].metadata
+            self._chunks = [merged]
+        return self._chunks[0] if self._chunks else None
+
+    @property
+    def metadata(self) -> Metadata | None:
+        """Metadata of the file, None before the first complete profile."""
+        return self._chunks[0].metadata if self._chunks else None
+
+    def read(self) -> int:
+        """Parses new complete profiles and returns the new offset.
+
+        Raises FileEmpty or HeaderNotFound while the header is not written
+        yet. A file that has shrunk since the previous call is read again
+        from the beginning.
+        """
+        self.last_chunk = None
+        with self.src.open("rb") as src_buf:
+            size = src_buf.seek(0, 2)
+            if size < self.offset:
+                log.info("%s has shrunk, reading it again", self.src)
+                self.reset()
+            header = self.read_header()
+            src_buf.seek(max(self.offset, header.end))
+            buf = src_buf.read()
+        nbytes = complete_profiles_nbytes(buf, _ngates(header.metadata))
+        if nbytes == 0:
+            self.offset = max(self.offset, header.end)
+            return self.offset
+        with stage("read_resumable"):
+            self._append(self._parse_chunk(header, buf[:nbytes]))
+        self.offset = max(self.offset, header.end) + nbytes
+        return self.offset
+
+    def reset(self) -> None:
+        self.offset = 0
+        self.last_chunk = None
+        self._chunks = []
+        self._header = None
+
+    def read_header(self) -> _Header:
+        if self._header is None:
+            header_end, header_bytes = read_header(self.src)
+            metadata, time_vars, time_range_vars, range_func = header_parser().parse(
+                header_bytes.decode()
+            )
+            self._header = _Header(
+                end=header_end,
+                metadata=metadata,
+                time_vars=time_vars,
+                time_range_vars=time_range_vars,
+                range_func=range_func,
+            )
+        return self._header
+
+    def _parse_chunk(self, header: _Header, data_bytes: bytes) -> Halo:
+        time_vars = copy.deepcopy(header.time_vars)
+        time_range_vars = copy.deepcopy(header.time_range_vars)
+        has_spectral_width = any(v.name == "spectral_width" for v in time_range_vars)
+        if (
+            self._chunks
+            and self._chunks[-1].spectral_width is not None
+            and not has_spectral_width
+        ):
+            # Spectral width column was found in the data of an earlier chunk
+            time_range_vars.append(spectral_width_factory())
+        self.engine.read_data(
+            data_bytes, _ngates(header.metadata), time_vars, time_range_vars
+        )
+        return build_halo(
+            copy.deepcopy(header.metadata),
+            time_vars + time_range_vars,
+            header.range_func,
+        )
+
+    def _append(self, chunk: Halo) -> None:
+        if self._chunks:
+            last_time = self._chunks[-1].time.data
+            if not is_ndarray(last_time) or not is_ndarray(chunk.time.data):
+                raise TypeError
+            # Decimal time wraps to zero after midnight
+            while chunk.time.data[0] < last_time[-1] - HALF_DAY:
+                chunk.time.data += DAY
+        self._chunks.append(chunk)
+        self.last_chunk = chunk
+
+
+def complete_profiles_nbytes(buf: bytes, ngates: int) -> int:
+    """Returns the length of the complete profiles at the start of `buf`.
+
+    A profile is a time line followed by `ngates` gate lines.
+    """
+    line_ends = np.flatnonzero(np.frombuffer(buf, dtype=np.uint8) == ord("\n"))
+    lines_per_profile = ngates + 1
+    nprofiles = len(line_ends) // lines_per_profile
+    if nprofiles == 0:
+        return 0
+    return int(line_ends[nprofiles * lines_per_profile - 1]) + 1
+
+
+def _ngates(metadata: Metadata) -> int:
+    if not isinstance(metadata.ngates.data, int):
+        raise TypeError
+    return metadata.ngates.data
@@ -1,5 +1,4 @@
 import numpy as np
-from scipy.ndimage import uniform_filter
 
 from haloreader.type_guards import is_ndarray
 from haloreader.variable import Variable
@@ -14,6 +13,9 @@ def compute_noise_screen(
         or not is_ndarray(range_.data)
     ):
         raise TypeError
+    # pylint: disable=import-outside-toplevel
+    from scipy.ndimage import uniform_filter
+
     # kernel size and threshold values have been chosen just by
     # visually checking the output
     intensity_mean_mask = uniform_filter(intensity.data, size=(21, 3)) > 1.0025
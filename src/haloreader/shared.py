@@ -0,0 +1,271 @@
+"""Transfer of parsed data between processes without copying arrays.
+
+Arrays of a :class:`Halo`, :class:`HaloBg` or :class:`Variable` are moved
+into shared memory blocks with :func:`share`. Only the small
+:class:`Shared` descriptor is pickled to another process, which maps the
+same blocks with :meth:`Shared.attach`.
+"""
+from __future__ import annotations
+
+import contextlib
+import logging
+import pickle
+import sys
+import weakref
+from dataclasses import dataclass, field, fields, is_dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Generic, TypeVar
+
+import numpy as np
+
+from haloreader.variable import Variable, map_variables
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True, slots=True)
+class SharedArray:
+    """Picklable descriptor of an array in a shared memory block."""
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+    @classmethod
+    def create(cls, shape: tuple[int, ...], dtype: np.dtype | str) -> SharedArray:
+        """Allocates a zero-filled block, which is kept until :meth:`unlink`."""
+        nbytes = int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+        shm = _open(size=max(1, nbytes))
+        shm.close()
+        return cls(name=shm.name, shape=tuple(shape), dtype=np.dtype(dtype).str)
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> SharedArray:
+        shared = cls.create(array.shape, array.dtype)
+        try:
+            shared.attach()[...] = array
+        except BaseException:
+            shared.unlink()
+            raise
+        return shared
+
+    def attach(self) -> np.ndarray:
+        """Maps the block into this process.
+
+        The mapping is closed once the returned array and all views of it
+        have been garbage collected.
+        """
+        shm = _open(self.name)
+        array: np.ndarray = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+        weakref.finalize(array, shm.close)
+        return array
+
+    def adopt(self) -> np.ndarray:
+        """Maps the block and unlinks it, so it is freed with the array."""
+        array = self.attach()
+        self.unlink()
+        return array
+
+    def unlink(self) -> None:
+        # pylint: disable=protected-access
+        shm = _open(self.name)
+        shm.close()
+        if sys.version_info < (3, 13):
+            # unlink() unregisters the block from the resource tracker
+            resource_tracker.register(shm._name, "shared_memory")  # type: ignore
+        shm.unlink()
+
+
+@dataclass(frozen=True, slots=True)
+class _SharedData:
+    data: SharedArray
+    mask: SharedArray | None = None
+    fill_value: Any = None
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> _SharedData:
+        data = SharedArray.from_array(np.ma.getdata(array))
+        if not isinstance(array, np.ma.MaskedArray):
+            return cls(data=data)
+        return cls._with_mask(
+            data, lambda: SharedArray.from_array(np.ma.getmaskarray(array)), array
+        )
+
+    @classmethod
+    def create(cls, like: np.ndarray, shape: tuple[int, ...]) -> _SharedData:
+        data = SharedArray.create(shape, like.dtype)
+        if not isinstance(like, np.ma.MaskedArray):
+            return cls(data=data)
+        return cls._with_mask(
+            data, lambda: SharedArray.create(shape, np.dtype(np.bool_)), like
+        )
+
+    @classmethod
+    def _with_mask(
+        cls,
+        data: SharedArray,
+        create_mask: Callable[[], SharedArray],
+        like: np.ma.MaskedArray,
+    ) -> _SharedData:
+        try:
+            mask = create_mask()
+        except BaseException:
+            data.unlink()
+            raise
+        return cls(data=data, mask=mask, fill_value=like.fill_value)
+
+    def attach(self, adopt: bool = False) -> np.ndarray:
+        data = self.data.adopt() if adopt else self.data.attach()
+        if self.mask is None:
+            return data
+        mask = self.mask.adopt() if adopt else self.mask.attach()
+        return np.ma.masked_array(data, mask=mask, fill_value=self.fill_value)
+
+    def unlink(self) -> None:
+        for array in (self.data, self.mask):
+            if array is not None:
+                with contextlib.suppress(FileNotFoundError):
+                    array.unlink()
+
+
+@dataclass(slots=True)
+class Shared(Generic[T]):
+    """A dataclass tree whose arrays are in shared memory.
+
+    `skeleton` is a copy of the tree without the shared arrays, which are
+    keyed by the dotted path of their variable.
+    """
+
+    skeleton: T
+    arrays: dict[str, _SharedData] = field(default_factory=dict)
+
+    def attach(self, adopt: bool = True) -> T:
+        """Returns the tree with its arrays mapped from shared memory.
+
+        By default the blocks are unlinked, so they are freed once the
+        returned arrays are garbage collected and the descriptor must not
+        be attached again.
+        """
+        tree = _rebuild(self.skeleton, self.arrays, adopt)
+        if not isinstance(tree, type(self.skeleton)):
+            raise TypeError
+        return tree
+
+    def fill(self, obj: T, start: int) -> None:
+        """Writes time dependent arrays of `obj` into rows from `start` on.
+
+        Used by workers to fill their part of a tree allocated with
+        :func:`allocate`.
+        """
+        for path, array in _time_arrays(obj):
+            shared = self.arrays[path]
+            rows = slice(start, start + array.shape[0])
+            shared.data.attach()[rows] = np.ma.getdata(array)
+            if shared.mask is not None:
+                shared.mask.attach()[rows] = np.ma.getmaskarray(array)
+
+    def unlink(self) -> None:
+        """Frees the blocks, skipping those that are already unlinked."""
+        for shared in self.arrays.values():
+            shared.unlink()
+
+
+def share(obj: T) -> Shared[T]:
+    """Copies arrays of `obj` into shared memory."""
+    return _detach_all(obj, None)
+
+
+def allocate(template: T, ntimes: int) -> Shared[T]:
+    """Allocates a tree like `template` with `ntimes` profiles in shared memory.
+
+    Time dependent arrays are zero-filled, other arrays are copied from
+    `template`.
+    """
+    return _detach_all(template, ntimes)
+
+
+def dumps_oob(obj: Any) -> tuple[bytes, list[pickle.PickleBuffer]]:
+    """Pickles `obj` with array buffers passed out-of-band (protocol 5)."""
+    buffers: list[pickle.PickleBuffer] = []
+    data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    return data, buffers
+
+
+def loads_oob(data: bytes, buffers: list[pickle.PickleBuffer]) -> Any:
+    return pickle.loads(data, buffers=buffers)
+
+
+def _open(name: str | None = None, size: int = 0) -> shared_memory.SharedMemory:
+    """Opens a block without handing it to the resource tracker.
+
+    The tracker would unlink blocks when the process that created or
+    attached them exits, but blocks are passed between processes and are
+    unlinked explicitly instead.
+    """
+    # pylint: disable=protected-access,unexpected-keyword-arg
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(
+            name=name, create=name is None, size=size, track=False
+        )
+    shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+    resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore
+    return shm
+
+
+def _detach_all(obj: T, ntimes: int | None) -> Shared[T]:
+    arrays: dict[str, _SharedData] = {}
+    try:
+        skeleton = _detach(obj, arrays, ntimes)
+    except BaseException:
+        # Blocks are not in the resource tracker, nothing else would free them
+        for shared in arrays.values():
+            shared.unlink()
+        raise
+    return Shared(skeleton=skeleton, arrays=arrays)
+
+
+def _detach(obj: Any, arrays: dict[str, _SharedData], ntimes: int | None) -> Any:
+    def detach_variable(var: Variable, prefix: str) -> Variable:
+        if not isinstance(var.data, np.ndarray) or var.data.ndim == 0:
+            return Variable.like(var, data=var.data)
+        # Only variables of the top level tree have profiles along time
+        if ntimes is not None and prefix.count(".") <= 1 and _is_time_dependent(var):
+            arrays[prefix] = _SharedData.create(
+                var.data, (ntimes,) + var.data.shape[1:]
+            )
+        else:
+            arrays[prefix] = _SharedData.from_array(var.data)
+        return Variable.like(var, data=None)
+
+    return map_variables(obj, detach_variable)
+
+
+def _rebuild(obj: Any, arrays: dict[str, _SharedData], adopt: bool) -> Any:
+    def attach_variable(var: Variable, prefix: str) -> Variable:
+        if prefix in arrays:
+            return Variable.like(var, data=arrays[prefix].attach(adopt))
+        return Variable.like(var, data=var.data)
+
+    return map_variables(obj, attach_variable)
+
+
+def _time_arrays(obj: Any) -> list[tuple[str, np.ndarray]]:
+    if isinstance(obj, Variable):
+        if isinstance(obj.data, np.ndarray) and _is_time_dependent(obj):
+            return [("", obj.data)]
+        return []
+    if not is_dataclass(obj) or isinstance(obj, type):
+        raise TypeError
+    return [
+        (f"{f.name}.", var.data)
+        for f in fields(obj)
+        if isinstance(var := getattr(obj, f.name), Variable)
+        and isinstance(var.data, np.ndarray)
+        and _is_time_dependent(var)
+    ]
+
+
+def _is_time_dependent(var: Variable) -> bool:
+    return var.dimensions is not None and var.dimensions[:1] == ("time",)
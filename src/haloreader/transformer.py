@@ -242,12 +242,10 @@ def spectral_width_factory() -> Variable:
     )
 
 
-def range_func(range_var: Variable, gate_range: Variable) -> Variable:
-    if not isinstance(range_var.data, np.ndarray) or not isinstance(
-        gate_range.data, float
-    ):
+def range_func(ngates: Variable, gate_range: Variable) -> Variable:
+    if not isinstance(ngates.data, int) or not isinstance(gate_range.data, float):
         raise TypeError
-    range_ = (range_var.data[0, :] + 0.5) * gate_range.data
+    range_ = (np.arange(ngates.data) + 0.5) * gate_range.data
     if not isinstance(range_, np.ndarray):
         raise TypeError
     return Variable(
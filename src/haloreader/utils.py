@@ -1,28 +1,10 @@
-import time
 from datetime import datetime
-from types import TracebackType
 
 UNIX_TIME_UNIT = "seconds since 1970-01-01 00:00:00 +0000"
 UNIX_TIME_FMT = "%Y-%m-%d %H:%M:%S %z"
 CLOUDNET_TIME_UNIT_FMT = "hours since %Y-%m-%d %H:%M:%S %z"
 
 
-class Timer:
-    def __init__(self, name: str = "timer"):
-        self.name = name
-        self.start = 0.0
-
-    def __enter__(self) -> None:
-        self.start = time.perf_counter()
-
-    def __exit__(
-        self, exc_type: type, exc_value: AttributeError, exc_traceback: TracebackType
-    ) -> None:
-        end = time.perf_counter()
-        runtime = end - self.start
-        print(f"{self.name}: {runtime}")
-
-
 def two_column_format(key: str, vals: list, left_width: int) -> str:
     if len(vals) == 0:
         return key
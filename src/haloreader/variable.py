@@ -1,11 +1,18 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Protocol, TypeAlias, TypeGuard, runtime_checkable
+from dataclasses import dataclass, fields, is_dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Protocol,
+    TypeAlias,
+    TypeGuard,
+    runtime_checkable,
+)
 
 import netCDF4
 import numpy as np
-from matplotlib.axes import Axes
 
 from haloreader.exceptions import MergeError, NetCDFWriteError
 from haloreader.type_guards import (
@@ -16,6 +23,9 @@ from haloreader.type_guards import (
     is_ndarray_list,
 )
 
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+
 DataType: TypeAlias = np.ndarray | int | float | None
 
 
@@ -138,19 +148,32 @@ class VariableWithNumpyData(Protocol):
     dimensions: tuple[str, ...]
 
 
+def map_variables(
+    obj: Any, func: Callable[[Variable, str], Variable], prefix: str = ""
+) -> Any:
+    """Returns a copy of a dataclass tree with each variable replaced.
+
+    `func` is called with the variable and its dotted path, such as
+    ``"wind.uwind."``, which is unique within the tree.
+    """
+    if isinstance(obj, Variable):
+        return func(obj, prefix)
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return type(obj)(
+            **{
+                f.name: map_variables(getattr(obj, f.name), func, f"{prefix}{f.name}.")
+                for f in fields(obj)
+            }
+        )
+    return obj
+
+
 def _plot_intensity(var: Variable, ax: Axes) -> None:
     vdelta = 1e-3
     vmin, vmax = (1 - vdelta, 1 + vdelta)
     if not isinstance(var.data, np.ndarray):
         raise TypeError
-    ax.imshow(
-        var.data.T,
-        origin="lower",
-        vmin=vmin,
-        vmax=vmax,
-        aspect="auto",
-        interpolation="none",
-    )
+    _imshow(var.data, ax, vmin=vmin, vmax=vmax)
     ax.set_title(var.name)
 
 
@@ -158,14 +181,8 @@ def _plot_beta(var: Variable, ax: Axes) -> None:
     if not isinstance(var.data, np.ndarray):
         raise TypeError
     vmin, vmax = (1e-7, 1e-4)
-    ax.imshow(
-        var.data.T,
-        origin="lower",
-        aspect="auto",
-        interpolation="none",
-        vmin=vmin,
-        vmax=vmax,
-    )
+    # Block maximum keeps thin layers visible in long time series
+    _imshow(var.data, ax, reduce="max", vmin=vmin, vmax=vmax)
     ax.set_title(var.name)
 
 
@@ -174,15 +191,7 @@ def _plot_doppler_velocity(var: Variable, ax: Axes) -> None:
         raise TypeError
     vdelta = 4
     vmin, vmax = (-vdelta, vdelta)
-    ax.imshow(
-        var.data.T,
-        origin="lower",
-        aspect="auto",
-        cmap="bwr",
-        vmin=vmin,
-        vmax=vmax,
-        interpolation="none",
-    )
+    _imshow(var.data, ax, cmap="bwr", vmin=vmin, vmax=vmax)
     ax.set_title(var.name)
 
 
@@ -192,15 +201,62 @@ def _plot_background(var: Variable, ax: Axes) -> None:
     mean = var.data.mean()
     std = var.data.std()
     vmin, vmax = (mean - std, mean + std)
+    _imshow(var.data, ax, vmin=vmin, vmax=vmax)
+    ax.set_title(var.name)
+
+
+def _imshow(data: np.ndarray, ax: Axes, reduce: str = "mean", **kwargs: Any) -> None:
+    """Draws (time, range) data, decimated along time to the width of `ax`.
+
+    The image extent is given in array indices, so axis ticks are the same
+    as without decimation.
+    """
+    width = max(1, int(ax.get_window_extent().width))
+    ntimes, ngates = data.shape
     ax.imshow(
-        var.data.T,
+        decimate(data, width, reduce=reduce).T,
         origin="lower",
-        vmin=vmin,
-        vmax=vmax,
         aspect="auto",
         interpolation="none",
+        extent=(-0.5, ntimes - 0.5, -0.5, ngates - 0.5),
+        **kwargs,
     )
-    ax.set_title(var.name)
+
+
+def decimate(data: np.ndarray, size: int, reduce: str = "mean") -> np.ndarray:
+    """Aggregates blocks of consecutive rows so that at most `size` remain.
+
+    Rows are reduced with a block "mean" or "max". Masked values are
+    ignored and a block with only masked values stays masked.
+    """
+    if reduce not in ("mean", "max"):
+        raise ValueError(f"Unknown reduction: {reduce}")
+    nrows = data.shape[0]
+    if nrows <= size:
+        return data
+    factor = -(-nrows // size)
+    nfull = nrows // factor
+    # Full blocks are reduced through a view, only the short tail is separate
+    parts = [
+        _reduce_blocks(
+            data[: nfull * factor].reshape((nfull, factor) + data.shape[1:]), reduce
+        )
+    ]
+    if nfull * factor < nrows:
+        parts.append(_reduce_blocks(data[np.newaxis, nfull * factor :], reduce))
+    if not isinstance(data, np.ma.MaskedArray):
+        return np.concatenate(parts)
+    reduced: np.ndarray = np.ma.concatenate(parts)
+    if not np.ma.is_masked(reduced):
+        return np.ma.getdata(reduced)
+    return reduced
+
+
+def _reduce_blocks(blocks: np.ndarray, reduce: str) -> np.ndarray:
+    reduced = blocks.mean(axis=1) if reduce == "mean" else blocks.max(axis=1)
+    if not isinstance(reduced, np.ndarray):
+        raise TypeError
+    return reduced
 
 
 def _dimension_exists(nc: netCDF4.Dataset | None, dim: str) -> bool:
@@ -272,6 +328,10 @@ def _concatenate_along_first_dimension(vars_: list[Variable]) -> np.ndarray:
     _check_concat(vars_)
     data_list = [v.data for v in vars_]
     if is_ndarray_list(data_list):
+        if any(isinstance(data, np.ma.MaskedArray) for data in data_list):
+            # np.concatenate drops the masks
+            masked: np.ndarray = np.ma.concatenate(data_list)
+            return masked
         return np.concatenate(data_list)
     raise TypeError
 
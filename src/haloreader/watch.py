@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import copy
+import dataclasses
+import datetime
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from haloreader.exceptions import (
+    BackgroundCorrectionError,
+    BackgroundReadError,
+    FileEmpty,
+    HeaderNotFound,
+)
+from haloreader.halo import Halo, HaloBg
+from haloreader.metadata import Metadata
+from haloreader.pipeline import PROCESSING_REACH, process_profiles, write_nc
+from haloreader.read import SKIPPABLE_ERRORS, merge_halobgs, merge_halos, read_single_bg
+from haloreader.resumable import ResumableReader
+from haloreader.type_guards import is_ndarray
+from haloreader.variable import Variable
+from haloreader.wind import WIND_SCANTYPES
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 10.0
+# Backgrounds older than this relative to the newest one are dropped
+BACKGROUND_WINDOW = 30 * 86400
+# Days kept in memory and updated, counted back from the newest raw file
+RETENTION_DAYS = 2
+
+
+@dataclass(slots=True)
+class _WatchedFile:
+    size: int
+    parsed_size: int = -1
+
+
+@dataclass(slots=True)
+class _ProcessedDay:
+    """Processed profiles of a day, extended as new profiles arrive.
+
+    Profiles in `final` no longer change. The last `PROCESSING_REACH`
+    processed profiles are `provisional`: they are processed again, with
+    the raw profiles kept in `tail` as context, once later profiles arrive.
+    All profiles share the metadata of the first raw profiles.
+    """
+
+    final: list[Halo] = field(default_factory=list)
+    provisional: Halo | None = None
+    tail: Halo | None = None
+
+    def accepts(self, raw: Halo) -> bool:
+        """Checks that `raw` continues the profiles processed so far."""
+        if self.tail is None:
+            return True
+        if not is_ndarray(self.tail.time.data) or not is_ndarray(raw.time.data):
+            raise TypeError
+        return (
+            raw.metadata.ngates.data == self.tail.metadata.ngates.data
+            and raw.time.data[0] > self.tail.time.data[-1]
+        )
+
+    def append(self, raw: Halo, halobg: HaloBg) -> None:
+        """Processes `raw` profiles that follow the ones processed so far."""
+        merged = raw if self.tail is None else _merge([self.tail, raw])
+        halo = _copy(merged)
+        process_profiles(halo, halobg)
+        ntail = 0 if self.tail is None else _nprofiles(self.tail)
+        nprofiles = _nprofiles(halo)
+        start = max(0, ntail - PROCESSING_REACH)
+        stop = max(start, nprofiles - PROCESSING_REACH)
+        if (final := _profiles(halo, start, stop)) is not None:
+            self.final.append(final)
+        self.provisional = _profiles(halo, stop, nprofiles)
+        self.tail = _profiles(merged, max(0, nprofiles - 2 * PROCESSING_REACH), None)
+
+    @property
+    def halo(self) -> Halo | None:
+        if len(self.final) > 1:
+            self.final = [_merge(self.final)]
+        halos = self.final + ([self.provisional] if self.provisional else [])
+        return _merge(halos) if halos else None
+
+
+class Watcher:
+    """Polls a directory and keeps daily products up to date.
+
+    Raw files are parsed as they grow: each poll parses the profiles
+    completed since the previous one. A background file is parsed once its
+    size has stayed the same for two consecutive polls. Parsed files,
+    backgrounds and processed profiles are kept in memory, so each update
+    only parses and processes new profiles before writing
+    ``halo_<date>.nc`` into `output_dir`. A day is processed again from its
+    raw files when backgrounds change or profiles arrive out of order.
+    Only the newest `RETENTION_DAYS` days are kept and updated, raw files
+    of older days are dropped and no longer parsed.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        output_dir: Path,
+        interval: float = DEFAULT_INTERVAL,
+    ):
+        self.directory = directory
+        self.output_dir = output_dir
+        self.interval = interval
+        self._files: dict[Path, _WatchedFile] = {}
+        self._dates: dict[Path, datetime.date] = {}
+        self._readers: dict[Path, ResumableReader] = {}
+        self._days: dict[datetime.date, _ProcessedDay] = {}
+        self._halobgs: dict[Path, HaloBg] = {}
+        self._halobg: HaloBg | None = None
+        self._expired: set[Path] = set()
+
+    def run(self, max_polls: int | None = None) -> None:
+        npolls = 0
+        while max_polls is None or npolls < max_polls:
+            started = time.monotonic()
+            self.poll()
+            npolls += 1
+            if max_polls is None or npolls < max_polls:
+                time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def poll(self) -> list[datetime.date]:
+        """Parses new data and returns the dates of updated products."""
+        halo_paths, bg_paths = self._changed_files()
+        if bg_paths:
+            for path in bg_paths:
+                self._parse_bg(path)
+            self._prune_backgrounds()
+            self._halobg = merge_halobgs(list(self._halobgs.values()))
+        chunks: dict[datetime.date, list[Halo]] = {}
+        for path in halo_paths:
+            if (chunk := self._parse(path)) is not None:
+                chunks.setdefault(self._dates[path], []).append(chunk)
+        self._prune_halos()
+        updated_dates = set(chunks)
+        if bg_paths and self._halobg is not None:
+            # New backgrounds change the correction of every day in memory
+            self._days.clear()
+            updated_dates.update(self._dates.values())
+        updated_dates &= set(self._dates.values())
+        for date in sorted(updated_dates):
+            self._update_product(date, chunks.get(date, []))
+        return sorted(updated_dates)
+
+    def _changed_files(self) -> tuple[list[Path], list[Path]]:
+        halo_paths: list[Path] = []
+        bg_paths: list[Path] = []
+        seen: set[Path] = set()
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            path = Path(entry.path)
+            is_bg = HaloBg.is_bgfilename(entry.name) and entry.name.endswith(".txt")
+            if not (is_bg or entry.name.endswith(".hpl")):
+                continue
+            seen.add(path)
+            if path in self._expired:
+                continue
+            size = entry.stat().st_size
+            watched = self._files.get(path)
+            if not is_bg:
+                if watched is None or watched.parsed_size != size:
+                    self._files[path] = _WatchedFile(size=size, parsed_size=size)
+                    halo_paths.append(path)
+                continue
+            if watched is None or watched.size != size:
+                self._files[path] = _WatchedFile(
+                    size=size, parsed_size=watched.parsed_size if watched else -1
+                )
+                continue
+            if watched.parsed_size == size:
+                continue
+            watched.parsed_size = size
+            bg_paths.append(path)
+        # States of deleted files are not needed anymore
+        self._expired &= seen
+        for path in self._files.keys() - seen:
+            del self._files[path]
+            self._readers.pop(path, None)
+            if (date := self._dates.pop(path, None)) is not None:
+                self._days.pop(date, None)
+        return halo_paths, bg_paths
+
+    def _parse(self, path: Path) -> Halo | None:
+        """Parses new complete profiles, returns None if there are none."""
+        reader = self._readers.setdefault(path, ResumableReader(path))
+        try:
+            reader.read()
+        except (FileEmpty, HeaderNotFound):
+            # Header is not written yet
+            return None
+        except SKIPPABLE_ERRORS as err:
+            log.warning("Skipping file %s", path, exc_info=err)
+            reader.reset()
+            if (date := self._dates.pop(path, None)) is not None:
+                self._days.pop(date, None)
+            return None
+        if (chunk := reader.last_chunk) is not None:
+            self._dates[path] = _date(chunk)
+        return chunk
+
+    def _parse_bg(self, path: Path) -> None:
+        try:
+            self._halobgs[path] = read_single_bg(path, path.name)
+        except BackgroundReadError as err:
+            log.warning("Skipping background file %s", path, exc_info=err)
+
+    def _prune_halos(self) -> None:
+        """Drops raw files of days before the retention window."""
+        if not self._dates:
+            return
+        oldest = max(self._dates.values()) - datetime.timedelta(days=RETENTION_DAYS - 1)
+        for path, date in list(self._dates.items()):
+            if date < oldest:
+                log.info("Dropping %s older than %s", path, oldest)
+                del self._dates[path]
+                self._readers.pop(path, None)
+                self._files.pop(path, None)
+                self._expired.add(path)
+        for date in [date for date in self._days if date < oldest]:
+            del self._days[date]
+
+    def _prune_backgrounds(self) -> None:
+        times = {path: _first_time(bg) for path, bg in self._halobgs.items()}
+        if not times:
+            return
+        newest = max(times.values())
+        for path, time_ in times.items():
+            if newest - time_ > BACKGROUND_WINDOW:
+                del self._halobgs[path]
+
+    def _update_product(self, date: datetime.date, chunks: list[Halo]) -> None:
+        halo = None
+        if self._halobg is None:
+            log.warning("No background files, skipping background correction")
+        else:
+            try:
+                halo = self._process(date, chunks, self._halobg)
+            except BackgroundCorrectionError as err:
+                log.warning("Skipping background correction", exc_info=err)
+                self._days.pop(date, None)
+        if halo is None:
+            if (halo := self._raw_day(date)) is None:
+                return
+            halo.metadata = self._day_metadata(date, halo.metadata)
+        else:
+            halo = dataclasses.replace(
+                halo.sel(), metadata=self._day_metadata(date, halo.metadata)
+            )
+            if halo.metadata.scantype.value in WIND_SCANTYPES:
+                halo.compute_wind_profile(_noise_screen(halo))
+            halo.convert_time_unit2cloudnet_time()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        output = self.output_dir.joinpath(f"halo_{date}.nc")
+        write_nc(halo, output)
+        log.info("Updated %s", output)
+
+    def _process(
+        self, date: datetime.date, chunks: list[Halo], halobg: HaloBg
+    ) -> Halo | None:
+        """Processes new profiles of a day, or the whole day if needed."""
+        day = self._days.get(date)
+        raw = _merge([_copy(chunk) for chunk in chunks]) if chunks else None
+        if day is None or raw is None or not day.accepts(raw):
+            log.info("Processing all profiles of %s", date)
+            day = _ProcessedDay()
+            raw = self._raw_day(date)
+        if raw is not None:
+            day.append(raw, halobg)
+        self._days[date] = day
+        return day.halo
+
+    def _raw_day(self, date: datetime.date) -> Halo | None:
+        """Merges raw profiles of a day, keeping the first file's metadata."""
+        halos = [
+            _copy(halo)
+            for path, date_ in self._dates.items()
+            if date_ == date and (halo := self._readers[path].halo) is not None
+        ]
+        if (merged := merge_halos(halos)) is not None:
+            merged.metadata = self._file_metadata(date, merged.metadata)[0]
+        return merged
+
+    def _day_metadata(self, date: datetime.date, metadata: Metadata) -> Metadata:
+        """Merges metadata of the files that make up a product."""
+        merged = Metadata.merge(self._file_metadata(date, metadata))
+        if merged is None:
+            raise TypeError
+        return copy.deepcopy(merged)
+
+    def _file_metadata(self, date: datetime.date, metadata: Metadata) -> list[Metadata]:
+        """Metadata of files with the same number of gates, oldest first."""
+        return sorted(
+            (
+                metadata_
+                for path, date_ in self._dates.items()
+                if date_ == date
+                and (metadata_ := self._readers[path].metadata) is not None
+                and metadata_.ngates.data == metadata.ngates.data
+            ),
+            key=_start_time,
+        )
+
+
+def _copy(halo: Halo) -> Halo:
+    """Copies variables and metadata that processing modifies in place."""
+    return dataclasses.replace(halo.sel(), metadata=copy.deepcopy(halo.metadata))
+
+
+def _merge(halos: list[Halo]) -> Halo:
+    """Merges profiles of a day, keeping the metadata of the first halo."""
+    if (merged := Halo.merge(halos)) is None:
+        raise TypeError
+    merged.metadata = halos[0].metadata
+    return merged
+
+
+def _nprofiles(halo: Halo) -> int:
+    if not is_ndarray(halo.time.data):
+        raise TypeError
+    return len(halo.time.data)
+
+
+def _profiles(halo: Halo, start: int, stop: int | None) -> Halo | None:
+    """Selects profiles by index, returns None if there are none."""
+    if not is_ndarray(halo.time.data):
+        raise TypeError
+    times = halo.time.data[start:stop]
+    if len(times) == 0:
+        return None
+    return halo.sel(time=slice(times[0], times[-1]))
+
+
+def _noise_screen(halo: Halo) -> Variable:
+    """Recovers the noise screen from the screened Doppler velocity."""
+    if halo.doppler_velocity_screened is None or not is_ndarray(
+        halo.doppler_velocity_screened.data
+    ):
+        raise TypeError
+    return Variable(
+        name="noise_screen",
+        dimensions=halo.doppler_velocity_screened.dimensions,
+        data=np.ma.getmaskarray(halo.doppler_velocity_screened.data),
+    )
+
+
+def _first_time(halobg: HaloBg) -> float:
+    if not is_ndarray(halobg.time.data):
+        raise TypeError
+    return float(halobg.time.data[0])
+
+
+def _start_time(metadata: Metadata) -> float:
+    if not is_ndarray(metadata.start_time.data):
+        raise TypeError
+    return float(metadata.start_time.data[0])
+
+
+def _date(halo: Halo) -> datetime.date:
+    return datetime.datetime.fromtimestamp(
+        _start_time(halo.metadata), tz=datetime.timezone.utc
+    ).date()
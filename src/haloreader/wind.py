@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass
+
+import netCDF4
+import numpy as np
+
+from haloreader.scantype import ScanType
+from haloreader.type_guards import is_ndarray
+from haloreader.variable import Variable
+
+WIND_SCANTYPES = (
+    ScanType.VAD,
+    ScanType.VAD_STEPPED,
+    ScanType.VAD_OVERLAPPING,
+    ScanType.WIND_PROFILE,
+    ScanType.WIND_PROFILE_OVERLAPPING,
+)
+# Rays further apart in time than this many median ray intervals start a new scan
+MAX_GAP_FACTOR = 3.0
+ELEVATION_TOLERANCE = 0.5
+MIN_RAYS = 3
+# Fits of rays covering too narrow an azimuth sector are left out
+MIN_DETERMINANT_RATIO = 1e-6
+
+
+@dataclass(slots=True)
+class WindProfile:
+    time: Variable
+    uwind: Variable
+    vwind: Variable
+    wwind: Variable
+    wind_rmse: Variable
+    wind_nrays: Variable
+
+    def nc_write(
+        self,
+        nc: netCDF4.Dataset,
+        nc_map: dict[str, dict] | None = None,
+        nc_exclude: dict[str, set] | None = None,
+    ) -> None:
+        for attr_name in self.__dataclass_fields__.keys():
+            getattr(self, attr_name).nc_write(nc, nc_map=nc_map, nc_exclude=nc_exclude)
+
+
+def scan_starts(time: np.ndarray, elevation: np.ndarray, nrays: int) -> np.ndarray:
+    """Returns indices of the first rays of scans.
+
+    A scan is `nrays` consecutive rays. A new scan also starts when the
+    elevation changes or after a gap in time, so incomplete scans at the
+    end of a file are not mixed with the next file.
+    """
+    if time.size == 0:
+        return np.zeros(0, dtype=np.intp)
+    interval = np.diff(time)
+    max_gap = MAX_GAP_FACTOR * np.median(interval) if interval.size else np.inf
+    is_break = np.concatenate(
+        (
+            [True],
+            (np.abs(np.diff(elevation)) > ELEVATION_TOLERANCE) | (interval > max_gap),
+        )
+    )
+    segment_starts = np.flatnonzero(is_break)
+    position = np.arange(time.size) - segment_starts[np.cumsum(is_break) - 1]
+    starts: np.ndarray = np.flatnonzero(position % nrays == 0)
+    return starts
+
+
+def compute_wind_profile(
+    time: Variable,
+    azimuth: Variable,
+    elevation: Variable,
+    doppler_velocity: Variable,
+    nrays: int,
+    *,
+    screen: Variable | None = None,
+) -> WindProfile:
+    """Fits u, v and w to radial velocities of each scan and gate.
+
+    Radial velocity of a ray is ``u sin(az) cos(el) + v cos(az) cos(el) +
+    w sin(el)``. Normal equations of all scans and gates are accumulated
+    and solved at once. Gates flagged in `screen` are left out of the fits.
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    if (
+        not is_ndarray(time.data)
+        or not is_ndarray(azimuth.data)
+        or not is_ndarray(elevation.data)
+        or not is_ndarray(doppler_velocity.data)
+    ):
+        raise TypeError
+    starts = scan_starts(time.data, elevation.data, nrays)
+    scan_sizes = np.diff(starts, append=time.data.size)
+    scan_index = np.repeat(np.arange(starts.size), scan_sizes)
+    az = np.deg2rad(azimuth.data)
+    el = np.deg2rad(elevation.data)
+    basis = np.stack([np.sin(az) * np.cos(el), np.cos(az) * np.cos(el), np.sin(el)])
+    pairs = list(itertools.combinations_with_replacement(range(3), 2))
+    weights = _weights(doppler_velocity, screen)
+    velocity = np.where(weights > 0, np.ma.getdata(doppler_velocity.data), 0)
+    sums = _scan_sums(
+        np.stack([np.ones_like(az)] + [basis[i] * basis[j] for i, j in pairs]),
+        starts,
+        weights,
+    )
+    nvalid = sums[0]
+    wind, valid = _solve_symmetric3(
+        dict(zip(pairs, sums[1:])),
+        list(_scan_sums(basis, starts, weights * velocity)),
+    )
+    valid &= nvalid >= MIN_RAYS
+    residual = velocity - np.einsum("rgk,kr->rg", wind[scan_index], basis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rmse = np.sqrt(
+            _scan_sums(np.ones_like(az)[np.newaxis], starts, weights * residual**2)[0]
+            / nvalid
+        )
+    return WindProfile(
+        time=Variable(
+            name="time_wind",
+            long_name="time of a wind scan",
+            comment="Mean time of the rays of a scan",
+            calendar="standard",
+            units=time.units,
+            dimensions=("time_wind",),
+            data=np.add.reduceat(time.data, starts) / scan_sizes,
+        ),
+        uwind=_wind_variable(
+            "uwind", "eastward_wind", "zonal wind", wind[..., 0], valid
+        ),
+        vwind=_wind_variable(
+            "vwind", "northward_wind", "meridional wind", wind[..., 1], valid
+        ),
+        wwind=_wind_variable(
+            "wwind", "upward_air_velocity", "vertical wind", wind[..., 2], valid
+        ),
+        wind_rmse=_wind_variable(
+            "wind_rmse", None, "root mean square error of the wind fit", rmse, valid
+        ),
+        wind_nrays=Variable(
+            name="wind_nrays",
+            long_name="number of rays in the wind fit",
+            dimensions=("time_wind", "range"),
+            data=nvalid.astype(np.int32),
+        ),
+    )
+
+
+def _scan_sums(factors: np.ndarray, starts: np.ndarray, data: np.ndarray) -> np.ndarray:
+    """Sums ``factors[k, ray] * data[ray, gate]`` over the rays of each scan.
+
+    Returns an array of shape (factors, scans, gates).
+    """
+    if starts.size == 0:
+        return np.zeros((len(factors), 0, data.shape[1]))
+    return np.stack(
+        [
+            np.add.reduceat(factor[:, np.newaxis] * data, starts, axis=0)
+            for factor in factors
+        ]
+    )
+
+
+def _solve_symmetric3(
+    normal: dict[tuple[int, int], np.ndarray], rhs: list[np.ndarray]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Solves 3x3 symmetric systems elementwise with the adjugate matrix.
+
+    `normal` holds the upper triangle. Returns the solutions stacked along
+    the last axis and a mask of well-conditioned systems.
+    """
+    a, b, c = normal[0, 0], normal[0, 1], normal[0, 2]
+    d, e, f = normal[1, 1], normal[1, 2], normal[2, 2]
+    adjugate = {
+        (0, 0): d * f - e * e,
+        (0, 1): c * e - b * f,
+        (0, 2): b * e - c * d,
+        (1, 1): a * f - c * c,
+        (1, 2): b * c - a * e,
+        (2, 2): a * d - b * b,
+    }
+    det = a * adjugate[0, 0] + b * adjugate[0, 1] + c * adjugate[0, 2]
+    # Determinant is at most (trace / 3) ** 3, the product of the eigenvalues
+    # if they were equal
+    valid = det > MIN_DETERMINANT_RATIO * ((a + d + f) / 3) ** 3
+    safe_det = np.where(valid, det, 1)
+    solution = np.stack(
+        [
+            sum(adjugate[min(i, j), max(i, j)] * rhs[j] for j in range(3)) / safe_det
+            for i in range(3)
+        ],
+        axis=-1,
+    )
+    return solution, valid
+
+
+def _weights(doppler_velocity: Variable, screen: Variable | None) -> np.ndarray:
+    if not is_ndarray(doppler_velocity.data):
+        raise TypeError
+    mask = np.ma.getmaskarray(doppler_velocity.data)
+    if screen is not None:
+        if not is_ndarray(screen.data):
+            raise TypeError
+        mask = mask | screen.data
+    weights: np.ndarray = (~mask).astype(np.float64)
+    return weights
+
+
+def _wind_variable(
+    name: str,
+    standard_name: str | None,
+    long_name: str,
+    data: np.ndarray,
+    valid: np.ndarray,
+) -> Variable:
+    return Variable(
+        name=name,
+        standard_name=standard_name,
+        long_name=long_name,
+        units="m s-1",
+        dimensions=("time_wind", "range"),
+        data=np.ma.masked_array(data, mask=~valid),
+    )
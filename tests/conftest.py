@@ -0,0 +1,103 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+raw_files_pass = Path("tests/raw-files/pass/")
+
+
+class CloudnetStub:
+    """Local stand-in for the Cloudnet raw-files API."""
+
+    def __init__(self, files: list[tuple[Path, str, str]]):
+        self.files = {}
+        self.records = []
+        self.requests = []
+        # Seconds to wait before serving a file, keyed by filename
+        self.delays = {}
+        self.served = []
+        for path, filename, date in files:
+            uuid_ = str(uuid.uuid5(uuid.NAMESPACE_URL, str(path)))
+            content = path.read_bytes()
+            self.files[uuid_] = content
+            self.records.append(
+                {
+                    "uuid": uuid_,
+                    "filename": filename,
+                    "measurementDate": date,
+                    "checksum": hashlib.md5(content).hexdigest(),
+                    "size": str(len(content)),
+                    "downloadUrl": f"/files/{uuid_}",
+                    "tags": [],
+                }
+            )
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        for record in self.records:
+            record["downloadUrl"] = self.base_url + record["downloadUrl"]
+        self.url = f"{self.base_url}/api/raw-files"
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):  # pylint: disable=invalid-name
+                url = urlparse(self.path)
+                stub.requests.append(self.path)
+                if url.path == "/api/raw-files":
+                    params = parse_qs(url.query)
+                    date_from = params["dateFrom"][0]
+                    date_to = params["dateTo"][0]
+                    body = json.dumps(
+                        [
+                            r
+                            for r in stub.records
+                            if date_from <= r["measurementDate"] <= date_to
+                        ]
+                    ).encode()
+                elif url.path.startswith("/files/"):
+                    uuid_ = url.path.removeprefix("/files/")
+                    body = stub.files[uuid_]
+                    filename = next(
+                        r["filename"] for r in stub.records if r["uuid"] == uuid_
+                    )
+                    time.sleep(stub.delays.get(filename, 0))
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                if url.path.startswith("/files/"):
+                    stub.served.append(filename)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def cloudnet_api():
+    bg_dir = raw_files_pass.joinpath("eriswil-2022-12-14-background")
+    files = [
+        (raw_files_pass.joinpath(f"eriswil-2022-12-14-{fname}"), fname, "2022-12-14")
+        for fname in ("Stare_91_20221214_11.hpl", "Stare_91_20221214_12.hpl")
+    ] + [(path, path.name, "2022-12-14") for path in sorted(bg_dir.iterdir())]
+    with CloudnetStub(files) as stub:
+        yield stub
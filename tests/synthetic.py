@@ -0,0 +1,231 @@
+"""Synthetic raw files for benchmarks and tests.
+
+The generated files follow the layouts of real HALO Photonics files, but
+the values only roughly resemble real measurements: an aerosol layer that
+decays with range, noise above it and, for VAD scans, radial velocities
+of a constant horizontal wind.
+"""
+from __future__ import annotations
+
+import dataclasses
+import datetime
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+FOLDING_VELOCITY = 19.2
+INSTRUMENT_SPECTRAL_WIDTH = 5.656623
+BACKGROUND_LEVEL = 1.6e7
+WIND_U = 5.0
+WIND_V = -3.0
+
+
+class HplFormat(Enum):
+    PLAIN = "plain"
+    # Spectral width is listed in the data line header
+    SPECTRAL_WIDTH_DATA = "spectral_width_data"
+    # Only the header end tells about the extra spectral width column
+    SPECTRAL_WIDTH_HEADER = "spectral_width_header"
+    VAD = "vad"
+
+
+@dataclass(frozen=True, slots=True)
+class HplSpec:
+    start: datetime.datetime
+    duration: float = 3600.0
+    profile_interval: float = 10.0
+    ngates: int = 250
+    hpl_format: HplFormat = HplFormat.PLAIN
+    gate_range: float = 30.0
+    system_id: int = 999
+    nrays: int = 6
+    elevation: float = 75.0
+    seed: int = 0
+
+    @property
+    def nprofiles(self) -> int:
+        return max(1, int(self.duration // self.profile_interval))
+
+
+@dataclass(slots=True)
+class SyntheticDataset:
+    halo_files: list[Path]
+    background_files: list[Path]
+
+
+def hpl_filename(spec: HplSpec) -> str:
+    if spec.hpl_format == HplFormat.VAD:
+        return f"VAD_{spec.system_id}_{spec.start:%Y%m%d_%H%M%S}.hpl"
+    return f"Stare_{spec.system_id}_{spec.start:%Y%m%d_%H}.hpl"
+
+
+def hpl_bytes(spec: HplSpec) -> bytes:
+    rng = np.random.default_rng(spec.seed)
+    time = spec.start.timestamp() + spec.profile_interval * np.arange(spec.nprofiles)
+    decimal_time = (time % 86400) / 3600
+    if spec.hpl_format == HplFormat.VAD:
+        azimuth = (np.arange(spec.nprofiles) % spec.nrays) * 360 / spec.nrays
+        elevation = np.full(spec.nprofiles, spec.elevation)
+    else:
+        azimuth = np.zeros(spec.nprofiles)
+        elevation = np.full(spec.nprofiles, 90.0)
+    columns = _gate_columns(rng, spec, _radial_velocity(azimuth, elevation))
+    gate_line = "%3d %.4f %.6f %.6E"
+    if spec.hpl_format == HplFormat.PLAIN:
+        columns = columns[:-1]
+    else:
+        gate_line += " %.4f"
+    gates = range(spec.ngates)
+    lines = [_header(spec)]
+    for p in range(spec.nprofiles):
+        lines.append(
+            f"{decimal_time[p]:.8f} {azimuth[p]:6.2f} {elevation[p]:6.2f}"
+            f" {rng.normal(0, 0.05):5.2f} {rng.normal(0, 0.3):5.2f}"
+        )
+        lines.extend(
+            gate_line % values
+            for values in zip(gates, *(column[p] for column in columns))
+        )
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+def write_hpl(directory: Path, spec: HplSpec) -> Path:
+    path = directory.joinpath(hpl_filename(spec))
+    path.write_bytes(hpl_bytes(spec))
+    return path
+
+
+def background_filename(time: datetime.datetime) -> str:
+    return f"Background_{time:%d%m%y-%H%M%S}.txt"
+
+
+def background_bytes(ngates: int, seed: int = 0, newlines: bool = True) -> bytes:
+    """Creates a background profile.
+
+    Some instruments write background files without newlines, which is
+    mimicked with `newlines=False`.
+    """
+    rng = np.random.default_rng(seed)
+    background = (
+        BACKGROUND_LEVEL
+        * (1 + 0.01 * np.linspace(0, 1, ngates))
+        * (1 + rng.normal(0, 0.002, ngates))
+    )
+    values = [f"{value:.6f}" for value in background]
+    if newlines:
+        return ("\r\n".join(values) + "\r\n").encode()
+    return "".join(values).encode()
+
+
+def write_background(
+    directory: Path,
+    time: datetime.datetime,
+    ngates: int = 250,
+    seed: int = 0,
+    newlines: bool = True,
+) -> Path:
+    path = directory.joinpath(background_filename(time))
+    path.write_bytes(background_bytes(ngates, seed=seed, newlines=newlines))
+    return path
+
+
+def write_dataset(
+    directory: Path,
+    spec: HplSpec,
+    hours: int = 24,
+    background_newlines: bool = True,
+) -> SyntheticDataset:
+    """Writes hourly raw files and backgrounds starting at `spec.start`.
+
+    Each hour gets a background file and a raw file starting ten seconds
+    later, so every profile has a preceding background measurement.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    dataset = SyntheticDataset(halo_files=[], background_files=[])
+    for hour in range(hours):
+        start = spec.start + datetime.timedelta(hours=hour)
+        dataset.background_files.append(
+            write_background(
+                directory,
+                start,
+                ngates=spec.ngates,
+                seed=spec.seed + hour,
+                newlines=background_newlines,
+            )
+        )
+        hour_spec = dataclasses.replace(
+            spec,
+            start=start + datetime.timedelta(seconds=10),
+            duration=min(spec.duration, 3590.0),
+            seed=spec.seed + hour,
+        )
+        dataset.halo_files.append(write_hpl(directory, hour_spec))
+    return dataset
+
+
+def _header(spec: HplSpec) -> str:
+    data_line2 = "Range Gate  Doppler (m/s)  Intensity (SNR + 1)  Beta (m-1 sr-1)"
+    precisions2 = "i3,1x,f6.4,1x,f8.6,1x,e12.6"
+    if spec.hpl_format in (HplFormat.SPECTRAL_WIDTH_DATA, HplFormat.VAD):
+        data_line2 += " Spectral Width"
+        precisions2 += ",1x,f6.4"
+    end = "****"
+    if spec.hpl_format != HplFormat.PLAIN:
+        end += f" Instrument spectral width = {INSTRUMENT_SPECTRAL_WIDTH}"
+    is_vad = spec.hpl_format == HplFormat.VAD
+    lines = [
+        f"Filename:\t{hpl_filename(spec)}",
+        f"System ID:\t{spec.system_id}",
+        f"Number of gates:\t{spec.ngates}",
+        f"Range gate length (m):\t{spec.gate_range}",
+        "Gate length (pts):\t10",
+        "Pulses/ray:\t10000",
+        f"No. of rays in file:\t{spec.nrays if is_vad else 1}",
+        f"Scan type:\t{'VAD' if is_vad else 'Stare'}",
+        "Focus range:\t65535",
+        f"Start time:\t{spec.start:%Y%m%d %H:%M:%S}."
+        f"{spec.start.microsecond // 10000:02d}",
+        "Resolution (m/s):\t0.0382",
+        f"{'Range' if is_vad else 'Altitude'} of measurement (center of gate)"
+        " = (range gate + 0.5) * Gate length",
+        "Data line 1: Decimal time (hours)  Azimuth (degrees)  Elevation (degrees)"
+        " Pitch (degrees) Roll (degrees)",
+        "f9.6,1x,f6.2,1x,f6.2",
+        f"Data line 2: {data_line2}",
+        f"{precisions2} - repeat for no. gates",
+        end,
+    ]
+    return "\r\n".join(lines)
+
+
+def _gate_columns(
+    rng: np.random.Generator, spec: HplSpec, radial_velocity: npt.NDArray
+) -> list[npt.NDArray]:
+    """Doppler velocity, intensity, beta and spectral width."""
+    range_ = (np.arange(spec.ngates) + 0.5) * spec.gate_range
+    layer_depth = 1000 + 200 * np.sin(
+        np.linspace(0, np.pi, spec.nprofiles) + rng.uniform(0, np.pi)
+    )
+    snr = 0.5 * np.exp(-range_[np.newaxis, :] / layer_depth[:, np.newaxis])
+    signal = snr > 0.02
+    doppler = np.where(
+        signal,
+        radial_velocity[:, np.newaxis] + rng.normal(0, 0.2, snr.shape),
+        rng.uniform(-FOLDING_VELOCITY, FOLDING_VELOCITY, snr.shape),
+    )
+    intensity = 1 + snr + rng.normal(0, 0.005, snr.shape)
+    beta = 2e-5 * (intensity - 1)
+    spectral_width = np.where(signal, rng.uniform(1, 2, snr.shape), 6.0)
+    return [doppler, intensity, beta, spectral_width]
+
+
+def _radial_velocity(azimuth: npt.NDArray, elevation: npt.NDArray) -> npt.NDArray:
+    azimuth_rad = np.deg2rad(azimuth)
+    elevation_rad = np.deg2rad(elevation)
+    velocity: npt.NDArray = (
+        WIND_U * np.sin(azimuth_rad) + WIND_V * np.cos(azimuth_rad)
+    ) * np.cos(elevation_rad)
+    return velocity
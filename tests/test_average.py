@@ -0,0 +1,93 @@
+import datetime
+from pathlib import Path
+
+import numpy as np
+import pytest
+from synthetic import HplFormat, HplSpec, write_hpl
+
+from haloreader.averaging import TimeBins
+from haloreader.pipeline import process
+from haloreader.read import read, read_bg
+from haloreader.variable import Variable
+
+raw_files_pass = Path("tests/raw-files/pass/")
+BG_FILES = sorted(raw_files_pass.joinpath("eriswil-2022-12-14-background").iterdir())
+HPL_FILES = [
+    raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl"),
+    raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_12.hpl"),
+]
+START = datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+def _time(data):
+    return Variable(name="time", dimensions=("time",), data=np.array(data))
+
+
+def test_time_bins():
+    bins = TimeBins.from_time(_time([0.0, 5.0, 9.0, 31.0, 95.0, 99.0]), 30)
+    np.testing.assert_array_equal(bins.starts, [0, 3, 4])
+    np.testing.assert_array_equal(bins.counts, [3, 1, 2])
+    np.testing.assert_array_equal(bins.centres, [15.0, 45.0, 105.0])
+    data = np.arange(12.0).reshape(6, 2)
+    np.testing.assert_allclose(bins.mean(data), [[2, 3], [6, 7], [9, 10]])
+    weights = np.array([[1, 0], [0, 0], [0, 0], [1, 1], [3, 0], [1, 0]])
+    np.testing.assert_allclose(
+        bins.weighted_mean(data, weights), [[0, 3], [6, 7], [8.5, 10]]
+    )
+    degrees = np.array([350.0, 30.0, 10.0, 90.0, 170.0, 190.0])
+    np.testing.assert_allclose(bins.circular_mean(degrees), [10, 90, 180], atol=1e-9)
+
+
+def test_time_bins_errors():
+    with pytest.raises(ValueError):
+        TimeBins.from_time(_time([0.0, 10.0]), 0)
+    with pytest.raises(ValueError):
+        TimeBins.from_time(_time([40.0, 10.0]), 30)
+
+
+def test_read_average():
+    full = read(HPL_FILES)
+    halo = read(HPL_FILES, average=60)
+    assert halo.time.data.size < full.time.data.size
+    assert np.all(np.mod(halo.time.data, 60) == 30)
+    assert np.all(np.diff(halo.time.data) > 0)
+    assert halo.intensity_raw.data.shape == (
+        halo.time.data.size,
+        full.range.data.size,
+    )
+    np.testing.assert_array_equal(halo.range.data, full.range.data)
+    first = full.time.data < halo.time.data[0] + 30
+    np.testing.assert_allclose(
+        halo.intensity_raw.data[0], full.intensity_raw.data[first].mean(axis=0)
+    )
+    process(halo, read_bg(BG_FILES))
+    assert halo.beta_screened is not None
+
+
+def test_average_weights_doppler_with_snr(tmp_path):
+    spec = HplSpec(start=START, duration=60, ngates=5)
+    halo = read([write_hpl(tmp_path, spec)])
+    halo.intensity_raw.data[:] = 1
+    halo.intensity_raw.data[0] = 2
+    expected = halo.doppler_velocity.data[0].copy()
+    halo.average(3600)
+    assert halo.time.data.size == 1
+    np.testing.assert_allclose(halo.doppler_velocity.data[0], expected)
+
+
+def test_read_average_skips_vad(tmp_path, caplog):
+    path = write_hpl(tmp_path, HplSpec(start=START, hpl_format=HplFormat.VAD))
+    halo = read([path], average=30)
+    np.testing.assert_array_equal(halo.time.data, read([path]).time.data)
+    assert "Not averaging" in caplog.text
+
+
+def test_average_errors(tmp_path):
+    vad = read([write_hpl(tmp_path, HplSpec(start=START, hpl_format=HplFormat.VAD))])
+    with pytest.raises(ValueError):
+        vad.average(30)
+    halo = read(HPL_FILES[:1])
+    halo.correct_background(read_bg(BG_FILES))
+    halo.compute_beta()
+    with pytest.raises(ValueError):
+        halo.average(30)
@@ -0,0 +1,47 @@
+import datetime
+
+from synthetic import background_filename
+
+from halodata.background_plan import plan_backgrounds
+
+DAY = datetime.datetime(2023, 6, 30, tzinfo=datetime.timezone.utc)
+
+
+def _filenames(ndays):
+    start = DAY - datetime.timedelta(days=ndays)
+    return [
+        background_filename(start + datetime.timedelta(hours=i, seconds=10))
+        for i in range((ndays + 1) * 24)
+    ]
+
+
+def _span():
+    return DAY.timestamp(), (DAY + datetime.timedelta(days=1)).timestamp()
+
+
+def test_plan_backgrounds():
+    filenames = _filenames(30)
+    selected = plan_backgrounds(filenames, *_span(), amplifier_samples=100)
+    assert len(selected) == 125
+    assert selected == sorted(set(selected))
+    # The day and the background preceding it
+    assert set(range(len(filenames) - 25, len(filenames))) <= set(selected)
+    # Older backgrounds are spread over the whole window
+    assert selected[0] == 0
+    assert selected[1] - selected[0] > 1
+
+
+def test_plan_backgrounds_keeps_required():
+    filenames = _filenames(3)
+    selected = plan_backgrounds(filenames, *_span(), amplifier_samples=0)
+    assert selected == list(range(len(filenames) - 25, len(filenames)))
+
+
+def test_plan_backgrounds_all():
+    filenames = _filenames(3)[::-1] + ["README.txt"]
+    assert plan_backgrounds(filenames, *_span(), amplifier_samples=None) == list(
+        range(len(filenames) - 1)
+    )
+    assert len(plan_backgrounds(filenames, *_span(), amplifier_samples=1000)) == (
+        len(filenames) - 1
+    )
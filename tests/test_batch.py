@@ -0,0 +1,95 @@
+import datetime
+
+import pytest
+
+from halodata.cache import DownloadCache
+from haloreader import batch
+from haloreader.batch import (
+    BatchJob,
+    BatchOptions,
+    JobStatus,
+    jobs_from_manifest,
+    jobs_from_range,
+    run_batch,
+    summary,
+)
+from haloreader.manifest import manifest_path
+from haloreader.pipeline import ProcessOptions, ProcessStatus, process_cloudnet
+
+
+def test_jobs_from_range():
+    jobs = jobs_from_range(
+        ["warsaw", "hyytiala"], datetime.date(2023, 1, 30), datetime.date(2023, 2, 1)
+    )
+    assert len(jobs) == 6
+    assert jobs[2] == BatchJob(site="warsaw", date=datetime.date(2023, 2, 1))
+
+
+def test_jobs_from_manifest(tmp_path):
+    manifest = tmp_path.joinpath("manifest.txt")
+    manifest.write_text("# site date\nwarsaw 2023-01-30\n\nhyytiala,2023-02-01\n")
+    jobs = jobs_from_manifest(manifest)
+    assert jobs == [
+        BatchJob(site="warsaw", date=datetime.date(2023, 1, 30)),
+        BatchJob(site="hyytiala", date=datetime.date(2023, 2, 1)),
+    ]
+    for content in ("warsaw\n", "warsaw 2023-01-30 extra\n", "warsaw 2023-13-01\n"):
+        manifest.write_text(f"# site date\n{content}")
+        with pytest.raises(ValueError, match="manifest.txt:2: expected a site"):
+            jobs_from_manifest(manifest)
+
+
+def test_run_batch(tmp_path, monkeypatch):
+    def fake_process_cloudnet(site, date, output, cache=None, options=None):
+        if site == "broken":
+            raise ValueError("broken site")
+        if date.day == 2:
+            return ProcessStatus.NO_DATA
+        output.write_bytes(b"")
+        return ProcessStatus.PROCESSED
+
+    monkeypatch.setattr(batch, "process_cloudnet", fake_process_cloudnet)
+    jobs = jobs_from_range(
+        ["warsaw", "broken"], datetime.date(2023, 1, 1), datetime.date(2023, 1, 2)
+    )
+    results = run_batch(jobs, BatchOptions(output_dir=tmp_path), workers=1)
+    statuses = [(r.job.site, r.job.date.day, r.status) for r in results]
+    assert statuses == [
+        ("broken", 1, JobStatus.FAILED),
+        ("broken", 2, JobStatus.FAILED),
+        ("warsaw", 1, JobStatus.OK),
+        ("warsaw", 2, JobStatus.SKIPPED),
+    ]
+    assert tmp_path.joinpath("halo_warsaw_2023-01-01.nc").exists()
+    assert summary(results).startswith("OK: 1, SKIPPED: 1, UP_TO_DATE: 0, FAILED: 2")
+
+
+def test_run_batch_workers(cloudnet_api, tmp_path, monkeypatch):
+    monkeypatch.setenv("HALODATA_API_URL", cloudnet_api.url)
+    jobs = jobs_from_range(
+        ["eriswil"], datetime.date(2022, 12, 13), datetime.date(2022, 12, 14)
+    )
+    options = BatchOptions(
+        output_dir=tmp_path.joinpath("out"), cache_dir=tmp_path.joinpath("cache")
+    )
+    results = run_batch(jobs, options, workers=2)
+    assert [r.status for r in results] == [JobStatus.SKIPPED, JobStatus.OK]
+    assert tmp_path.joinpath("out", "halo_eriswil_2022-12-14.nc").exists()
+
+
+def test_process_cloudnet_up_to_date(cloudnet_api, tmp_path, monkeypatch):
+    monkeypatch.setenv("HALODATA_API_URL", cloudnet_api.url)
+    cache = DownloadCache(tmp_path.joinpath("cache"))
+    output = tmp_path.joinpath("halo.nc")
+    date = datetime.date(2022, 12, 14)
+    status = process_cloudnet("eriswil", date, output, cache=cache)
+    assert status == ProcessStatus.PROCESSED
+    assert manifest_path(output).exists()
+    status = process_cloudnet("eriswil", date, output, cache=cache)
+    assert status == ProcessStatus.UP_TO_DATE
+    status = process_cloudnet(
+        "eriswil", date, output, cache=cache, options=ProcessOptions(force=True)
+    )
+    assert status == ProcessStatus.PROCESSED
+    status = process_cloudnet("eriswil", date.replace(day=13), output, cache=cache)
+    assert status == ProcessStatus.NO_DATA
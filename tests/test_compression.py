@@ -0,0 +1,142 @@
+import bz2
+import gzip
+import io
+import lzma
+import tarfile
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from haloreader import compression
+from haloreader.compression import (
+    MAGIC_NBYTES,
+    Compression,
+    expand_archives,
+    is_archive,
+    open_decompressed,
+    strip_compression_suffix,
+)
+from haloreader.exceptions import UnsupportedCompression
+from haloreader.read import read, read_bg
+
+raw_files_pass = Path("tests/raw-files/pass/")
+HPL = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl")
+BG_DIR = raw_files_pass.joinpath("eriswil-2022-12-14-background")
+
+COMPRESSORS = {
+    ".gz": gzip.compress,
+    ".bz2": bz2.compress,
+    ".xz": lzma.compress,
+}
+
+
+@pytest.mark.parametrize("suffix", COMPRESSORS)
+def test_compressed_files(tmp_path, suffix):
+    hpl = tmp_path.joinpath(HPL.name + suffix)
+    hpl.write_bytes(COMPRESSORS[suffix](HPL.read_bytes()))
+    bg_paths = []
+    for bg in sorted(BG_DIR.iterdir()):
+        bg_paths.append(tmp_path.joinpath(bg.name + suffix))
+        bg_paths[-1].write_bytes(COMPRESSORS[suffix](bg.read_bytes()))
+
+    halo = read([hpl])
+    expected = read([HPL])
+    np.testing.assert_array_equal(halo.time.data, expected.time.data)
+    np.testing.assert_array_equal(halo.intensity_raw.data, expected.intensity_raw.data)
+    halobg = read_bg(bg_paths)
+    assert halobg.background.data.shape == (2, 250)
+
+
+def test_compression_detected_by_content(tmp_path):
+    hpl = tmp_path.joinpath("no_suffix.hpl")
+    hpl.write_bytes(gzip.compress(HPL.read_bytes()))
+    assert read([hpl]) is not None
+    with open_decompressed(hpl) as stream:
+        assert isinstance(stream, gzip.GzipFile)
+        assert stream.read() == HPL.read_bytes()
+    with open_decompressed(HPL) as stream:
+        assert stream.read(MAGIC_NBYTES) == HPL.read_bytes()[:MAGIC_NBYTES]
+
+
+def test_plain_file_opened_once(monkeypatch):
+    opened = []
+    open_ = Path.open
+
+    def _counting_open(path, *args, **kwargs):
+        opened.append(path)
+        return open_(path, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "open", _counting_open)
+    assert read([HPL]) is not None
+    assert opened == [HPL]
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz", "w:xz"])
+def test_tar(tmp_path, mode):
+    archive = tmp_path.joinpath("day.tar")
+    with tarfile.open(archive, mode) as tar:
+        tar.add(HPL, arcname=f"day/{HPL.name}")
+        gz_bg = tmp_path.joinpath("Background_141222-000013.txt.gz")
+        gz_bg.write_bytes(
+            gzip.compress(BG_DIR.joinpath("Background_141222-000013.txt").read_bytes())
+        )
+        tar.add(gz_bg, arcname=f"day/{gz_bg.name}")
+        tar.add(BG_DIR.joinpath("Background_141222-010013.txt"), arcname="README")
+    assert is_archive(archive)
+    assert not is_archive(HPL)
+    names = [name for name, _ in expand_archives([archive])]
+    assert names == [HPL.name, "Background_141222-000013.txt", "README"]
+
+    halo = read([archive])
+    assert halo.time.data.shape == read([HPL]).time.data.shape
+    halobg = read_bg([archive])
+    assert halobg.background.data.shape == (1, 250)
+
+
+def test_zip(tmp_path):
+    archive = tmp_path.joinpath("day.zip")
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zip_:
+        zip_.write(HPL, arcname=HPL.name)
+        for bg in sorted(BG_DIR.iterdir()):
+            zip_.writestr(bg.name + ".bz2", bz2.compress(bg.read_bytes()))
+    assert is_archive(archive)
+    assert read([archive]) is not None
+    assert read_bg([archive]).background.data.shape == (2, 250)
+
+
+def test_expand_archives_lazily(tmp_path, monkeypatch):
+    archive = tmp_path.joinpath("day.tar")
+    with tarfile.open(archive, "w") as tar:
+        for bg in sorted(BG_DIR.iterdir()):
+            tar.add(bg, arcname=bg.name)
+    members = []
+    member = compression._member
+
+    def _counting_member(*args):
+        members.append(member(*args))
+        return members[-1]
+
+    monkeypatch.setattr(compression, "_member", _counting_member)
+    sources = expand_archives([HPL, archive])
+    assert not members
+    next(sources)
+    next(sources)
+    assert len(members) == 1
+
+
+def test_detect():
+    assert Compression.detect(gzip.compress(b"x")) == Compression.GZIP
+    assert Compression.detect(b"\x28\xb5\x2f\xfd\x00") == Compression.ZSTD
+    assert Compression.detect(b"1 2 3") is None
+    assert strip_compression_suffix("Background_141222-000013.txt.zst") == (
+        "Background_141222-000013.txt"
+    )
+
+
+def test_zstd_without_zstandard(monkeypatch):
+    monkeypatch.setitem(__import__("sys").modules, "zstandard", None)
+    with pytest.raises(UnsupportedCompression):
+        with open_decompressed(io.BytesIO(b"\x28\xb5\x2f\xfd" + bytes(10))):
+            pass
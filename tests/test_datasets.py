@@ -0,0 +1,152 @@
+import datetime
+import hashlib
+import os
+
+import numpy as np
+import pytest
+
+import halodata.datasets
+from halodata.cache import DEFAULT_MAX_BYTES, DownloadCache
+from halodata.datasets import BackgroundLibrary, Session, get_halo_cloudnet
+from halodata.records import RecordIndex
+from haloreader.exceptions import ChecksumMismatch
+from haloreader.scantype import ScanType
+
+date = datetime.date(2022, 12, 14)
+
+
+def test_get_halo_cloudnet(cloudnet_api, tmp_path):
+    session = Session(url=cloudnet_api.url)
+    halo, halobg = get_halo_cloudnet(
+        "eriswil", date, session=session, cache=DownloadCache(tmp_path)
+    )
+    assert halo.time.data.shape == (3,)
+    assert halo.intensity_raw.data.shape == (3, 250)
+    assert halobg.background.data.shape == (2, 250)
+    assert np.isclose(halobg.background.data[0, 0], 610890.0)
+    ndownloads = sum(r.startswith("/files/") for r in cloudnet_api.requests)
+    assert ndownloads == 4
+    assert not list(tmp_path.glob("objects/*/.tmp-*"))
+
+
+def test_backgrounds_parsed_while_downloading(cloudnet_api, tmp_path, monkeypatch):
+    for record in cloudnet_api.records:
+        if record["filename"].endswith(".hpl"):
+            cloudnet_api.delays[record["filename"]] = 0.5
+    served_at_parse = []
+
+    def read_bg(record, path):
+        served_at_parse.append(list(cloudnet_api.served))
+        return BackgroundLibrary.read(library, record, path)
+
+    library = BackgroundLibrary()
+    monkeypatch.setattr(library, "read", read_bg)
+    monkeypatch.setattr(halodata.datasets, "BACKGROUND_LIBRARY", library)
+    session = Session(url=cloudnet_api.url)
+    halo, halobg = get_halo_cloudnet(
+        "eriswil", date, session=session, cache=DownloadCache(tmp_path)
+    )
+    assert len(served_at_parse) == 2
+    assert not any(f.endswith(".hpl") for served in served_at_parse for f in served)
+    assert halo.time.data.shape == (3,)
+    assert halobg.background.data.shape == (2, 250)
+
+
+def test_get_halo_cloudnet_cached(cloudnet_api, tmp_path):
+    session = Session(url=cloudnet_api.url)
+    get_halo_cloudnet("eriswil", date, session=session, cache=DownloadCache(tmp_path))
+    cache = DownloadCache(tmp_path)
+    assert cache.size == sum(len(f) for f in cloudnet_api.files.values())
+    halo, _ = get_halo_cloudnet("eriswil", date, session=session, cache=cache)
+    assert halo.time.data.shape == (3,)
+    ndownloads = sum(r.startswith("/files/") for r in cloudnet_api.requests)
+    assert ndownloads == 4
+
+
+def test_download_cache_checksum(tmp_path):
+    cache = DownloadCache(tmp_path)
+    with pytest.raises(ChecksumMismatch):
+        cache.put("0" * 32, [b"data"])
+    assert cache.get("0" * 32) is None
+    assert not list(tmp_path.glob("objects/*/*"))
+
+
+def test_download_cache_eviction(tmp_path):
+    cache = DownloadCache(tmp_path, max_bytes=9)
+    checksums = []
+    for content in (b"first", b"second", b"third"):
+        checksum = hashlib.md5(content).hexdigest()
+        cache.put(checksum, [content])
+        checksums.append(checksum)
+    cache.get(checksums[0])
+    cache.evict()
+    assert cache.get(checksums[0]) is not None
+    assert cache.get(checksums[1]) is None
+    assert cache.get(checksums[2]) is None
+    assert cache.size <= 9
+
+
+def test_download_cache_shared_eviction(tmp_path):
+    content = b"content"
+    checksum = hashlib.md5(content).hexdigest()
+    cache = DownloadCache(tmp_path, max_bytes=0)
+    cache.put(checksum, [content])
+    other = DownloadCache(tmp_path)
+    cache.evict()
+    # The index is trusted until opening the file fails
+    assert not other.get(checksum).exists()
+    other.discard(checksum)
+    assert other.get(checksum) is None
+    assert other.size == 0
+
+
+def test_download_cache_limits(tmp_path):
+    assert DownloadCache(tmp_path).max_bytes == DEFAULT_MAX_BYTES
+    content = b"content"
+    checksum = hashlib.md5(content).hexdigest()
+    path = DownloadCache(tmp_path).put(checksum, [content])
+    os.utime(path, (0, 0))
+    cache = DownloadCache(tmp_path, max_age=86400)
+    cache.evict()
+    assert cache.get(checksum) is None
+    assert not path.exists()
+
+
+def test_evicted_between_get_and_read(cloudnet_api, tmp_path, monkeypatch):
+    session = Session(url=cloudnet_api.url)
+    get_halo_cloudnet("eriswil", date, session=session, cache=DownloadCache(tmp_path))
+    cache = DownloadCache(tmp_path)
+    get = cache.get
+    evicted = set()
+
+    def get_and_evict(checksum):
+        # Another process evicts the file right after it is looked up
+        path = get(checksum)
+        if path is not None and checksum not in evicted:
+            evicted.add(checksum)
+            path.unlink()
+        return path
+
+    monkeypatch.setattr(cache, "get", get_and_evict)
+    monkeypatch.setattr(halodata.datasets, "BACKGROUND_LIBRARY", BackgroundLibrary())
+    halo, halobg = get_halo_cloudnet("eriswil", date, session=session, cache=cache)
+    assert halo.time.data.shape == (3,)
+    assert halobg.background.data.shape == (2, 250)
+    ndownloads = sum(r.startswith("/files/") for r in cloudnet_api.requests)
+    assert ndownloads == 8
+
+
+def test_record_index(cloudnet_api, tmp_path):
+    session = Session(url=cloudnet_api.url)
+    index = RecordIndex(session, root=tmp_path)
+    date_from = date - datetime.timedelta(days=30)
+    halo_records = index.records("eriswil", date, date, scantype=ScanType.STARE)
+    assert len(halo_records) == 2
+    assert len(index.records("eriswil", date_from, date, background=True)) == 2
+    assert len(index.records("eriswil", date, date, scantype=ScanType.VAD)) == 0
+    index = RecordIndex(session, root=tmp_path)
+    next_day = date + datetime.timedelta(days=1)
+    index.records("eriswil", date_from + datetime.timedelta(days=1), next_day)
+    api_requests = [r for r in cloudnet_api.requests if r.startswith("/api/")]
+    assert len(api_requests) == 3
+    assert "dateFrom=2022-12-15&dateTo=2022-12-15" in api_requests[-1]
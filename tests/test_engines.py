@@ -0,0 +1,97 @@
+import datetime
+import os
+import subprocess
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pytest
+from synthetic import HplFormat, HplSpec, background_bytes, write_hpl
+
+from haloreader.engines import ENGINES, get_engine
+from haloreader.exceptions import InconsistentRangeError, UnexpectedDataTokens
+from haloreader.read import read, read_bg, read_single
+
+raw_files_pass = Path("tests/raw-files/pass/")
+START = datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+def _assert_same_halo(halo, expected):
+    for name in expected.__dataclass_fields__:
+        var = getattr(expected, name)
+        if name == "metadata" or var is None:
+            continue
+        np.testing.assert_array_equal(getattr(halo, name).data, var.data)
+
+
+@pytest.mark.parametrize("path", sorted(raw_files_pass.glob("*.hpl")), ids=str)
+def test_numpy_engine_files(path):
+    _assert_same_halo(read([path], engine="numpy"), read([path], engine="cython"))
+
+
+@pytest.mark.parametrize("hpl_format", list(HplFormat))
+def test_numpy_engine_formats(tmp_path, hpl_format):
+    spec = HplSpec(start=START, duration=300, ngates=50, hpl_format=hpl_format)
+    path = write_hpl(tmp_path, spec)
+    halo = read_single(path, engine="numpy")
+    _assert_same_halo(halo, read_single(path, engine="cython"))
+    assert halo.doppler_velocity.data.flags.c_contiguous
+    assert halo.doppler_velocity.data.base is None
+
+
+@pytest.mark.parametrize("newlines", [True, False])
+def test_numpy_engine_background(newlines):
+    # The Cython engine tokenizes its input in place
+    expected = get_engine("cython").read_background(
+        background_bytes(100, newlines=newlines)
+    )
+    background = get_engine("numpy").read_background(
+        background_bytes(100, newlines=newlines)
+    )
+    assert background.data.shape == (1, 100)
+    np.testing.assert_array_equal(background.data, expected.data)
+
+
+def test_numpy_engine_background_files():
+    bg_dir = raw_files_pass.joinpath("eriswil-2022-12-14-background")
+    bg_files = sorted(bg_dir.iterdir())
+    np.testing.assert_array_equal(
+        read_bg(bg_files, engine="numpy").background.data,
+        read_bg(bg_files, engine="cython").background.data,
+    )
+
+
+def test_numpy_engine_errors():
+    src = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl")
+    content = src.read_bytes()
+    with pytest.raises(InconsistentRangeError):
+        read_single(
+            BytesIO(content.replace(b"\r\n 11 ", b"\r\n 12 ", 1)), engine="numpy"
+        )
+    with pytest.raises(UnexpectedDataTokens):
+        read_single(BytesIO(content[:-100]), engine="numpy")
+    with pytest.raises(UnexpectedDataTokens):
+        read_single(
+            BytesIO(content.replace(b"\r\n 11 ", b"\r\n x ", 1)), engine="numpy"
+        )
+
+
+def test_get_engine():
+    assert set(ENGINES) == {"cython", "numpy"}
+    assert get_engine().name == "cython"
+    assert get_engine(ENGINES["numpy"]) is ENGINES["numpy"]
+    with pytest.raises(ValueError):
+        get_engine("fortran")
+
+
+def test_without_extensions():
+    code = (
+        "import sys\n"
+        "sys.modules['haloreader.data_reader'] = None\n"
+        "from haloreader.engines import DEFAULT_ENGINE, ENGINES\n"
+        "assert DEFAULT_ENGINE == 'numpy' and list(ENGINES) == ['numpy']\n"
+        "from haloreader.read import read\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.run([sys.executable, "-c", code], check=True, env=env)
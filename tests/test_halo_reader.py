@@ -1,13 +1,22 @@
 import datetime
+import os
+import shutil
 import tempfile
+from io import BytesIO
 from pathlib import Path
 
 import numpy as np
 import pytest
 from cfchecker import cfchecks
 
-from haloreader.exceptions import FileEmpty, UnexpectedDataTokens
-from haloreader.read import _read_single, read
+from haloreader.cache import ParseCache
+from haloreader.exceptions import (
+    FileEmpty,
+    InconsistentRangeError,
+    UnexpectedDataTokens,
+)
+from haloreader.lazy import read_lazy
+from haloreader.read import read, read_single
 
 raw_files_pass = Path("tests/raw-files/pass/")
 raw_files_xfail = Path("tests/raw-files/xfail/")
@@ -105,10 +114,91 @@ def test_hyytiala():
 def test_xfail_warsaw():
     src = raw_files_xfail.joinpath("warsaw-2021-10-01-Stare_213_20211001_18.hpl")
     with pytest.raises(UnexpectedDataTokens):
-        _read_single(src)
+        read_single(src)
+
+
+def test_inconsistent_range():
+    src = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl")
+    data = src.read_bytes().replace(b"\r\n 11 ", b"\r\n 12 ", 1)
+    with pytest.raises(InconsistentRangeError):
+        read_single(BytesIO(data))
+
+
+def test_contiguous_variables():
+    src = raw_files_pass.joinpath("warsaw-2022-12-13-Stare_213_20221213_04.hpl")
+    halo = read_single(src)
+    for var in (halo.doppler_velocity, halo.intensity_raw, halo.spectral_width):
+        assert var.data.flags.c_contiguous
+        assert var.data.base is None
+    assert np.allclose(halo.range.data[:2], [15, 45])
 
 
 def test_xfail_empty():
     src = raw_files_xfail.joinpath("empty.hpl")
     with pytest.raises(FileEmpty):
-        _read_single(src)
+        read_single(src)
+
+
+def test_parse_cache(tmp_path):
+    src = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl")
+    cache = ParseCache(tmp_path)
+    assert cache.load(cache.key(src)) is None
+    halo = read([src], cache=cache)
+    halo_cached = read([src], cache=cache)
+    assert isinstance(halo_cached.intensity_raw.data, np.memmap)
+    assert halo_cached.metadata.filename == halo.metadata.filename
+    assert np.array_equal(halo_cached.time.data, halo.time.data)
+    assert np.array_equal(halo_cached.range.data, halo.range.data)
+    assert np.array_equal(halo_cached.beta_raw.data, halo.beta_raw.data)
+    halo_cached.to_nc()
+
+
+def test_parse_cache_key(tmp_path):
+    src = tmp_path.joinpath("Stare_91_20221214_11.hpl")
+    shutil.copy(
+        raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl"), src
+    )
+    cache = ParseCache(tmp_path.joinpath("cache"))
+    key = cache.key(src)
+    read([src], cache=cache)
+    assert cache.load(key) is not None
+    os.utime(src, ns=(0, 0))
+    assert cache.key(src) != key
+
+
+def test_parse_cache_eviction(tmp_path):
+    src_11 = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl")
+    src_12 = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_12.hpl")
+    cache = ParseCache(tmp_path, max_bytes=1)
+    read([src_11, src_12], cache=cache)
+    assert len(list(tmp_path.iterdir())) <= 1
+
+
+def test_lazy_sel(tmp_path):
+    src_11 = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl")
+    src_12 = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_12.hpl")
+    halo = read([src_11, src_12])
+    lazy = read_lazy([src_12, src_11], cache=ParseCache(tmp_path))
+    assert len(lazy) == 2
+    assert lazy.nloaded == 0
+    t_start, t_stop = halo.time.data[0], halo.time.data[1]
+    selected = lazy.sel(time=slice(t_start, t_stop), range=slice(None, 500))
+    assert lazy.nloaded == 1
+    assert np.array_equal(selected.time.data, halo.time.data[:2])
+    assert np.all(selected.range.data <= 500)
+    nranges = len(selected.range.data)
+    assert np.array_equal(
+        selected.intensity_raw.data, halo.intensity_raw.data[:2, :nranges]
+    )
+    assert np.array_equal(lazy.load().time.data, halo.time.data)
+    assert lazy.nloaded == 2
+
+
+def test_lazy_max_loaded():
+    srcs = [
+        raw_files_pass.joinpath(f"eriswil-2022-12-14-Stare_91_20221214_{hour}.hpl")
+        for hour in (11, 12)
+    ]
+    lazy = read_lazy(srcs, max_loaded=1)
+    assert np.array_equal(lazy.load().time.data, read(srcs).time.data)
+    assert lazy.nloaded == 1
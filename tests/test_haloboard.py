@@ -0,0 +1,116 @@
+import datetime
+import io
+
+import matplotlib.image
+import pytest
+from synthetic import HplSpec, write_hpl
+
+import haloboard.tiles
+from haloboard.app import create_app
+from haloboard.index import ImageEntry, ImageIndex
+from haloboard.tiles import TILE_HEIGHT, TILE_WIDTH
+from haloreader.read import read
+
+
+@pytest.fixture
+def client(tmp_path):
+    spec = HplSpec(
+        start=datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc),
+        duration=600,
+        ngates=50,
+    )
+    halo = read([write_hpl(tmp_path, spec)])
+    tmp_path.joinpath("halo_test.nc").write_bytes(halo.to_nc())
+    app = create_app(tmp_path.joinpath("vis"), products=tmp_path)
+    return app.test_client()
+
+
+def test_tile(client, monkeypatch):
+    nrenders = []
+    render_tile = haloboard.tiles.render_tile
+    monkeypatch.setattr(
+        haloboard.tiles,
+        "render_tile",
+        lambda *args: nrenders.append(1) or render_tile(*args),
+    )
+    res = client.get("/tiles/halo_test/doppler_velocity.png?zoom=1")
+    assert res.status_code == 200
+    assert res.mimetype == "image/png"
+    assert res.headers["Last-Modified"]
+    image = matplotlib.image.imread(io.BytesIO(res.data))
+    assert image.shape[:2] == (TILE_HEIGHT, 2 * TILE_WIDTH)
+    etag = res.headers["ETag"]
+    res = client.get(
+        "/tiles/halo_test/doppler_velocity.png?zoom=1",
+        headers={"If-None-Match": etag},
+    )
+    assert res.status_code == 304
+    assert len(nrenders) == 1
+
+
+def test_tile_window(client):
+    res = client.get(
+        "/tiles/halo_test/beta_raw.png?time_start=1685577700&range_end=300"
+    )
+    assert res.status_code == 200
+    res_full = client.get("/tiles/halo_test/beta_raw.png")
+    assert res.headers["ETag"] != res_full.headers["ETag"]
+
+
+@pytest.mark.parametrize(
+    "url, status",
+    [
+        ("/tiles/halo_test/doppler_velocity.png?zoom=9", 400),
+        ("/tiles/halo_test/doppler_velocity.png?time_start=x", 400),
+        ("/tiles/halo_test/no_such_variable.png", 404),
+        ("/tiles/halo_test/time.png", 404),
+        ("/tiles/no_such_product/doppler_velocity.png", 404),
+    ],
+)
+def test_tile_errors(client, url, status):
+    assert client.get(url).status_code == status
+
+
+def test_tile_empty_window(client):
+    res = client.get("/tiles/halo_test/beta_raw.png?time_start=0&time_end=1")
+    assert res.status_code == 404
+
+
+def _touch_images(root, names):
+    root.mkdir(exist_ok=True)
+    for name in names:
+        root.joinpath(f"{name}.png").write_bytes(b"")
+
+
+def test_image_index(tmp_path):
+    root = tmp_path.joinpath("vis")
+    _touch_images(root, ["halo_warsaw_2023-03-16", "halo_warsaw_2023-04-01", "other"])
+    index = ImageIndex(root, ttl=3600)
+    assert [e.site for e in index.entries()] == ["warsaw", "warsaw", None]
+    assert index.query(site="warsaw", date="2023-03").total == 1
+    page = index.query(page=2, per_page=2)
+    assert [e.filename for e in page.entries] == ["other.png"]
+    assert page.npages == 2
+    root.joinpath("other.png").unlink()
+    assert len(index.entries()) == 2
+
+
+def test_image_entry_variable():
+    entry = ImageEntry.from_filename("halo_mace-head_2023-03-16_beta.png")
+    assert (entry.site, entry.date, entry.variable) == (
+        "mace-head",
+        "2023-03-16",
+        "beta",
+    )
+
+
+def test_index_page(tmp_path):
+    root = tmp_path.joinpath("vis")
+    _touch_images(root, [f"halo_warsaw_2023-03-{day:02d}" for day in range(1, 31)])
+    client = create_app(root).test_client()
+    res = client.get("/?page=2&per_page=10&site=warsaw")
+    assert res.status_code == 200
+    assert b"halo_warsaw_2023-03-11.png" in res.data
+    assert b"halo_warsaw_2023-03-10.png" not in res.data
+    assert b"Page 2 / 3" in res.data
+    assert client.get("/?page=0").status_code == 400
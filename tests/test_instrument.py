@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from haloreader.instrument import PROFILER
+from haloreader.read import read
+
+raw_files_pass = Path("tests/raw-files/pass/")
+
+
+@pytest.fixture
+def profiler():
+    PROFILER.reset()
+    PROFILER.enable(trace_memory=True)
+    yield PROFILER
+    PROFILER.disable()
+    PROFILER.reset()
+
+
+def test_stages(profiler, tmp_path):
+    src_11 = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl")
+    src_12 = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_12.hpl")
+    halo = read([src_11, src_12])
+    halo.to_nc()
+    records = profiler.records
+    assert records["read_single"].calls == 2
+    assert records["read_single.read_data"].nbytes > 0
+    assert records["merge"].calls == 1
+    assert records["to_nc"].calls == 1
+    assert records["read_single"].traced_peak >= max(
+        records["read_single.parse_header"].traced_peak,
+        records["read_single.read_data"].traced_peak,
+    )
+    # An outer stage raises the process peak at least as much as a nested one
+    assert (
+        records["read_single"].peak_rss_increase
+        >= records["read_single.read_data"].peak_rss_increase
+    )
+    assert "read_single.read_data" in profiler.table()
+    profiler.dump(path := tmp_path.joinpath("profile.json"))
+    with path.open("r", encoding="utf-8") as f:
+        assert {rec["name"] for rec in json.load(f)} == set(records)
+
+
+def test_disabled():
+    PROFILER.reset()
+    src = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl")
+    read([src])
+    assert not PROFILER.records
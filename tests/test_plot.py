@@ -0,0 +1,55 @@
+import tracemalloc
+
+import matplotlib
+import numpy as np
+import pytest
+
+from haloreader.variable import Variable, decimate
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def test_decimate():
+    data = np.arange(20.0).reshape(10, 2)
+    assert decimate(data, 10) is data
+    assert np.array_equal(decimate(data, 3), [[3, 4], [11, 12], [17, 18]])
+    assert np.array_equal(decimate(data, 3, reduce="max"), [[6, 7], [14, 15], [18, 19]])
+    with pytest.raises(ValueError):
+        decimate(data, 3, reduce="median")
+
+
+def test_decimate_masked():
+    data = np.ma.masked_array(np.arange(20.0).reshape(10, 2))
+    data[:4] = np.ma.masked
+    data[4, 0] = np.ma.masked
+    decimated = decimate(data, 3)
+    assert decimated.mask[0].all()
+    assert np.array_equal(decimated[1], [12, 12])
+
+
+def test_decimate_memory():
+    data = np.ones((20000, 100))
+    tracemalloc.start()
+    try:
+        decimated = decimate(data, 999)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert decimated.shape == (953, 100)
+    assert not isinstance(decimated, np.ma.MaskedArray)
+    assert peak < data.nbytes / 10
+
+
+def test_plot_decimated():
+    fig, ax = plt.subplots(figsize=(2, 1), dpi=100)
+    var = Variable(
+        name="doppler_velocity",
+        dimensions=("time", "range"),
+        data=np.random.default_rng(0).normal(size=(10000, 20)),
+    )
+    var.plot(ax)
+    image = ax.get_images()[0]
+    assert image.get_array().shape[1] <= ax.get_window_extent().width
+    assert image.get_extent() == [-0.5, 9999.5, -0.5, 19.5]
+    plt.close(fig)
@@ -0,0 +1,39 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.image
+import numpy as np
+import pytest
+
+from haloreader.quicklook import (
+    PANEL_DPI,
+    PANEL_SIZE,
+    plot_quicklook,
+    quicklook_executor,
+)
+from haloreader.variable import Variable
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_plot_quicklook(tmp_path, monkeypatch, workers):
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(0)
+    variables = [
+        Variable(
+            name=name, dimensions=("time", "range"), data=rng.normal(size=(100, 20))
+        )
+        for name in ("intensity", "doppler_velocity")
+    ]
+    plot_quicklook("quicklook", [variables[0], None, variables[1]], workers=workers)
+    image = matplotlib.image.imread(tmp_path.joinpath("vis", "quicklook.png"))
+    assert image.shape[:2] == (
+        2 * PANEL_SIZE[1] * PANEL_DPI,
+        PANEL_SIZE[0] * PANEL_DPI,
+    )
+
+
+def test_quicklook_executor_skips_missing_panels():
+    variable = Variable(name="intensity", data=np.zeros((2, 2)))
+    with quicklook_executor([variable, None, None], workers=2) as executor:
+        assert not isinstance(executor, ProcessPoolExecutor)
+    with quicklook_executor([variable, variable], workers=2) as executor:
+        assert isinstance(executor, ProcessPoolExecutor)
@@ -0,0 +1,86 @@
+import datetime
+import gzip
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from synthetic import HplFormat, HplSpec, write_hpl
+
+from haloreader.read import GroupKey, read, read_grouped
+from haloreader.scantype import ScanType
+
+raw_files_pass = Path("tests/raw-files/pass/")
+START = datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+def _write_mixed(directory):
+    specs = [
+        HplSpec(start=START, duration=300, ngates=20),
+        HplSpec(start=START + datetime.timedelta(hours=1), duration=300, ngates=20),
+        HplSpec(start=START, duration=300, ngates=30, system_id=997),
+        HplSpec(
+            start=START,
+            duration=300,
+            ngates=20,
+            hpl_format=HplFormat.SPECTRAL_WIDTH_HEADER,
+            system_id=998,
+        ),
+        HplSpec(start=START, duration=300, ngates=20, hpl_format=HplFormat.VAD),
+    ]
+    return [write_hpl(directory, spec) for spec in specs]
+
+
+def test_read_grouped(tmp_path):
+    paths = _write_mixed(tmp_path)
+    halos = read_grouped(paths, workers=2)
+    assert list(halos) == [
+        GroupKey(ScanType.STARE, 20, 30.0, 10, False),
+        GroupKey(ScanType.STARE, 30, 30.0, 10, False),
+        GroupKey(ScanType.STARE, 20, 30.0, 10, True),
+        GroupKey(ScanType.VAD, 20, 30.0, 10, True),
+    ]
+    stare = list(halos.values())[0]
+    expected = read(paths[:2])
+    np.testing.assert_array_equal(stare.time.data, expected.time.data)
+    np.testing.assert_array_equal(stare.beta_raw.data, expected.beta_raw.data)
+    for key, halo in halos.items():
+        assert halo.range.data.size == key.ngates
+        assert (halo.spectral_width is not None) == key.spectral_width
+
+
+def test_read_grouped_in_process(tmp_path):
+    paths = _write_mixed(tmp_path)
+    parallel = read_grouped(paths, workers=2)
+    halos = read_grouped(paths, workers=1)
+    assert list(halos) == list(parallel)
+    for key, halo in halos.items():
+        np.testing.assert_array_equal(
+            halo.doppler_velocity.data, parallel[key].doppler_velocity.data
+        )
+
+
+def test_read_grouped_skips_files(tmp_path):
+    src = raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl")
+    content = src.read_bytes()
+    srcs = [
+        src,
+        BytesIO(b""),
+        BytesIO(content[:-100]),
+        raw_files_pass.joinpath("soverato-2021-10-01-VAD_194_20210624_170110.hpl"),
+    ]
+    halos = read_grouped(srcs, workers=2, average=60)
+    assert [key.scantype for key in halos] == [ScanType.STARE, ScanType.VAD]
+    stare, vad = halos.values()
+    assert np.all(np.mod(stare.time.data, 60) == 30)
+    assert vad.time.data.size == read(srcs[3:]).time.data.size
+
+
+def test_read_grouped_compressed_bytes():
+    first, second = (
+        raw_files_pass.joinpath(f"eriswil-2022-12-14-Stare_91_20221214_{hour}.hpl")
+        for hour in (11, 12)
+    )
+    for workers in (1, 2):
+        srcs = [BytesIO(gzip.compress(first.read_bytes())), second]
+        (halo,) = read_grouped(srcs, workers=workers).values()
+        np.testing.assert_array_equal(halo.time.data, read([first, second]).time.data)
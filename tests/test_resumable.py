@@ -0,0 +1,76 @@
+import datetime
+
+import numpy as np
+import pytest
+from synthetic import HplFormat, HplSpec, hpl_bytes, hpl_filename
+
+from haloreader.exceptions import HeaderNotFound
+from haloreader.halo import Halo
+from haloreader.read import read
+from haloreader.resumable import ResumableReader, complete_profiles_nbytes
+
+START = datetime.datetime(2023, 6, 1, 23, 59, tzinfo=datetime.timezone.utc)
+
+
+@pytest.mark.parametrize("hpl_format", [HplFormat.PLAIN, HplFormat.SPECTRAL_WIDTH_DATA])
+def test_growing_file(tmp_path, hpl_format):
+    spec = HplSpec(start=START, duration=120, ngates=20, hpl_format=hpl_format)
+    content = hpl_bytes(spec)
+    full = tmp_path.joinpath("full.hpl")
+    full.write_bytes(content)
+    growing = tmp_path.joinpath(hpl_filename(spec))
+    growing.write_bytes(content[:100])
+    reader = ResumableReader(growing)
+    with pytest.raises(HeaderNotFound):
+        reader.read()
+
+    rng = np.random.default_rng(0)
+    written = 100
+    while written < len(content):
+        written = min(len(content), written + int(rng.integers(1, 3000)))
+        growing.write_bytes(content[:written])
+        offset = reader.read()
+        assert offset <= written
+        assert content[offset - 2 : offset] == b"\r\n"
+    assert reader.offset == len(content)
+
+    expected = read([full])
+    assert expected is not None and reader.halo is not None
+    assert np.all(np.diff(reader.halo.time.data) > 0)
+    for name in ("time", "doppler_velocity", "intensity_raw", "azimuth"):
+        np.testing.assert_array_equal(
+            getattr(reader.halo, name).data, getattr(expected, name).data
+        )
+    assert (reader.halo.spectral_width is None) == (hpl_format == HplFormat.PLAIN)
+
+
+def test_merged_once(tmp_path, monkeypatch):
+    content = hpl_bytes(HplSpec(start=START, duration=120, ngates=20))
+    path = tmp_path.joinpath("growing.hpl")
+    path.write_bytes(content)
+    expected = read([path])
+    reader = ResumableReader(path)
+    nmerges = []
+    merge = Halo.merge
+
+    def _counting_merge(halos):
+        nmerges.append(len(halos))
+        return merge(halos)
+
+    monkeypatch.setattr(Halo, "merge", _counting_merge)
+    for written in range(2000, len(content), 2000):
+        path.write_bytes(content[:written])
+        reader.read()
+    path.write_bytes(content)
+    reader.read()
+    assert not nmerges
+    np.testing.assert_array_equal(reader.halo.time.data, expected.time.data)
+    assert len(nmerges) == 1 and nmerges[0] > 2
+    assert reader.halo is reader.halo
+
+
+def test_complete_profiles_nbytes():
+    profile = b"t\r\n" + b"g\r\n" * 2
+    assert complete_profiles_nbytes(b"", 2) == 0
+    assert complete_profiles_nbytes(profile[:-1], 2) == 0
+    assert complete_profiles_nbytes(profile * 2 + b"t\r\ng", 2) == 2 * len(profile)
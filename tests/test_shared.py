@@ -0,0 +1,147 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import haloreader.read
+import haloreader.shared
+from haloreader.halo import Halo
+from haloreader.read import read, read_grouped, read_single
+from haloreader.shared import SharedArray, allocate, dumps_oob, loads_oob, share
+from haloreader.variable import Variable
+
+raw_files_pass = Path("tests/raw-files/pass/")
+HPL_FILES = [
+    raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl"),
+    raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_12.hpl"),
+]
+
+
+def _read_shared(path):
+    return share(read_single(path))
+
+
+def _fill(shared, path, start):
+    shared.fill(read_single(path), start)
+
+
+def test_share_from_worker():
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        shared_halos = list(executor.map(_read_shared, HPL_FILES))
+    halos = [shared.attach() for shared in shared_halos]
+    for halo, path in zip(halos, HPL_FILES):
+        expected = read_single(path)
+        assert isinstance(halo, Halo)
+        np.testing.assert_array_equal(halo.time.data, expected.time.data)
+        np.testing.assert_array_equal(halo.beta_raw.data, expected.beta_raw.data)
+        assert halo.metadata.filename == expected.metadata.filename
+    # Blocks are unlinked once adopted
+    name = shared_halos[0].arrays["time."].data.name
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+def test_allocate_and_fill_in_workers():
+    template = read_single(HPL_FILES[0])
+    ntimes = [len(read_single(path).time.data) for path in HPL_FILES]
+    shared = allocate(template, sum(ntimes))
+    starts = np.cumsum([0] + ntimes[:-1])
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        list(executor.map(_fill, [shared] * len(HPL_FILES), HPL_FILES, starts))
+    halo = shared.attach()
+    expected = read(HPL_FILES)
+    np.testing.assert_array_equal(halo.time.data, expected.time.data)
+    np.testing.assert_array_equal(
+        halo.doppler_velocity.data, expected.doppler_velocity.data
+    )
+    np.testing.assert_array_equal(halo.range.data, expected.range.data)
+
+
+def test_masked_variable():
+    data = np.ma.masked_array(np.arange(6.0).reshape(3, 2), mask=[[0, 1]] * 3)
+    var = Variable(name="beta", dimensions=("time", "range"), data=data)
+    attached = share(var).attach()
+    assert isinstance(attached.data, np.ma.MaskedArray)
+    np.testing.assert_array_equal(attached.data.mask, data.mask)
+    np.testing.assert_array_equal(attached.data, data)
+
+    shared = allocate(var, 6)
+    shared.fill(var, 3)
+    filled = shared.attach()
+    assert filled.data.mask[:3].sum() == 0
+    np.testing.assert_array_equal(filled.data.mask[3:], data.mask)
+
+
+def test_shared_array():
+    array = np.arange(10, dtype=np.int32)
+    shared = SharedArray.from_array(array)
+    attached = shared.attach()
+    attached[0] = 42
+    assert shared.attach()[0] == 42
+    del attached
+    shared.unlink()
+    with pytest.raises(FileNotFoundError):
+        shared.attach()
+
+
+def test_dumps_oob():
+    halo = read_single(HPL_FILES[0])
+    data, buffers = dumps_oob(halo)
+    assert len(buffers) > 0
+    assert len(data) < sum(memoryview(b).nbytes for b in buffers)
+    loaded = loads_oob(data, buffers)
+    np.testing.assert_array_equal(loaded.intensity_raw.data, halo.intensity_raw.data)
+
+
+def _shm_names():
+    return set(os.listdir("/dev/shm"))
+
+
+@pytest.mark.parametrize("func", [share, lambda halo: allocate(halo, 10)])
+def test_no_leak_on_failure(monkeypatch, func):
+    halo = read_single(HPL_FILES[0])
+    open_ = haloreader.shared._open
+    ncreated = []
+
+    def failing_open(name=None, size=0):
+        if name is None:
+            if len(ncreated) == 3:
+                raise MemoryError
+            ncreated.append(size)
+        return open_(name, size)
+
+    before = _shm_names()
+    monkeypatch.setattr(haloreader.shared, "_open", failing_open)
+    with pytest.raises(MemoryError):
+        func(halo)
+    assert len(ncreated) == 3
+    assert _shm_names() == before
+
+
+def test_no_leak_on_worker_error(monkeypatch):
+    read_single = haloreader.read.read_single
+
+    def failing_read(src, engine=None):
+        if src == HPL_FILES[1]:
+            raise RuntimeError
+        return read_single(src, engine)
+
+    before = _shm_names()
+    monkeypatch.setattr(haloreader.read, "read_single", failing_read)
+    with pytest.raises(RuntimeError):
+        read_grouped(HPL_FILES + HPL_FILES[:1], workers=2)
+    assert _shm_names() == before
+
+
+def test_no_leak_on_interrupt(monkeypatch):
+    def interrupted_attach(self, adopt=True):
+        raise KeyboardInterrupt
+
+    before = _shm_names()
+    monkeypatch.setattr(haloreader.shared.Shared, "attach", interrupted_attach)
+    with pytest.raises(KeyboardInterrupt):
+        read_grouped(HPL_FILES, workers=2)
+    assert _shm_names() == before
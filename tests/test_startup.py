@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = {"matplotlib", "scipy", "requests", "urllib3", "sklearn", "flask"}
+
+HELP_SCRIPT = """
+import sys
+from haloreader.cli import halo_reader
+sys.argv = ["haloreader", "--help"]
+try:
+    halo_reader()
+except SystemExit:
+    pass
+"""
+
+
+def _imported_modules(script: str) -> set[str]:
+    script += "\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    res = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+    )
+    last_line = res.stdout.strip().splitlines()[-1]
+    return {module.split(".")[0] for module in json.loads(last_line)}
+
+
+@pytest.mark.parametrize(
+    "script", ["import haloreader.read", HELP_SCRIPT], ids=["import", "help"]
+)
+def test_heavy_modules_not_imported(script):
+    assert not _imported_modules(script) & HEAVY_MODULES
+
+
+def test_header_grammar_built_lazily():
+    script = (
+        "import lark\n"
+        "built = []\n"
+        "init = lark.Lark.__init__\n"
+        "lark.Lark.__init__ = lambda *a, **kw: built.append(1) or init(*a, **kw)\n"
+        "import haloreader.read\n"
+        "assert not built\n"
+    )
+    _imported_modules(script)
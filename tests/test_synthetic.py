@@ -0,0 +1,32 @@
+import datetime
+
+import pytest
+from synthetic import HplFormat, HplSpec, write_dataset, write_hpl
+
+from haloreader.read import read, read_bg
+from haloreader.scantype import ScanType
+
+START = datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+@pytest.mark.parametrize("hpl_format", list(HplFormat))
+def test_formats(tmp_path, hpl_format):
+    spec = HplSpec(start=START, duration=600, ngates=100, hpl_format=hpl_format)
+    halo = read([write_hpl(tmp_path, spec)])
+    assert halo.doppler_velocity.data.shape == (spec.nprofiles, 100)
+    assert (halo.spectral_width is None) == (hpl_format == HplFormat.PLAIN)
+    expected_scantype = ScanType.VAD if hpl_format == HplFormat.VAD else ScanType.STARE
+    assert halo.metadata.scantype.value == expected_scantype
+
+
+@pytest.mark.parametrize("background_newlines", [True, False])
+def test_dataset(tmp_path, background_newlines):
+    spec = HplSpec(start=START, duration=600, ngates=100)
+    dataset = write_dataset(
+        tmp_path, spec, hours=2, background_newlines=background_newlines
+    )
+    halo = read(dataset.halo_files)
+    halobg = read_bg(dataset.background_files)
+    assert halobg.background.data.shape == (2, 100)
+    halo.correct_background(halobg)
+    assert halo.intensity.data.shape == (2 * spec.nprofiles, 100)
@@ -0,0 +1,128 @@
+import datetime
+import logging
+import shutil
+from pathlib import Path
+
+import netCDF4
+import numpy as np
+from synthetic import HplSpec, hpl_bytes, hpl_filename, write_background, write_hpl
+
+from haloreader.pipeline import process
+from haloreader.read import read, read_bg
+from haloreader.watch import Watcher
+
+raw_files_pass = Path("tests/raw-files/pass/")
+
+
+def test_watcher(tmp_path):
+    raw_dir = tmp_path.joinpath("raw")
+    raw_dir.mkdir()
+    out_dir = tmp_path.joinpath("out")
+    bg_dir = raw_files_pass.joinpath("eriswil-2022-12-14-background")
+    for bg in bg_dir.iterdir():
+        shutil.copy(bg, raw_dir)
+    shutil.copy(
+        raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl"),
+        raw_dir.joinpath("Stare_91_20221214_11.hpl"),
+    )
+    watcher = Watcher(raw_dir, out_dir, interval=0)
+    # Raw file is parsed right away, backgrounds once their size is stable
+    assert watcher.poll() == [datetime.date(2022, 12, 14)]
+    assert watcher.poll() == [datetime.date(2022, 12, 14)]
+    assert watcher.poll() == []
+    output = out_dir.joinpath("halo_2022-12-14.nc")
+    with netCDF4.Dataset(output) as nc:
+        assert len(nc.dimensions["time"]) == 2
+        assert "beta" in nc.variables
+
+    shutil.copy(
+        raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_12.hpl"),
+        raw_dir.joinpath("Stare_91_20221214_12.hpl"),
+    )
+    watcher.run(max_polls=2)
+    with netCDF4.Dataset(output) as nc:
+        assert len(nc.dimensions["time"]) == 3
+
+
+def test_watcher_growing_file(tmp_path):
+    raw_dir = tmp_path.joinpath("raw")
+    raw_dir.mkdir()
+    out_dir = tmp_path.joinpath("out")
+    content = raw_files_pass.joinpath(
+        "eriswil-2022-12-14-Stare_91_20221214_11.hpl"
+    ).read_bytes()
+    path = raw_dir.joinpath("Stare_91_20221214_11.hpl")
+    path.write_bytes(content[: len(content) - 100])
+    watcher = Watcher(raw_dir, out_dir, interval=0)
+    assert watcher.poll() == [datetime.date(2022, 12, 14)]
+    output = out_dir.joinpath("halo_2022-12-14.nc")
+    with netCDF4.Dataset(output) as nc:
+        assert len(nc.dimensions["time"]) == 1
+    assert watcher.poll() == []
+    path.write_bytes(content)
+    assert watcher.poll() == [datetime.date(2022, 12, 14)]
+    with netCDF4.Dataset(output) as nc:
+        assert len(nc.dimensions["time"]) == 2
+
+
+def test_watcher_incremental(tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    raw_dir = tmp_path.joinpath("raw")
+    raw_dir.mkdir()
+    out_dir = tmp_path.joinpath("out")
+    start = datetime.datetime(2023, 6, 1, 1, tzinfo=datetime.timezone.utc)
+    spec = HplSpec(start=start, duration=1200, ngates=20)
+    bg = write_background(raw_dir, start - datetime.timedelta(minutes=10), ngates=20)
+    content = hpl_bytes(spec)
+    path = raw_dir.joinpath(hpl_filename(spec))
+    watcher = Watcher(raw_dir, out_dir, interval=0)
+    for size in np.linspace(len(content) // 4, len(content), 5).astype(int):
+        path.write_bytes(content[:size])
+        watcher.poll()
+    watcher.poll()
+    assert len(watcher._days[start.date()].final) == 1
+    # Only the update that parsed the background processed the whole day
+    assert caplog.text.count("Processing all profiles") == 1
+
+    expected = read([path])
+    process(expected, read_bg([bg]))
+    with netCDF4.Dataset(out_dir.joinpath(f"halo_{start.date()}.nc")) as nc:
+        for name in ("intensity", "beta", "beta_screened"):
+            variable = getattr(expected, name)
+            np.testing.assert_allclose(nc[name][:].filled(np.nan), variable.data)
+            np.testing.assert_array_equal(
+                np.ma.getmaskarray(nc[name][:]), np.ma.getmaskarray(variable.data)
+            )
+
+
+def test_watcher_retention(tmp_path):
+    raw_dir = tmp_path.joinpath("raw")
+    raw_dir.mkdir()
+    watcher = Watcher(raw_dir, tmp_path.joinpath("out"), interval=0)
+    start = datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc)
+    paths = []
+    for day in range(3):
+        spec = HplSpec(
+            start=start + datetime.timedelta(days=day), duration=300, ngates=20
+        )
+        paths.append(write_hpl(raw_dir, spec))
+        assert watcher.poll() == [spec.start.date()]
+    # Only the newest two days are kept in memory
+    assert set(watcher._dates) == set(paths[1:])
+    assert set(watcher._readers) == set(paths[1:])
+
+    # A background update only reprocesses the retained days
+    write_background(raw_dir, start + datetime.timedelta(days=2), ngates=20)
+    assert watcher.poll() == []
+    assert watcher.poll() == [
+        datetime.date(2023, 6, 2),
+        datetime.date(2023, 6, 3),
+    ]
+
+    # Dropped files are not parsed again, even if they change
+    with paths[0].open("ab") as f:
+        f.write(b"\r\n")
+    assert watcher.poll() == []
+    paths[0].unlink()
+    watcher.poll()
+    assert paths[0] not in watcher._expired
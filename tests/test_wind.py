@@ -0,0 +1,106 @@
+import datetime
+from pathlib import Path
+
+import netCDF4
+import numpy as np
+import pytest
+from synthetic import WIND_U, WIND_V, HplFormat, HplSpec, write_dataset
+
+from haloreader.pipeline import process
+from haloreader.read import read, read_bg
+from haloreader.variable import Variable
+from haloreader.wind import compute_wind_profile, scan_starts
+
+raw_files_pass = Path("tests/raw-files/pass/")
+START = datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def vad_dataset(tmp_path):
+    spec = HplSpec(start=START, duration=1800, hpl_format=HplFormat.VAD)
+    return write_dataset(tmp_path, spec, hours=1)
+
+
+def test_scan_starts():
+    time = np.array([0, 1, 2, 3, 4, 5, 6, 7, 20, 21, 22, 23.0])
+    elevation = np.array([75.0] * 6 + [60.0] * 6)
+    np.testing.assert_array_equal(scan_starts(time, elevation, 3), [0, 3, 6, 8, 11])
+
+
+def test_compute_wind_profile(vad_dataset):
+    halo = read(vad_dataset.halo_files)
+    halo.compute_wind_profile()
+    wind = halo.wind
+    nscans = halo.time.data.size // 6
+    assert wind.uwind.data.shape == (nscans, halo.range.data.size)
+    assert np.all(wind.wind_nrays.data == 6)
+    np.testing.assert_allclose(
+        wind.time.data, halo.time.data.reshape(nscans, 6).mean(axis=1)
+    )
+    # Synthetic radial velocities are noise above the boundary layer
+    signal = (slice(None), slice(3, 20))
+    assert np.ma.median(wind.uwind.data[signal]) == pytest.approx(WIND_U, abs=0.1)
+    assert np.ma.median(wind.vwind.data[signal]) == pytest.approx(WIND_V, abs=0.1)
+    assert np.ma.median(wind.wwind.data[signal]) == pytest.approx(0, abs=0.05)
+    assert np.all(wind.wind_rmse.data[signal] < 0.5)
+
+
+def test_screen_and_incomplete_scans(vad_dataset):
+    halo = read(vad_dataset.halo_files)
+    screen = Variable(
+        name="noise_screen",
+        dimensions=("time", "range"),
+        data=np.zeros(halo.doppler_velocity.data.shape, dtype=bool),
+    )
+    screen.data[:, 0] = True
+    screen.data[::6, 1] = True
+    screen.data[:4, 2] = True
+    halo.compute_wind_profile(screen)
+    wind = halo.wind
+    assert np.all(wind.uwind.data.mask[:, 0])
+    assert np.all(wind.wind_nrays.data[:, 1] == 5)
+    assert not np.any(wind.uwind.data.mask[:, 1])
+    assert wind.uwind.data.mask[0, 2]
+    assert not np.any(wind.uwind.data.mask[1:, 2])
+
+    soverato = read(
+        [raw_files_pass.joinpath("soverato-2021-10-01-VAD_194_20210624_170110.hpl")]
+    )
+    soverato.compute_wind_profile()
+    # The file holds only 2 of the 6 rays of its scan, fewer than MIN_RAYS
+    assert np.all(soverato.wind.wind_nrays.data <= 2)
+    assert np.all(soverato.wind.uwind.data.mask)
+
+
+def test_wind_to_nc(vad_dataset):
+    halo = read(vad_dataset.halo_files)
+    process(halo, read_bg(vad_dataset.background_files))
+    assert halo.wind is not None
+    assert halo.wind.time.units == halo.time.units
+    nc = netCDF4.Dataset("inmemory.nc", memory=halo.to_nc().tobytes())
+    assert nc["uwind"].dimensions == ("time_wind", "range")
+    assert nc["time_wind"].units == halo.time.units
+    nc.close()
+
+
+def test_compute_wind_profile_errors():
+    halo = read(
+        [raw_files_pass.joinpath("eriswil-2022-12-14-Stare_91_20221214_11.hpl")]
+    )
+    with pytest.raises(ValueError):
+        halo.compute_wind_profile()
+    with pytest.raises(TypeError):
+        compute_wind_profile(
+            halo.time, halo.azimuth, halo.elevation, Variable(name="v"), 6
+        )
+
+
+def test_sel_wind(vad_dataset):
+    halo = read(vad_dataset.halo_files)
+    halo.compute_wind_profile()
+    t_stop = halo.wind.time.data[2]
+    selected = halo.sel(time=slice(None, t_stop), range=slice(None, 300))
+    nranges = selected.range.data.size
+    np.testing.assert_array_equal(selected.wind.time.data, halo.wind.time.data[:3])
+    assert selected.wind.uwind.data.shape == (3, nranges)
+    assert selected.wind.wind_nrays.data.shape == (3, nranges)